@@ -1,27 +1,23 @@
 from vis_graph import VisGraph
-from graph import Point
-import shapefile
+from shapefile_loader import read_rings
+from graph import Graph
 
 def main():
-    input_shapefile = shapefile.Reader('GSHHS_c_L1')
+    input_shapefile = 'GSHHS_c_L1'
     output_graphfile = 'GSHHS_c_L1.graph'
 
-    # Get the shoreline shapes from the shape file
-    shapes = input_shapefile.shapes()
-    print(f'The shapefile contains {len(shapes)} shapes.')
+    # Read the shoreline rings of the shape file straight into coordinate arrays
+    xs, ys, offsets = read_rings(input_shapefile)
+    print(f'The shapefile contains {len(offsets) - 1} rings with {len(xs)} points.')
 
-    # Create a list of polygons
-    polygons = []
-    for shape in shapes:
-        polygon = []
-        for point in shape.points:
-            polygon.append(Point(point[0], point[1]))
-        polygons.append(polygon)
+    # Create the obstacle graph from the arrays
+    obstacles = Graph.from_rings(xs, ys, offsets)
 
     # Start building the visibility graph
     graph = VisGraph()
     print('Starting building visibility graph')
-    graph.build(polygons, workers=12)  # Number of workers for parallel processing
+    # Edges weighted by great-circle km
+    graph.build(obstacles, workers=12, metric='haversine')  # Number of workers for parallel processing
     print('Finished building visibility graph')
 
     # Save the visibility graph to a file
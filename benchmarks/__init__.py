@@ -0,0 +1,8 @@
+"""
+Benchmarks for building and querying visibility graphs.
+
+Run from the repository root:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.compare old.json results.json
+"""
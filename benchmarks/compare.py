@@ -0,0 +1,46 @@
+import argparse
+import json
+import sys
+
+KEY_FIELDS = ("dataset", "vertices", "benchmark", "algorithm", "workers", "method")
+
+
+def load_results(filename):
+    with open(filename) as file:
+        return {_key(result): result for result in json.load(file)["results"]}
+
+
+def compare(old, new, threshold):
+    """Return (key, old seconds, new seconds) of the benchmarks in both runs,
+    and the keys of those that got slower by more than threshold."""
+    rows, regressions = [], []
+    for key in sorted(set(old) & set(new), key=str):
+        before, after = old[key]["seconds"], new[key]["seconds"]
+        rows.append((key, before, after))
+        if before > 0 and after / before > 1 + threshold:
+            regressions.append(key)
+    return rows, regressions
+
+
+def _key(result):
+    return tuple(result.get(field) for field in KEY_FIELDS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    rows, regressions = compare(load_results(args.old), load_results(args.new), args.threshold)
+    for key, before, after in rows:
+        label = " ".join(str(part) for part in key if part is not None)
+        flag = "  REGRESSION" if key in regressions else ""
+        print(f"{label:60} {before:12.6f} {after:12.6f} {after / before if before else float('inf'):7.2f}x{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
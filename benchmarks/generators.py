@@ -0,0 +1,104 @@
+from math import cos, pi, sin
+import random
+
+from graph import Point
+from shapefile_loader import read_rings, ring_polygons
+
+CELL = 100.0  # side of the square cell each generated polygon is placed in
+RADIUS = 40.0  # largest polygon radius, so polygons never leave their cell
+
+
+def convex_polygons(count, vertices, seed=0):
+    """count convex polygons of vertices points each, on a square grid of cells."""
+    rnd = random.Random(seed)
+    polygons = []
+    for cx, cy in _cells(count):
+        angles = sorted(rnd.uniform(0, 2 * pi) for _ in range(vertices))
+        radius = rnd.uniform(RADIUS / 2, RADIUS)
+        polygons.append(_polygon(cx, cy, angles, [radius] * vertices))
+    return polygons
+
+
+def concave_polygons(count, vertices, seed=0):
+    """count star-shaped polygons with random radii, most of them concave."""
+    rnd = random.Random(seed)
+    polygons = []
+    for cx, cy in _cells(count):
+        angles = sorted(rnd.uniform(0, 2 * pi) for _ in range(vertices))
+        radii = [rnd.uniform(RADIUS / 4, RADIUS) for _ in range(vertices)]
+        polygons.append(_polygon(cx, cy, angles, radii))
+    return polygons
+
+
+def obstacle_grid(rows, cols, vertices=4):
+    """A regular rows x cols grid of identical regular polygons."""
+    angles = [2 * pi * k / vertices + pi / vertices for k in range(vertices)]
+    return [_polygon(cx, cy, angles, [RADIUS / 2] * vertices) for cx, cy in _cells(rows * cols, cols)]
+
+
+def fractal_coastlines(count, vertices, seed=0, roughness=0.6):
+    """
+    count coastline-like polygons: star-shaped outlines whose radius is a sum
+    of random octaves, the amplitude of each octave shrinking by roughness.
+    """
+    rnd = random.Random(seed)
+    polygons = []
+    for cx, cy in _cells(count):
+        octaves = []
+        frequency, amplitude = 1, 1.0
+        while frequency < vertices / 2:
+            octaves.append((frequency, amplitude, rnd.uniform(0, 2 * pi)))
+            frequency, amplitude = frequency * 2, amplitude * roughness
+        total = sum(amplitude for _, amplitude, _ in octaves) or 1.0
+        angles = [2 * pi * k / vertices for k in range(vertices)]
+        radii = [RADIUS * (0.55 + 0.4 * sum(a * sin(f * angle + phase) for f, a, phase in octaves) / total)
+                 for angle in angles]
+        polygons.append(_polygon(cx, cy, angles, radii))
+    return polygons
+
+
+def gshhs_polygons(filename='GSHHS_c_L1'):
+    """
+    The polygons of a shoreline shapefile, one per shape part, read with
+    shapefile_loader.read_rings as 1_build_graph_from_shapefiles does.
+    Rings of fewer than three points are skipped, as by Graph.from_rings.
+    """
+    return [ring for ring in ring_polygons(*read_rings(filename)) if len(ring) > 2]
+
+
+def free_points(count, polygons, seed=0):
+    """count random points on the free corridors between the grid cells."""
+    rnd = random.Random(seed)
+    cells = max(1, _side(len(polygons)))
+    points = []
+    for _ in range(count):
+        along = rnd.uniform(0, cells * CELL)
+        across = rnd.randint(0, cells) * CELL
+        points.append(Point(along, across) if rnd.random() < 0.5 else Point(across, along))
+    return points
+
+
+DATASETS = {
+    "convex": lambda vertices, seed: convex_polygons(max(1, vertices // 8), 8, seed),
+    "concave": lambda vertices, seed: concave_polygons(max(1, vertices // 16), 16, seed),
+    "grid": lambda vertices, seed: obstacle_grid(_side(vertices // 4), _side(vertices // 4)),
+    "fractal": lambda vertices, seed: fractal_coastlines(max(1, vertices // 64), 64, seed),
+}
+
+
+def _side(count):
+    side = 1
+    while side * side < count:
+        side += 1
+    return side
+
+
+def _cells(count, cols=None):
+    cols = cols or _side(count)
+    for k in range(count):
+        row, col = divmod(k, cols)
+        yield (col + 0.5) * CELL, (row + 0.5) * CELL
+
+
+def _polygon(cx, cy, angles, radii):
+    return [Point(cx + r * cos(angle), cy + r * sin(angle)) for angle, r in zip(angles, radii)]
@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from threading import Event, Thread
+from timeit import default_timer
+
+from benchmarks.generators import DATASETS, free_points, gshhs_polygons
+from graph import Graph
+from obstacles import PreparedObstacles
+from vis_graph import VisGraph
+from visible_vertices import visible_vertices
+
+SWEEP_SAMPLE = 50  # vertices timed with visible_vertices per case
+QUERIES = 20  # shortest_path queries timed per case and method
+RSS_INTERVAL = 0.01  # seconds between RSS samples while a stage runs
+
+
+def run_case(dataset, vertices, seed, workers, algorithms, methods):
+    """
+    Time every stage on one dataset and return a list of result records,
+    each with the peak RSS of its stage, see _stage. Runs in its own
+    process so that no memory of an earlier case is counted.
+    """
+    polygons = gshhs_polygons() if dataset == "gshhs" else DATASETS[dataset](vertices, seed)
+    case = {"dataset": dataset, "seed": seed,
+            "vertices": sum(len(polygon) for polygon in polygons), "polygons": len(polygons)}
+    results = []
+
+    def record(benchmark, stage, **extra):
+        results.append(dict(case, benchmark=benchmark, **stage, **extra))
+
+    with _stage() as stage:
+        graph = Graph(polygons)
+    record("graph", stage)
+
+    obstacles = PreparedObstacles(graph)
+    sample = obstacles.points[:SWEEP_SAMPLE]
+    with _stage() as stage:
+        visible = sum(len(visible_vertices(point, obstacles)) for point in sample)
+    stage["seconds"] /= max(1, len(sample))
+    record("visible_vertices", stage, visible=visible)
+
+    built = None
+    for algorithm in algorithms:
+        for count in (workers if algorithm == "lee" else [1]):
+            built = None  # so one build's graph is not counted in the next one's RSS
+            with _stage() as stage:
+                built = VisGraph(cache_size=0)  # time every query's endpoint sweeps
+                built.build(polygons, workers=count, show_progress=False, algorithm=algorithm)
+            record("build", stage, algorithm=algorithm, workers=count, edges=built.csr.num_edges)
+
+    queries = list(zip(free_points(QUERIES, polygons, seed), free_points(QUERIES, polygons, seed + 1)))
+    if dataset == "gshhs":
+        queries = list(zip(built.points[::97], built.points[1::89]))[:QUERIES]
+    for method in methods:
+        with _stage() as stage:
+            for origin, destination in queries:
+                built.shortest_path(origin, destination, method=method)
+        stage["seconds"] /= max(1, len(queries))
+        record("shortest_path", stage, method=method)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "benchmark.graph")
+        with _stage() as stage:
+            built.save(filename)
+        record("save", stage, bytes=os.path.getsize(filename))
+        del built
+        with _stage() as stage:
+            loaded = VisGraph()
+            loaded.load(filename)
+        record("load", stage)
+        for method in methods:
+            with _stage() as stage:
+                for origin, destination in queries:
+                    loaded.shortest_path(origin, destination, method=method)
+            stage["seconds"] /= max(1, len(queries))
+            record("loaded_shortest_path", stage, method=method)
+    return results
+
+
+@contextmanager
+def _stage():
+    """
+    Time the with block and sample the RSS of this process and its child
+    processes, such as the workers of a parallel build, while it runs.
+    Yields a dict that gets "seconds", "rss_start_mb", the RSS when the
+    block starts, and "rss_peak_mb", the highest RSS sampled during it.
+    """
+    stage = {}
+    samples = [_rss_mb()]
+    done = Event()
+
+    def sample():
+        while not done.wait(RSS_INTERVAL):
+            samples.append(_rss_mb())
+
+    sampler = Thread(target=sample, daemon=True)
+    sampler.start()
+    start = default_timer()
+    try:
+        yield stage
+    finally:
+        seconds = default_timer() - start
+        done.set()
+        sampler.join()
+        samples.append(_rss_mb())
+        stage.update(seconds=seconds, rss_start_mb=samples[0], rss_peak_mb=max(samples))
+
+
+def environment():
+    """Describe the machine and code version the results were measured on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "commit": commit}
+
+
+def _rss_mb():
+    """
+    Resident set size of this process and its live child processes, in MB.
+    Without /proc, the peak RSS of this process so far.
+    """
+    try:
+        pids = [str(os.getpid())]
+        for pid in os.listdir("/proc"):
+            if pid.isdigit():
+                try:
+                    with open(f"/proc/{pid}/stat") as file:
+                        # The parent pid follows the command name, which may hold spaces.
+                        if file.read().rsplit(")", 1)[1].split()[1] == pids[0]:
+                            pids.append(pid)
+                except OSError:  # the process exited meanwhile
+                    pass
+        pages = 0
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/statm") as file:
+                    pages += int(file.read().split()[1])
+            except OSError:
+                pass
+        return pages * resource.getpagesize() / (1 << 20)
+    except OSError:
+        scale = 1 << 20 if sys.platform == "darwin" else 1 << 10  # bytes on macOS, KB elsewhere
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark building and querying visibility graphs.")
+    parser.add_argument("--datasets", nargs="+", default=sorted(DATASETS) + ["gshhs"],
+                        choices=sorted(DATASETS) + ["gshhs"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 200, 400],
+                        help="vertex counts of the synthetic datasets")
+    parser.add_argument("--workers", nargs="+", type=int, default=list(range(1, (os.cpu_count() or 1) + 1)),
+                        help="worker counts for the parallel Lee build, 1 to the number of CPUs by default")
+    parser.add_argument("--algorithms", nargs="+", default=["lee", "rotational"],
+                        choices=["lee", "rotational"])
+    parser.add_argument("--methods", nargs="+", default=["dijkstra", "astar", "bidirectional"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--case", help=argparse.SUPPRESS)  # internal: run one case, print its results
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(*json.loads(args.case))))
+        return
+
+    cases = []
+    for dataset in args.datasets:
+        for size in ([None] if dataset == "gshhs" else args.sizes):
+            cases.append((dataset, size, args.seed, args.workers, args.algorithms, args.methods))
+
+    results = []
+    for case in cases:
+        # A fresh process per case, so no case's memory is counted in another's.
+        output = subprocess.run([sys.executable, "-m", "benchmarks.run", "--case", json.dumps(case)],
+                                capture_output=True, text=True, check=True).stdout
+        case_results = json.loads(output)
+        for result in case_results:
+            print(json.dumps(result), file=sys.stderr)
+        results.extend(case_results)
+
+    report = json.dumps({"environment": environment(), "results": results}, indent=1)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
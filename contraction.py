@@ -0,0 +1,249 @@
+from heapq import heappush, heappop
+import numpy as np
+from tqdm import tqdm
+
+WITNESS_SETTLED = 256  # vertices a witness search may settle before it gives up
+WITNESS_HOPS = 3  # edges on the longest witness path a search looks for
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy of a CSRGraph for fast point-to-point queries.
+
+    Vertices are contracted one at a time in rank order; removing a vertex
+    adds a shortcut between two of its neighbours when it lies on their only
+    shortest path. Vertex i keeps the arcs to its higher ranked neighbours,
+    up_indices[up_indptr[i]:up_indptr[i + 1]], with their weights and the
+    vertex each arc bypasses in middle (-1 for an edge of the graph), so a
+    query only ever searches upwards from both ends.
+    """
+
+    def __init__(self, rank, up_indptr, up_indices, up_weights, middle):
+        self.rank = rank
+        self.up_indptr = up_indptr
+        self.up_indices = up_indices
+        self.up_weights = up_weights
+        self.middle = middle
+
+    @classmethod
+    def build(cls, csr, show_progress=False):
+        """
+        Contract every vertex of csr, cheapest first by edge difference
+        (shortcuts added minus edges removed) plus contracted neighbours.
+        """
+        count = len(csr)
+        adjacency = [{} for _ in range(count)]  # neighbour -> (weight, middle)
+        sources = np.repeat(np.arange(count), np.diff(csr.indptr)).tolist()
+        for i, j, weight in zip(sources, csr.indices.tolist(), csr.weights.tolist()):
+            adjacency[i][j] = (weight, -1)
+        contracted_neighbours = [0] * count
+
+        heap = []
+        for v in range(count):
+            heappush(heap, (_priority(adjacency, v, contracted_neighbours), v))
+
+        rank = np.zeros(count, dtype=np.int32)
+        up = [None] * count
+        with tqdm(total=count, disable=not show_progress, desc="Contracting graph") as progress:
+            order = 0
+            while heap:
+                _, v = heappop(heap)
+                priority = _priority(adjacency, v, contracted_neighbours)
+                if heap and priority > heap[0][0]:
+                    heappush(heap, (priority, v))  # lazy update: no longer the cheapest
+                    continue
+                shortcuts = _shortcuts(adjacency, v)
+
+                rank[v] = order
+                order += 1
+                up[v] = adjacency[v]
+                for u in adjacency[v]:
+                    del adjacency[u][v]
+                    contracted_neighbours[u] += 1
+                for u, w, weight in shortcuts:
+                    if w not in adjacency[u] or weight < adjacency[u][w][0]:
+                        adjacency[u][w] = adjacency[w][u] = (weight, v)
+                adjacency[v] = {}
+                progress.update(1)
+
+        up_indptr = np.zeros(count + 1, dtype=np.int32)
+        np.cumsum([len(arcs) for arcs in up], out=up_indptr[1:])
+        up_indices = np.fromiter((j for arcs in up for j in arcs), dtype=np.int32,
+                                 count=int(up_indptr[-1]))
+        up_weights = np.fromiter((arc[0] for arcs in up for arc in arcs.values()),
+                                 dtype=np.float64, count=int(up_indptr[-1]))
+        middle = np.fromiter((arc[1] for arcs in up for arc in arcs.values()),
+                             dtype=np.int32, count=int(up_indptr[-1]))
+        return cls(rank, up_indptr, up_indices, up_weights, middle)
+
+    def to_arrays(self):
+        """Return the hierarchy as named flat arrays for graph_file."""
+        return {
+            'ch_rank': self.rank,
+            'ch_indptr': self.up_indptr,
+            'ch_indices': self.up_indices,
+            'ch_weights': self.up_weights,
+            'ch_middle': self.middle,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['ch_rank'], arrays['ch_indptr'], arrays['ch_indices'],
+                   arrays['ch_weights'], arrays['ch_middle'])
+
+    def query(self, sources, targets):
+        """
+        Bidirectional upward Dijkstra between two sets of seed vertices.
+
+        :param sources: (vertex id, distance) pairs the forward search starts from.
+        :param targets: (vertex id, distance) pairs the backward search starts from.
+        :return: (distance, vertex ids of the unpacked path), or (inf, None)
+            if no target can be reached.
+        """
+        distances = ({}, {})
+        tentative = ({}, {})
+        parents = ({}, {})
+        heaps = ([], [])
+        for side, seeds in enumerate((sources, targets)):
+            for i, distance in seeds:
+                if distance < tentative[side].get(i, float('inf')):
+                    tentative[side][i] = distance
+                    parents[side][i] = -1
+                    heappush(heaps[side], (distance, i))
+
+        best, meeting = float('inf'), None
+        side = 0
+        while True:
+            # Each search stops once it cannot improve the best meeting point.
+            if not (heaps[side] and heaps[side][0][0] < best):
+                side = 1 - side
+                if not (heaps[side] and heaps[side][0][0] < best):
+                    break
+            distance, v = heappop(heaps[side])
+            if v in distances[side]:
+                continue
+            distances[side][v] = distance
+            other = tentative[1 - side].get(v)
+            if other is not None and distance + other < best:
+                best, meeting = distance + other, v
+
+            start, stop = self.up_indptr[v], self.up_indptr[v + 1]
+            for u, weight in zip(self.up_indices[start:stop].tolist(),
+                                 self.up_weights[start:stop].tolist()):
+                path_length = distance + weight
+                if u not in distances[side] and path_length < tentative[side].get(u, float('inf')):
+                    tentative[side][u] = path_length
+                    parents[side][u] = v
+                    heappush(heaps[side], (path_length, u))
+                    other = tentative[1 - side].get(u)
+                    if other is not None and path_length + other < best:
+                        best, meeting = path_length + other, u
+            side = 1 - side
+
+        if meeting is None:
+            return best, None
+        forward = _chain(parents[0], meeting)[::-1]
+        backward = _chain(parents[1], meeting)
+        chain = forward + backward[1:]
+        path = chain[:1]
+        for a, b in zip(chain, chain[1:]):
+            path.extend(self._unpack(a, b)[1:])
+        return best, path
+
+    def _unpack(self, a, b):
+        """Return the graph vertices, a to b, that the arc between a and b stands for."""
+        path = [a]
+        pending = [b]
+        while pending:
+            b = pending[-1]
+            m = self._middle(path[-1], b)
+            if m < 0:
+                path.append(pending.pop())
+            else:
+                pending.append(m)
+        return path
+
+    def _middle(self, a, b):
+        low, high = (a, b) if self.rank[a] < self.rank[b] else (b, a)
+        start, stop = self.up_indptr[low], self.up_indptr[low + 1]
+        k = np.flatnonzero(self.up_indices[start:stop] == high)[0]
+        return int(self.middle[start + k])
+
+
+def _chain(parents, vertex):
+    """Return vertex and its ancestors in a search tree, up to the seed."""
+    chain = [vertex]
+    while parents[chain[-1]] >= 0:
+        chain.append(parents[chain[-1]])
+    return chain
+
+
+def _priority(adjacency, v, contracted_neighbours):
+    """Edge difference of contracting v, estimated with two-hop witnesses only."""
+    shortcuts = len(_shortcuts(adjacency, v, search=False))
+    return shortcuts - len(adjacency[v]) + contracted_neighbours[v]
+
+
+def _shortcuts(adjacency, v, search=True):
+    """
+    Return the (u, w, weight) shortcuts needed to contract v: one for each
+    pair of neighbours whose path through v has no witness path as short.
+    Without search only witnesses of one or two edges are looked for.
+    """
+    neighbours = sorted(adjacency[v])
+    shortcuts = []
+    for k, u in enumerate(neighbours[:-1]):
+        via = adjacency[v][u][0]
+        direct = adjacency[u]
+        # In a visibility graph most neighbours see each other directly.
+        others = {w: via + adjacency[v][w][0] for w in neighbours[k + 1:]
+                  if w not in direct or direct[w][0] > via + adjacency[v][w][0]}
+        others = {w: weight for w, weight in others.items()
+                  if not _two_hop_witness(adjacency, u, w, v, weight)}
+        if not others:
+            continue
+        witness = _witness_distances(adjacency, u, v, others) if search else {}
+        for w, weight in others.items():
+            if witness.get(w, float('inf')) > weight:
+                shortcuts.append((u, w, weight))
+    return shortcuts
+
+
+def _two_hop_witness(adjacency, u, w, excluded, weight):
+    """Return True if some x other than excluded has d(u, x) + d(x, w) <= weight."""
+    a, b = adjacency[u], adjacency[w]
+    if len(a) > len(b):
+        a, b = b, a
+    for x, (first, _) in a.items():
+        if x != excluded and x in b and first + b[x][0] <= weight:
+            return True
+    return False
+
+
+def _witness_distances(adjacency, source, excluded, targets):
+    """
+    Distances from source to targets avoiding excluded, from a Dijkstra
+    search bounded by the longest path through excluded, WITNESS_HOPS and
+    WITNESS_SETTLED. A missed witness only costs a superfluous shortcut.
+    """
+    limit = max(targets.values())
+    remaining = set(targets)
+    distances = {}
+    tentative = {source: 0.0}
+    heap = [(0.0, 0, source)]
+    while heap and remaining and len(distances) < WITNESS_SETTLED:
+        distance, hops, v = heappop(heap)
+        if v in distances:
+            continue
+        if distance > limit:
+            break
+        distances[v] = distance
+        remaining.discard(v)
+        if hops == WITNESS_HOPS:
+            continue
+        for u, (weight, _) in adjacency[v].items():
+            path_length = distance + weight
+            if u != excluded and u not in distances and path_length < tentative.get(u, float('inf')):
+                tentative[u] = path_length
+                heappush(heap, (path_length, hops + 1, u))
+    return distances
@@ -1,4 +1,5 @@
 from collections import defaultdict
+import numpy as np
 
 class Graph:
     
@@ -19,11 +20,26 @@ class Graph:
         if len(polygon) > 1 and polygon[0] == polygon[-1]:
             polygon.pop()
         num_points = len(polygon)
+        edges = []
         for index, point in enumerate(polygon):
             sibling = polygon[(index + 1) % num_points]
             edge = Edge(point, sibling)
             self._add_polygon_data(point, sibling, edge, polygon_id, num_points)
             self.add_edge(edge)
+            edges.append(edge)
+        return edges
+
+    def add_polygon(self, polygon):
+        """Add one more polygon and return the edges created for it."""
+        polygon_id = max(self.polygons, default=-1) + 1
+        return self._process_polygon(polygon, polygon_id)
+
+    def remove_polygon(self, polygon_id):
+        """Remove a polygon and return its edges."""
+        edges = self.polygons.pop(polygon_id, set())
+        for edge in edges:
+            self.remove_edge(edge)
+        return edges
 
     def _add_polygon_data(self, point, sibling, edge, polygon_id, num_points):
         if num_points > 2:
@@ -40,11 +56,72 @@ class Graph:
     def get_edges(self):
         return list(self.edges)
 
+    def to_csr(self, metric=None):
+        return CSRGraph.from_graph(self, metric)
+
+    def to_arrays(self):
+        """
+        Return the graph as flat arrays: vertex xs, ys and polygon ids, then
+        (p1, p2) vertex ids and the polygon id of every edge.
+        """
+        vertices = VertexIds(self.get_points())
+        edge_polygons = {edge: polygon_id for polygon_id, edges in self.polygons.items() for edge in edges}
+        edges = self.get_edges()
+        return (
+            *vertices.arrays(),
+            np.array([(vertices[edge.p1], vertices[edge.p2]) for edge in edges], dtype=np.int32).reshape(-1, 2),
+            np.array([edge_polygons.get(edge, -1) for edge in edges], dtype=np.int32),
+        )
+
+    @classmethod
+    def from_arrays(cls, xs, ys, polygon_ids, edges, edge_polygons):
+        """Rebuild a Graph from the arrays returned by to_arrays."""
+        graph = cls([])
+        points = [Point(x, y, polygon_id) for x, y, polygon_id
+                  in zip(xs.tolist(), ys.tolist(), polygon_ids.tolist())]
+        for (i, j), polygon_id in zip(edges.tolist(), edge_polygons.tolist()):
+            edge = Edge(points[i], points[j])
+            graph.add_edge(edge)
+            if polygon_id != -1:
+                graph.polygons[polygon_id].add(edge)
+        return graph
+
+    @classmethod
+    def from_rings(cls, xs, ys, offsets):
+        """
+        Build a Graph of polygons given as flat coordinate arrays: polygon k
+        is the ring of points offsets[k] to offsets[k + 1] - 1, without a
+        closing point. Rings of fewer than three points are skipped.
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        starts, stops = offsets[:-1], offsets[1:]
+        keep = stops - starts > 2
+        starts, stops = starts[keep], stops[keep]
+        sizes = stops - starts
+        rings = np.repeat(np.arange(len(sizes), dtype=np.int32), sizes)
+        ids = np.arange(int(sizes.sum()))
+        first = np.repeat(np.cumsum(sizes) - sizes, sizes)  # id of the first vertex of each one's ring
+        vertices = ids - first + np.repeat(starts, sizes)
+        # Every vertex is joined to the next one of its ring, the last to the first.
+        following = np.where(ids + 1 == first + np.repeat(sizes, sizes), first, ids + 1)
+        edges = np.column_stack((ids, following)).astype(np.int32)
+        return cls.from_arrays(np.asarray(xs, dtype=np.float64)[vertices],
+                               np.asarray(ys, dtype=np.float64)[vertices], rings, edges, rings)
+
     def add_edge(self, edge):
         self.graph[edge.p1].add(edge)
         self.graph[edge.p2].add(edge)
         self.edges.add(edge)
 
+    def remove_edge(self, edge):
+        for point in (edge.p1, edge.p2):
+            edges = self.graph.get(point)
+            if edges is not None:
+                edges.discard(edge)
+                if not edges:
+                    del self.graph[point]
+        self.edges.discard(edge)
+
     def __contains__(self, item):
         if isinstance(item, Point):
             return item in self.graph
@@ -62,8 +139,211 @@ class Graph:
         return repr(self)
 
 
+class CSRGraph:
+    """
+    Frozen compressed sparse row form of an undirected Graph.
+
+    Vertex i is at (xs[i], ys[i]) in polygon polygon_ids[i]. Its neighbours
+    are indices[indptr[i]:indptr[i + 1]], at the distances in the same slice
+    of weights. Each edge is stored once per endpoint.
+    """
+
+    def __init__(self, xs, ys, polygon_ids, indptr, indices, weights):
+        self.xs = xs
+        self.ys = ys
+        self.polygon_ids = polygon_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self._index = None
+        self._rows = None
+
+    @classmethod
+    def from_graph(cls, graph, metric=None):
+        """
+        Build the CSR form of graph. metric computes the edge weights from
+        coordinate arrays (x1, y1, x2, y2); planar distance by default.
+        """
+        vertices = VertexIds(graph.get_points())
+        pairs = [(vertices[edge.p1], vertices[edge.p2]) for edge in graph.edges]
+        return cls.from_pairs(*vertices.arrays(), pairs, metric)
+
+    @classmethod
+    def from_pairs(cls, xs, ys, polygon_ids, pairs, metric=None):
+        """
+        Build the CSR form of the vertices (xs, ys, polygon_ids) joined by the
+        (i, j) id pairs, each edge given once in either direction or more;
+        vertices without an edge are dropped and the others renumbered.
+        """
+        pairs = np.asarray(pairs, dtype=np.int32).reshape(-1, 2)
+        pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+        used = np.unique(pairs)
+        renumber = np.zeros(len(xs), dtype=np.int32)
+        renumber[used] = np.arange(len(used), dtype=np.int32)
+        pairs = renumber[pairs]
+        xs = np.asarray(xs, dtype=np.float64)[used]
+        ys = np.asarray(ys, dtype=np.float64)[used]
+        polygon_ids = np.asarray(polygon_ids, dtype=np.int32)[used]
+
+        sources = np.concatenate((pairs[:, 0], pairs[:, 1]))
+        targets = np.concatenate((pairs[:, 1], pairs[:, 0]))
+        order = np.argsort(sources, kind='stable')
+        sources, targets = sources[order], targets[order]
+        indptr = np.zeros(len(xs) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources, minlength=len(xs)), out=indptr[1:])
+        if metric is None:
+            weights = np.hypot(xs[targets] - xs[sources], ys[targets] - ys[sources])
+        else:
+            weights = metric(xs[sources], ys[sources], xs[targets], ys[targets])
+        return cls(xs, ys, polygon_ids, indptr, targets.astype(np.int32), weights)
+
+    def to_graph(self):
+        """Return the adjacency as a Graph of Point and Edge objects."""
+        graph = Graph([])
+        points = [Point(x, y, polygon_id) for x, y, polygon_id
+                  in zip(self.xs.tolist(), self.ys.tolist(), self.polygon_ids.tolist())]
+        sources = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
+        once = sources < self.indices
+        for i, j in zip(sources[once].tolist(), self.indices[once].tolist()):
+            graph.add_edge(Edge(points[i], points[j]))
+        return graph
+
+    def index_of(self, point):
+        """Return the vertex id of point, or None if it is not a vertex."""
+        if self._index is None:
+            self._index = SortedPoints(self.xs, self.ys)
+        return self._index.get(point)
+
+    def rows(self):
+        """
+        Return indptr, indices and weights as memoryviews, which index to
+        plain ints and floats, for searches that walk one row at a time.
+        """
+        if self._rows is None:
+            self._rows = tuple(memoryview(np.ascontiguousarray(array))
+                               for array in (self.indptr, self.indices, self.weights))
+        return self._rows
+
+    def point(self, i):
+        return Point(self.xs[i], self.ys[i], int(self.polygon_ids[i]))
+
+    def neighbors(self, i):
+        """Return the neighbour ids of vertex i and the distances to them."""
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:stop], self.weights[start:stop]
+
+    @property
+    def num_edges(self):
+        return len(self.indices) // 2
+
+    def __len__(self):
+        return len(self.xs)
+
+
+class VertexIds:
+    """
+    Interns vertex coordinates to dense integer ids, 0, 1, 2, ... in the
+    order the points are first seen. Lookups hash an (x, y) tuple instead
+    of calling Point.__hash__ and Point.__eq__, so the sweeps and searches
+    work on ids and only turn them back into Points for their callers.
+    """
+
+    __slots__ = ('_ids', 'points')
+
+    def __init__(self, points=()):
+        self._ids = {}
+        self.points = []
+        for point in points:
+            self.add(point)
+
+    def add(self, point):
+        """Return the id of point, giving it the next id if it is new."""
+        key = (point.x, point.y)
+        i = self._ids.get(key)
+        if i is None:
+            i = self._ids[key] = len(self.points)
+            self.points.append(point)
+        return i
+
+    def get(self, point, default=None):
+        return self._ids.get((point.x, point.y), default)
+
+    def copy(self):
+        ids = VertexIds()
+        ids._ids = dict(self._ids)
+        ids.points = list(self.points)
+        return ids
+
+    def point(self, i):
+        return self.points[i]
+
+    def arrays(self):
+        """Return the xs, ys and polygon ids of the vertices, by id."""
+        return (np.array([point.x for point in self.points], dtype=np.float64),
+                np.array([point.y for point in self.points], dtype=np.float64),
+                np.array([point.polygon_id for point in self.points], dtype=np.int32))
+
+    def __getitem__(self, point):
+        return self._ids[(point.x, point.y)]
+
+    def __contains__(self, point):
+        return (point.x, point.y) in self._ids
+
+    def __len__(self):
+        return len(self.points)
+
+
+class SortedPoints:
+    """
+    Read-only lookup of vertex ids by coordinates over the arrays xs and
+    ys: the points are sorted as complex numbers x + yj, which numpy orders
+    by x then y, and searched with np.searchsorted, so a frozen or loaded
+    graph needs no dict over all of its vertices.
+    """
+
+    __slots__ = ('_order', '_keys')
+
+    def __init__(self, xs, ys):
+        keys = _complex_keys(xs, ys)
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+
+    def get(self, point, default=None):
+        key = complex(point.x, point.y)
+        k = int(np.searchsorted(self._keys, key))
+        if k < len(self._keys) and self._keys[k] == key:
+            return int(self._order[k])
+        return default
+
+    def ids(self, xs, ys):
+        """Return the ids of the points (xs, ys), -1 for those that are not vertices."""
+        keys = _complex_keys(xs, ys)
+        if len(self._keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        k = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return np.where(self._keys[k] == keys, self._order[k], -1)
+
+    def __getitem__(self, point):
+        i = self.get(point)
+        if i is None:
+            raise KeyError(point)
+        return i
+
+    def __contains__(self, point):
+        return self.get(point) is not None
+
+    def __len__(self):
+        return len(self._order)
+
+
+def _complex_keys(xs, ys):
+    keys = np.empty(len(xs), dtype=np.complex128)
+    keys.real, keys.imag = xs, ys
+    return keys
+
+
 class Point:
-    
+
     __slots__ = ('x', 'y', 'polygon_id')
 
     def __init__(self, x, y, polygon_id=-1):
@@ -92,11 +372,12 @@ class Point:
 
 class Edge:
     
-    __slots__ = ('p1', 'p2')
+    __slots__ = ('p1', 'p2', '_hash')
 
     def __init__(self, p1, p2):
         self.p1 = p1
         self.p2 = p2
+        self._hash = hash(p1) ^ hash(p2)  # edges are hashed into several sets each
 
     def get_adjacent(self, point):
         return self.p2 if point == self.p1 else self.p1
@@ -105,15 +386,16 @@ class Edge:
         return point in (self.p1, self.p2)
 
     def __eq__(self, other):
-        return isinstance(other, Edge) and (
-            {self.p1, self.p2} == {other.p1, other.p2}
-        )
+        if not isinstance(other, Edge):
+            return False
+        p1, p2 = other.p1, other.p2
+        return (self.p1 == p1 and self.p2 == p2) or (self.p1 == p2 and self.p2 == p1)
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __hash__(self):
-        return hash((self.p1, self.p2))
+        return self._hash
 
     def __repr__(self):
         return f"Edge({repr(self.p1)}, {repr(self.p2)})"
@@ -0,0 +1,74 @@
+import json
+import struct
+import numpy as np
+
+MAGIC = b'VISGRAPH'
+VERSION = 1
+ALIGNMENT = 64  # every array starts on a 64-byte boundary
+WRITE_CHUNK = 1 << 24  # bytes copied per write, so memory-mapped arrays stream to the file
+_PREFIX = struct.Struct('<8sII')  # magic, version, header length
+
+
+def write_graph_file(filename, arrays, **metadata):
+    """
+    Write named numpy arrays and JSON metadata to a graph file.
+
+    The file is a fixed prefix (magic, version, header length), a JSON
+    header describing every array and then the raw little-endian arrays,
+    each aligned so it can be memory-mapped in place.
+    """
+    arrays = {name: np.ascontiguousarray(array, dtype=np.dtype(array.dtype).newbyteorder('<'))
+              for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+
+    header = json.dumps({'metadata': metadata, 'arrays': layout}).encode('utf-8')
+    data_start = _aligned(_PREFIX.size + len(header))
+    with open(filename, 'wb') as file:
+        file.write(_PREFIX.pack(MAGIC, VERSION, len(header)))
+        file.write(header)
+        file.write(b'\0' * (data_start - _PREFIX.size - len(header)))
+        position = 0
+        for name, array in arrays.items():
+            file.write(b'\0' * (layout[name]['offset'] - position))
+            flat = array.reshape(-1)
+            step = max(1, WRITE_CHUNK // max(array.itemsize, 1))
+            for start in range(0, len(flat), step):
+                file.write(flat[start:start + step].tobytes())
+            position = layout[name]['offset'] + array.nbytes
+
+
+def read_graph_file(filename):
+    """
+    Open a graph file and return (arrays, metadata). Arrays are read-only
+    memory maps of the file, so opening is O(1) in the graph size and
+    processes that open the same file share its pages.
+    """
+    with open(filename, 'rb') as file:
+        prefix = file.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"{filename} is not a visibility graph file")
+        magic, version, header_length = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a visibility graph file")
+        if version != VERSION:
+            raise ValueError(f"{filename} has graph file version {version}, expected {VERSION}")
+        header = json.loads(file.read(header_length).decode('utf-8'))
+
+    data_start = _aligned(_PREFIX.size + header_length)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(filename, dtype=dtype, mode='r',
+                                     offset=data_start + spec['offset'], shape=shape)
+    return arrays, header['metadata']
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
@@ -0,0 +1,102 @@
+import queue
+import threading
+
+from vis_graph import VisGraph
+
+
+class GraphWorker:
+    """
+    Keep one VisGraph of the completed polygons and update it in a
+    background thread, so the window keeps responding while visibility is
+    computed. Jobs run in the order they are submitted; their results are
+    put on the results queue for the main loop: ("edges", (added, removed))
+    with the visibility edges each polygon adds and removes, ("path",
+    points), ("reset", None) and ("error", message). The counters shared by
+    both threads are only used under _lock.
+    """
+
+    def __init__(self):
+        self.graph = None  # VisGraph of the completed polygons, None until the first one
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()  # (generation, kind, value) of finished jobs, see _run
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by reset; jobs and results of older generations are dropped
+        self._submitted = 0  # polygons sent to the worker
+        self._done = 0  # polygons added to the graph, or dropped by a reset
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @property
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def progress(self):
+        """Return the numbers of polygons added, or dropped, and submitted."""
+        with self._lock:
+            return self._done, self._submitted
+
+    @property
+    def busy(self):
+        done, submitted = self.progress()
+        return done < submitted
+
+    def add_polygon(self, polygon):
+        """Add a completed polygon, a list of Points, to the graph."""
+        with self._lock:
+            self._submitted += 1
+            self.jobs.put((self._generation, "add", polygon))
+
+    def shortest_path(self, start, end):
+        """Compute the shortest path once the polygons submitted so far are added."""
+        with self._lock:
+            self.jobs.put((self._generation, "path", (start, end)))
+
+    def reset(self):
+        with self._lock:
+            self._generation += 1
+            self.jobs.put((self._generation, "reset", None))
+
+    def _run(self):
+        while True:
+            generation, kind, value = self.jobs.get()
+            if generation != self.generation:
+                if kind == "add":
+                    self._finished()
+                continue
+            try:
+                if kind == "add":
+                    self._add(generation, value)
+                elif kind == "path":
+                    self._post(generation, "path", self._shortest_path(*value))
+                else:
+                    self.graph = None
+                    self._post(generation, "reset", None)
+            except Exception as error:
+                self._post(generation, "error", f"{kind} failed: {error!r}")
+            finally:
+                if kind == "add":
+                    self._finished()
+
+    def _finished(self):
+        with self._lock:
+            self._done += 1
+
+    def _add(self, generation, polygon):
+        if self.graph is None:
+            self.graph = VisGraph()
+            self.graph.build([polygon], show_progress=False)
+            changes = (self.graph.visgraph.get_edges(), [])
+        else:
+            # Only edges crossing the new polygon and the sweeps of its
+            # vertices are computed, not the whole graph.
+            self.graph.add_polygon(polygon)
+            changes = self.graph.changed_edges
+        self._post(generation, "edges", changes)
+
+    def _shortest_path(self, start, end):
+        if self.graph is None:
+            return [start, end]
+        return self.graph.shortest_path(start, end)
+
+    def _post(self, generation, kind, value):
+        self.results.put((generation, kind, value))
@@ -0,0 +1,242 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from importlib import import_module
+from threading import Lock
+from timeit import default_timer
+
+# Functions replaced by counting wrappers while instrumentation is on, per
+# module: (attribute path, kind, statistic name). "calls" counts calls,
+# "timed" also adds up their time, "sized" adds up the length of what they
+# return, "yielded" counts the items a generator yields and "queue" counts
+# calls and records the peak length of the queue.
+INSTRUMENTED = {
+    "visible_vertices": [
+        ("ccw", "calls", "ccw"),
+        ("edge_intersect", "calls", "edge_intersect"),
+        ("on_segment", "calls", "on_segment"),
+        ("point_edge_distance", "calls", "point_edge_distance"),
+        ("edge_in_polygon", "timed", "edge_in_polygon"),
+        ("polygon_crossing", "calls", "polygon_crossing"),
+        ("polygon_crossing_indexed", "calls", "polygon_crossing"),
+        ("bitangent", "calls", "bitangent"),
+        ("tangent_at", "calls", "tangent_at"),
+        ("OpenEdges.insert", "calls", "open_edges.insert"),
+        ("OpenEdges.delete", "calls", "open_edges.delete"),
+    ],
+    "rotational_sweep": [
+        ("ccw", "calls", "ccw"),
+        ("edge_intersect", "calls", "edge_intersect"),
+        ("on_segment", "calls", "on_segment"),
+        ("edge_in_polygon", "timed", "edge_in_polygon"),
+        ("bitangent", "calls", "bitangent"),
+    ],
+    "vis_graph": [
+        ("edge_in_polygon", "timed", "edge_in_polygon"),
+        ("bitangent", "calls", "bitangent"),
+    ],
+    "graph": [("Graph.add_edge", "timed", "graph.add_edge")],
+    "shortest_path": [
+        ("heappush", "queue", "search.pushes"),
+        ("heappop", "calls", "search.pops"),
+        ("_edges", "sized", "search.relaxations"),
+        ("_csr_edges", "yielded", "search.relaxations"),
+    ],
+    "contraction": [
+        ("heappush", "queue", "search.pushes"),
+        ("heappop", "calls", "search.pops"),
+    ],
+}
+
+# Statistics are collected per thread, and per asyncio task: the wrappers
+# are installed for the whole process while any thread collects, but count
+# only into the Stats of the thread that calls them.
+_current = ContextVar("instrumentation", default=None)  # Stats of this thread, or None
+_lock = Lock()  # guards _collectors and _originals
+_collectors = 0  # threads collecting, the wrappers are installed while > 0
+_originals = []  # (owner, attribute, original) of the installed wrappers
+
+
+class Stats:
+    """
+    Counters, accumulated seconds and peak values collected while
+    instrumentation is on: call counts of the wrapped functions, see
+    INSTRUMENTED, and the phases timed by the code under test, such as
+    "visible_vertices.sort" or "build.merge".
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.seconds = defaultdict(float)
+        self.peaks = {}
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    def add_time(self, name, seconds):
+        self.seconds[name] += seconds
+
+    def peak(self, name, value):
+        if value > self.peaks.get(name, value - 1):
+            self.peaks[name] = value
+
+    def merge(self, other):
+        """Add the counts and times of other, a Stats or its as_dict()."""
+        if isinstance(other, Stats):
+            other = other.as_dict()
+        self.counts.update(other["counts"])
+        for name, seconds in other["seconds"].items():
+            self.seconds[name] += seconds
+        for name, value in other["peaks"].items():
+            self.peak(name, value)
+
+    def clear(self):
+        self.counts.clear()
+        self.seconds.clear()
+        self.peaks.clear()
+
+    def as_dict(self):
+        return {"counts": dict(self.counts), "seconds": dict(self.seconds), "peaks": dict(self.peaks)}
+
+    def __repr__(self):
+        lines = [f"{name:32} {count:>14,}" for name, count in sorted(self.counts.items())]
+        lines += [f"{name:32} {seconds:>14.6f} s" for name, seconds in sorted(self.seconds.items())]
+        lines += [f"{name:32} {value:>14,} peak" for name, value in sorted(self.peaks.items())]
+        return "\n".join(lines)
+
+
+def current():
+    """Return the Stats the calling thread collects into, None if it collects none."""
+    return _current.get()
+
+
+def enable(stats=None):
+    """
+    Start collecting into stats (a new Stats by default) and return it.
+
+    Only the calls made in the calling thread, or asyncio task, are
+    counted. Other threads, such as the GUI worker or the threads of a
+    server's executor, count nothing unless they enable instrumentation
+    themselves, into their own Stats.
+    """
+    global _collectors
+    disable()
+    stats = stats if stats is not None else Stats()
+    with _lock:
+        if _collectors == 0:
+            _install()
+        _collectors += 1
+    _current.set(stats)
+    return stats
+
+
+def disable():
+    """Stop collecting in the calling thread; the last one to stop puts the uninstrumented functions back."""
+    global _collectors
+    if _current.get() is None:
+        return
+    _current.set(None)
+    with _lock:
+        _collectors -= 1
+        if _collectors == 0:
+            _restore()
+
+
+def reset():
+    """
+    Stop collecting in a forked process, whose parent's other collecting
+    threads did not follow it, and put the uninstrumented functions back.
+    """
+    global _collectors
+    _current.set(None)
+    with _lock:
+        _collectors = 0
+        _restore()
+
+
+@contextmanager
+def collect(stats=None):
+    """Collect statistics in the calling thread for the duration of a with block."""
+    previous = current()
+    collected = enable(stats)
+    try:
+        yield collected
+    finally:
+        disable()
+        if previous is not None:
+            enable(previous)
+
+
+def _install():
+    for module_name, targets in INSTRUMENTED.items():
+        module = import_module(module_name)
+        for path, kind, name in targets:
+            *owner_path, attribute = path.split(".")
+            owner = module
+            for part in owner_path:
+                owner = getattr(owner, part)
+            original = getattr(owner, attribute, None)
+            if original is None:
+                continue
+            _originals.append((owner, attribute, original))
+            setattr(owner, attribute, _wrap(original, name, kind))
+
+
+def _restore():
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+
+
+def _wrap(function, name, kind):
+    if kind == "timed":
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            stats = _current.get()
+            if stats is None:
+                return function(*args, **kwargs)
+            stats.counts[name] += 1
+            start = default_timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.seconds[name] += default_timer() - start
+    elif kind == "sized":
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            result = function(*args, **kwargs)
+            stats = _current.get()
+            if stats is not None:
+                stats.counts[name] += len(result)
+            return result
+    elif kind == "yielded":
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            stats = _current.get()
+            if stats is None:
+                return function(*args, **kwargs)
+            return _counted(function(*args, **kwargs), stats, name)
+    elif kind == "queue":
+        @wraps(function)
+        def wrapper(queue, *args, **kwargs):
+            result = function(queue, *args, **kwargs)
+            stats = _current.get()
+            if stats is not None:
+                stats.counts[name] += 1
+                stats.peak("search.queue_size", len(queue))
+            return result
+    else:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            stats = _current.get()
+            if stats is not None:
+                stats.counts[name] += 1
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def _counted(items, stats, name):
+    for item in items:
+        stats.counts[name] += 1
+        yield item
@@ -1,8 +1,7 @@
 import pygame
 import sys
 from graph import Point
-from vis_graph import VisGraph
-from visible_vertices import visible_vertices
+from graph_worker import GraphWorker
 
 pygame.init()
 
@@ -40,7 +39,8 @@ polygons = []
 current_nodes = []
 shortest_path = []
 visibility_graph_edges = []
-visibility_light =[]
+visibility_light = set()
+show_visibility = False
 
 
 def draw_buttons():
@@ -50,6 +50,14 @@ def draw_buttons():
         text = font.render(button["label"], True, BLACK)
         screen.blit(text, text.get_rect(center=button["rect"].center))
 
+def draw_progress(worker):
+    done, submitted = worker.progress()
+    if done < submitted:
+        text = font.render(f"Updating visibility graph... {done}/{submitted} polygons",
+                           True, BLACK)
+        screen.blit(text, (1070, 20))
+
+
 def draw_visibility_graph(path):
     for i in range(len(path) - 1):
         start = (path[i].x, HEIGHT - path[i].y)
@@ -77,20 +85,38 @@ def parse_visibility_graph(data):
 
 
 def draw_visibility_graph_visible(graph):
-    # Iterate through each edge in the graph (list of tuples of Points)
+    # Iterate through each edge in the graph (set of Edges)
     for edge in graph:  
-        start_pos = (int(edge[0].x), HEIGHT - int(edge[0].y))  # Convert start point to screen coordinates
-        end_pos = (int(edge[1].x), HEIGHT - int(edge[1].y))  # Convert end point to screen coordinates
+        start_pos = (int(edge.p1.x), HEIGHT - int(edge.p1.y))  # Convert start point to screen coordinates
+        end_pos = (int(edge.p2.x), HEIGHT - int(edge.p2.y))  # Convert end point to screen coordinates
 
         # Draw the line connecting the start and end of the edge
         pygame.draw.line(screen, YELLOW, start_pos, end_pos, 1)
 
 def main():
-    global selecting_start, selecting_end, start_point, end_point, points, current_nodes, polygons, shortest_path, visibility_graph_edges,visibility_light
+    global selecting_start, selecting_end, start_point, end_point, points, current_nodes, polygons, shortest_path, visibility_graph_edges,visibility_light,show_visibility
     running = True
-    vis_graph_built = False
+    worker = GraphWorker()
+    clock = pygame.time.Clock()
 
     while running:
+        # Pick up the results of the background graph updates
+        while not worker.results.empty():
+            generation, kind, value = worker.results.get()
+            if generation != worker.generation:
+                continue
+            if kind == "edges":
+                added, removed = value
+                visibility_light.difference_update(removed)
+                visibility_light.update(added)
+            elif kind == "reset":
+                visibility_light = set()
+            elif kind == "path":
+                shortest_path = value
+                print("Shortest Path:", shortest_path)
+            else:
+                print(value)
+
         screen.fill(WHITE)
 
         # Draw polygons
@@ -123,12 +149,13 @@ def main():
         if shortest_path:
             draw_visibility_graph(shortest_path)
 
-        if visibility_light:
-            draw_visibility_graph_visible(visibility_light)    
+        if show_visibility and visibility_light:
+            draw_visibility_graph_visible(visibility_light)
 
 
 
         draw_buttons()
+        draw_progress(worker)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -145,37 +172,17 @@ def main():
                             selecting_end = True
                         elif i == 2:
                             if start_point and end_point:
-                                # Build visibility graph and calculate shortest path
-                                polys = [
-                                    [Point(node[0], HEIGHT - node[1]) for node in poly]
-                                    for poly in polygons
-                                ]
-                                g = VisGraph()
-                                g.build(polys)
-                                shortest_path = g.shortest_path(
+                                # Computed on the persistent graph once the pending polygons are added
+                                worker.shortest_path(
                                     Point(start_point[0], HEIGHT - start_point[1]),
                                     Point(end_point[0], HEIGHT - end_point[1]),
                                 )
-                                print("Shortest Path:", shortest_path)
                             else:
                                 print("Start and End Points must be defined.")
                         elif i == 3:
-                            # Build and display the visibility graph
-                            polys = [
-                                [Point(node[0], HEIGHT - node[1]) for node in poly]
-                                for poly in polygons
-                            ]
-                            g = VisGraph()
-                            g.build(polys)
-                            
-                            v1 = g.graph
-                            v2 = g.pts
-                            visibility_light = []
-    
-                            for p1 in v2:
-                                 for p2 in visible_vertices(p1, v1):
-                                    visibility_light.append((p1, p2))
-                
+                            # Show or hide the edges of the persistent graph
+                            show_visibility = not show_visibility
+
                         elif i == 4:
                             start_point = None
                             end_point = None
@@ -184,7 +191,9 @@ def main():
                             current_nodes = []
                             shortest_path = []
                             visibility_graph_edges = []
-                            visibility_light=[]
+                            visibility_light = set()
+                            show_visibility = False
+                            worker.reset()
 
                 if not any(button["rect"].collidepoint(event.pos) for button in buttons):
                     if selecting_start and event.button == 1:
@@ -207,9 +216,11 @@ def main():
                         if len(current_nodes) > 2:
                             current_nodes.append(current_nodes[0])
                             polygons.append(current_nodes)
+                            worker.add_polygon([Point(node[0], HEIGHT - node[1]) for node in current_nodes])
                             current_nodes = []
 
         pygame.display.flip()
+        clock.tick(60)  # leave the worker thread time to compute between frames
 
     pygame.quit()
     sys.exit()
@@ -0,0 +1,39 @@
+from math import asin, cos, radians, sin, sqrt
+import numpy as np
+
+from visible_vertices import edge_distance
+
+EARTH_RADIUS = 6371.0088  # mean earth radius in km, as used by the haversine package
+
+
+def euclidean(x1, y1, x2, y2):
+    """Planar distance between coordinate arrays."""
+    return np.hypot(x2 - x1, y2 - y1)
+
+
+def haversine(x1, y1, x2, y2):
+    """Great-circle distance in km between longitude/latitude arrays in degrees."""
+    x1, y1, x2, y2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (x1, y1, x2, y2))
+    a = np.sin((y2 - y1) / 2) ** 2 + np.cos(y1) * np.cos(y2) * np.sin((x2 - x1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def haversine_distance(p1, p2):
+    """Great-circle distance in km between two Points in longitude/latitude."""
+    y1, y2 = radians(p1.y), radians(p2.y)
+    a = sin((y2 - y1) / 2) ** 2 + cos(y1) * cos(y2) * sin(radians(p2.x - p1.x) / 2) ** 2
+    return 2 * EARTH_RADIUS * asin(min(1.0, sqrt(a)))
+
+
+# name -> (vectorized function of coordinate arrays, function of two Points)
+METRICS = {
+    "euclidean": (euclidean, edge_distance),
+    "haversine": (haversine, haversine_distance),
+}
+
+
+def get_metric(name):
+    """Return the (array, point) distance functions of a metric name."""
+    if name not in METRICS:
+        raise ValueError(f"Unknown metric: {name!r}")
+    return METRICS[name]
@@ -0,0 +1,319 @@
+from math import floor, sqrt
+import numpy as np
+
+from graph import Edge, Point, SortedPoints, VertexIds
+
+SEED_PADDING = 1e-9  # y slack when bucketing edges, covers rounding of the edge ends
+
+
+class PreparedObstacles:
+    """
+    Frozen, array-backed view of an obstacle Graph for the visibility sweep.
+
+    Built once per Graph and shared by every visible_vertices call, so the
+    sweep no longer copies the point and edge sets or scans every edge to
+    seed the open edges.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.points = tuple(graph.get_points())
+        self.edges = tuple(graph.get_edges())
+        self.index = VertexIds(self.points)  # point -> vertex id, its position in points
+        # Vertex ids of the ends of every edge.
+        self.e1 = tuple(self.index[edge.p1] for edge in self.edges)
+        self.e2 = tuple(self.index[edge.p2] for edge in self.edges)
+
+        self.xs, self.ys = point_arrays(self.points)
+        self.polygon_ids = np.fromiter((point.polygon_id for point in self.points), dtype=np.int32,
+                                       count=len(self.points))
+        self.e1x, self.e1y = point_arrays([edge.p1 for edge in self.edges])
+        self.e2x, self.e2y = point_arrays([edge.p2 for edge in self.edges])
+        self._build_incident()
+        self._build_polygons(graph.polygons)
+        self._build_reflex(graph.polygons)
+        self._prepare()
+
+    @classmethod
+    def from_arrays(cls, xs, ys, polygon_ids, edges, edge_polygons):
+        """
+        Prepare the obstacle arrays of a graph file, see Graph.to_arrays,
+        without building the Graph: the coordinate arrays are used as they
+        are and vertex ids are looked up in the sorted coordinates. graph is
+        None; Graph.from_arrays rebuilds it where it is needed.
+        """
+        obstacles = cls.__new__(cls)
+        obstacles.graph = None
+        obstacles.points = tuple(Point(x, y, polygon_id) for x, y, polygon_id
+                                 in zip(xs.tolist(), ys.tolist(), polygon_ids.tolist()))
+        obstacles.index = SortedPoints(xs, ys)
+        e1, e2 = edges[:, 0], edges[:, 1]
+        obstacles.e1, obstacles.e2 = tuple(e1.tolist()), tuple(e2.tolist())
+        obstacles.edges = tuple(Edge(obstacles.points[i], obstacles.points[j])
+                                for i, j in zip(obstacles.e1, obstacles.e2))
+
+        obstacles.xs, obstacles.ys = np.array(xs, dtype=np.float64), np.array(ys, dtype=np.float64)
+        obstacles.polygon_ids = np.array(polygon_ids, dtype=np.int32)
+        obstacles.e1x, obstacles.e1y = obstacles.xs[e1], obstacles.ys[e1]
+        obstacles.e2x, obstacles.e2y = obstacles.xs[e2], obstacles.ys[e2]
+        polygons = {}
+        for edge, polygon_id in zip(obstacles.edges, edge_polygons.tolist()):
+            if polygon_id != -1:
+                polygons.setdefault(polygon_id, []).append(edge)
+        obstacles._build_incident()
+        obstacles._build_polygons(polygons)
+        obstacles._build_reflex(polygons)
+        obstacles._prepare()
+        return obstacles
+
+    def with_polygon(self, graph, edges):
+        """
+        Return the prepared view of graph, the Graph of these obstacles with
+        one more polygon, whose edges are edges. Only the new polygon is
+        prepared: its vertices and edges get the next ids and the rest is
+        shared with this view, which stays valid. A polygon that shares a
+        vertex with the others is prepared with all of graph.
+        """
+        edges = tuple(edges)
+        points = tuple(dict.fromkeys(point for edge in edges for point in (edge.p1, edge.p2)))
+        if any(point in self.index for point in points):
+            return PreparedObstacles(graph)
+        obstacles = self._copy(graph)
+        obstacles.index = VertexIds(self.points) if isinstance(self.index, SortedPoints) else self.index.copy()
+        for point in points:
+            obstacles.index.add(point)
+        obstacles.points = self.points + points
+        obstacles.edges = self.edges + edges
+        e1 = tuple(obstacles.index[edge.p1] for edge in edges)
+        e2 = tuple(obstacles.index[edge.p2] for edge in edges)
+        obstacles.e1, obstacles.e2 = self.e1 + e1, self.e2 + e2
+
+        xs, ys = point_arrays(points)
+        obstacles.xs, obstacles.ys = np.concatenate((self.xs, xs)), np.concatenate((self.ys, ys))
+        polygon_ids = np.fromiter((point.polygon_id for point in points), dtype=np.int32, count=len(points))
+        obstacles.polygon_ids = np.concatenate((self.polygon_ids, polygon_ids))
+        e1x, e1y = point_arrays([edge.p1 for edge in edges])
+        e2x, e2y = point_arrays([edge.p2 for edge in edges])
+        obstacles.e1x, obstacles.e1y = np.concatenate((self.e1x, e1x)), np.concatenate((self.e1y, e1y))
+        obstacles.e2x, obstacles.e2y = np.concatenate((self.e2x, e2x)), np.concatenate((self.e2y, e2y))
+
+        incident, adjacent_ids = _incident(len(points), edges, e1, e2, len(self.points), len(self.edges))
+        obstacles.incident = self.incident + incident
+        obstacles.adjacent_ids = self.adjacent_ids + adjacent_ids
+        obstacles.adjacent = self.adjacent + tuple(
+            frozenset(obstacles.points[j] for j in ids) for ids in adjacent_ids)
+        obstacles.polygons = dict(self.polygons)
+        reflex = ()
+        if points and points[0].polygon_id in graph.polygons:
+            obstacles.polygons[points[0].polygon_id] = PolygonEdges(edges)
+            reflex = _reflex_points(edges)
+        obstacles.reflex = self.reflex + tuple(point in reflex for point in points)
+        obstacles._prepare()
+        return obstacles
+
+    def without_polygon(self, graph, polygon_id, edges):
+        """
+        Return the prepared view of graph, the Graph of these obstacles with
+        the polygon polygon_id, whose edges were edges, removed, and an
+        array mapping every vertex id of this view to its id in the new
+        one, -1 for the removed vertices. The other polygons keep their
+        prepared edges and the rest is filtered, not prepared again.
+        """
+        points = {point for edge in edges for point in (edge.p1, edge.p2)}
+        if any(point in graph for point in points):
+            obstacles = PreparedObstacles(graph)
+            return obstacles, obstacles.ids_of(self.xs, self.ys)
+        keep = np.ones(len(self.points), dtype=bool)
+        keep[[self.index[point] for point in points]] = False
+        renumber = np.where(keep, np.cumsum(keep) - 1, -1)
+        kept_edges = keep[np.asarray(self.e1, dtype=np.int64)]
+        edge_renumber = np.where(kept_edges, np.cumsum(kept_edges) - 1, -1).tolist()
+        vertex_renumber = renumber.tolist()
+        kept, kept_edge_ids = np.flatnonzero(keep).tolist(), np.flatnonzero(kept_edges).tolist()
+
+        obstacles = self._copy(graph)
+        obstacles.points = tuple(self.points[i] for i in kept)
+        obstacles.index = VertexIds(obstacles.points)
+        obstacles.edges = tuple(self.edges[k] for k in kept_edge_ids)
+        obstacles.e1 = tuple(vertex_renumber[self.e1[k]] for k in kept_edge_ids)
+        obstacles.e2 = tuple(vertex_renumber[self.e2[k]] for k in kept_edge_ids)
+        obstacles.xs, obstacles.ys = self.xs[keep], self.ys[keep]
+        obstacles.polygon_ids = self.polygon_ids[keep]
+        obstacles.e1x, obstacles.e1y = self.e1x[kept_edges], self.e1y[kept_edges]
+        obstacles.e2x, obstacles.e2y = self.e2x[kept_edges], self.e2y[kept_edges]
+        obstacles.incident = tuple(tuple((edge, edge_renumber[k], is_p1) for edge, k, is_p1 in self.incident[i])
+                                   for i in kept)
+        obstacles.adjacent_ids = tuple(frozenset(vertex_renumber[j] for j in self.adjacent_ids[i])
+                                       for i in kept)
+        obstacles.adjacent = tuple(self.adjacent[i] for i in kept)
+        obstacles.polygons = {key: polygon for key, polygon in self.polygons.items() if key != polygon_id}
+        obstacles.reflex = tuple(self.reflex[i] for i in kept)
+        obstacles._prepare()
+        return obstacles, renumber
+
+    def _copy(self, graph):
+        obstacles = PreparedObstacles.__new__(PreparedObstacles)
+        obstacles.graph = graph
+        return obstacles
+
+    def _prepare(self):
+        for array in (self.xs, self.ys, self.e1x, self.e1y, self.e2x, self.e2y):
+            array.flags.writeable = False
+        self._build_seed_index()
+        self._sorted = None
+
+    def _build_incident(self):
+        """
+        Per vertex: (edge, edge index, vertex is edge.p1) for its edges, and
+        the ids of its neighbours along them.
+        """
+        self.incident, self.adjacent_ids = _incident(len(self.points), self.edges, self.e1, self.e2)
+        self.adjacent = tuple(frozenset(self.points[j] for j in ids) for ids in self.adjacent_ids)
+
+    def _build_seed_index(self):
+        """Bucket edges by y extent so a horizontal ray only tests its bucket."""
+        self._seed_index = EdgeYIndex(self.e1y, self.e2y)
+
+    def _build_polygons(self, polygons):
+        """Bounding box and y-indexed edge arrays for every polygon."""
+        self.polygons = {
+            polygon_id: PolygonEdges(edges)
+            for polygon_id, edges in polygons.items()
+        }
+
+    def _build_reflex(self, polygons):
+        """Per vertex: True if its interior angle in its polygon exceeds pi."""
+        reflex = [False] * len(self.points)
+        for edges in polygons.values():
+            for vertex in _reflex_points(edges):
+                reflex[self.index[vertex]] = True
+        self.reflex = tuple(reflex)
+
+    def ids_of(self, xs, ys):
+        """Return the vertex ids of the points (xs, ys), -1 for those that are not vertices."""
+        if self._sorted is None:
+            self._sorted = self.index if isinstance(self.index, SortedPoints) else SortedPoints(self.xs, self.ys)
+        return self._sorted.ids(xs, ys)
+
+    def is_reflex(self, point):
+        i = self.index.get(point)
+        return i is not None and self.reflex[i]
+
+    def seed_candidates(self, y):
+        """Return indices, ascending, of the edges whose y extent may contain y."""
+        return self._seed_index.candidates(y)
+
+    def adjacent_points(self, point):
+        i = self.index.get(point)
+        return self.adjacent[i] if i is not None else frozenset()
+
+    @classmethod
+    def of(cls, obstacles):
+        """Return obstacles if already prepared, otherwise prepare the Graph."""
+        return obstacles if isinstance(obstacles, cls) else cls(obstacles)
+
+
+class EdgeYIndex:
+    """
+    Edges bucketed into equal-height horizontal bands by their y extent, so
+    the edges a horizontal line can meet are found without a full scan.
+    """
+
+    def __init__(self, e1y, e2y):
+        count = len(e1y)
+        self._bins = max(1, int(sqrt(count)))
+        if count == 0:
+            self._y0, self._height = 0.0, 1.0
+            self._bin_ptr = np.zeros(self._bins + 1, dtype=np.int64)
+            self._bin_edges = np.zeros(0, dtype=np.int64)
+            return
+        ymin = np.minimum(e1y, e2y) - SEED_PADDING
+        ymax = np.maximum(e1y, e2y) + SEED_PADDING
+        self._y0 = float(ymin.min())
+        self._height = (float(ymax.max()) - self._y0) / self._bins or 1.0
+        lo = self._bin_of(ymin)
+        hi = self._bin_of(ymax)
+        spans = hi - lo + 1
+        edge_ids = np.repeat(np.arange(count), spans)
+        offsets = np.arange(len(edge_ids)) - np.repeat(np.cumsum(spans) - spans, spans)
+        bins = np.repeat(lo, spans) + offsets
+        order = np.argsort(bins, kind='stable')
+        self._bin_edges = edge_ids[order]
+        self._bin_ptr = np.zeros(self._bins + 1, dtype=np.int64)
+        np.cumsum(np.bincount(bins, minlength=self._bins), out=self._bin_ptr[1:])
+
+    def _bin_of(self, y):
+        return np.clip(((y - self._y0) // self._height).astype(np.int64), 0, self._bins - 1)
+
+    def candidates(self, y):
+        """Return indices, ascending, of the edges whose y extent may contain y."""
+        offset = (y - self._y0) / self._height
+        if offset < 0 or offset > self._bins:
+            return self._bin_edges[:0]
+        b = min(int(floor(offset)), self._bins - 1)
+        return self._bin_edges[self._bin_ptr[b]:self._bin_ptr[b + 1]]
+
+
+class PolygonEdges:
+    """
+    Edge arrays of one polygon with its bounding box and a y index, for
+    crossing-number tests that reject outside points immediately.
+    """
+
+    def __init__(self, edges):
+        self.edges = tuple(edges)
+        self.e1x, self.e1y = point_arrays([edge.p1 for edge in self.edges])
+        self.e2x, self.e2y = point_arrays([edge.p2 for edge in self.edges])
+        if self.edges:
+            self.xmin = float(min(self.e1x.min(), self.e2x.min()))
+            self.xmax = float(max(self.e1x.max(), self.e2x.max()))
+            self.ymin = float(min(self.e1y.min(), self.e2y.min()))
+            self.ymax = float(max(self.e1y.max(), self.e2y.max()))
+        else:
+            self.xmin = self.ymin = float('inf')
+            self.xmax = self.ymax = float('-inf')
+        self.y_index = EdgeYIndex(self.e1y, self.e2y)
+
+    def in_bbox(self, x, y):
+        return self.xmin <= x <= self.xmax and self.ymin <= y <= self.ymax
+
+
+def _incident(count, edges, e1, e2, first_vertex=0, first_edge=0):
+    """
+    Return the incident edges and the adjacent vertex ids of the count
+    vertices from first_vertex on, whose edges are edges, with the ids of
+    their ends e1 and e2, numbered from first_edge on.
+    """
+    incident = [[] for _ in range(count)]
+    adjacent = [set() for _ in range(count)]
+    for k, (edge, i, j) in enumerate(zip(edges, e1, e2), first_edge):
+        incident[i - first_vertex].append((edge, k, True))
+        incident[j - first_vertex].append((edge, k, False))
+        adjacent[i - first_vertex].add(j)
+        adjacent[j - first_vertex].add(i)
+    return tuple(tuple(edges) for edges in incident), tuple(frozenset(ids) for ids in adjacent)
+
+
+def _reflex_points(edges):
+    """Return the vertices of a polygon, given by its edges, whose interior angle exceeds pi."""
+    following = {edge.p1: edge.p2 for edge in edges}
+    preceding = {edge.p2: edge.p1 for edge in edges}
+    area = sum(edge.p1.x * edge.p2.y - edge.p2.x * edge.p1.y for edge in edges)
+    reflex = set()
+    for vertex, after in following.items():
+        before = preceding.get(vertex)
+        if before is None:
+            continue
+        turn = (vertex.x - before.x) * (after.y - before.y) - \
+               (vertex.y - before.y) * (after.x - before.x)
+        if turn * area < 0:
+            reflex.add(vertex)
+    return reflex
+
+
+def point_arrays(points):
+    """Return the x and y coordinates of points as two float64 arrays."""
+    count = len(points)
+    xs = np.fromiter((p.x for p in points), dtype=np.float64, count=count)
+    ys = np.fromiter((p.y for p in points), dtype=np.float64, count=count)
+    return xs, ys
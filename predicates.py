@@ -0,0 +1,137 @@
+from math import sqrt
+import numpy as np
+
+CCW = 1     #counter-clockwise
+CW = -1     #clockwise
+CLNR = 0    #collinear
+
+EPSILON = 2.0 ** -53  # unit roundoff of float64
+# Relative error bound of the floating-point orientation determinant
+# (Shewchuk's ccwerrboundA): if |det| exceeds it times the sum of the
+# magnitudes of its two products, the sign of det is certainly right.
+ORIENT_BOUND = (3.0 + 16.0 * EPSILON) * EPSILON
+# Absolute error bound of the cosines compared by compare_angles, taken
+# generously over the rounding of the differences, products and roots.
+COSINE_BOUND = 64.0 * EPSILON
+
+
+def orient(ax, ay, bx, by, cx, cy):
+    """
+    Orientation of the points a, b, c: CCW, CW or CLNR (collinear).
+
+    The floating-point determinant decides unless it is within its error
+    bound of zero; only those near-degenerate cases are computed exactly.
+    The result is exact for any float coordinates, whatever their scale.
+    """
+    left = (bx - ax) * (cy - ay)
+    right = (by - ay) * (cx - ax)
+    det = left - right
+    bound = ORIENT_BOUND * (abs(left) + abs(right))
+    if det > bound:
+        return CCW
+    if -det > bound:
+        return CW
+    return _orient_exact(ax, ay, bx, by, cx, cy)
+
+
+def ccw(A, B, C):
+    """orient of three Points; the same filter, inlined for the sweep's hot loops."""
+    left = (B.x - A.x) * (C.y - A.y)
+    right = (B.y - A.y) * (C.x - A.x)
+    det = left - right
+    bound = ORIENT_BOUND * (abs(left) + abs(right))
+    if det > bound:
+        return CCW
+    if -det > bound:
+        return CW
+    return _orient_exact(A.x, A.y, B.x, B.y, C.x, C.y)
+
+
+def orient_array(ax, ay, bx, by, cx, cy):
+    """
+    Vectorized orient; arguments are coordinates or arrays of coordinates.
+    A product with a zero difference is exactly zero, and the other then
+    has the sign of its differences, so collinear points on axis-parallel
+    lines, and repeated points, are decided without the exact computation.
+    """
+    dx1, dy2, dy1, dx2 = bx - ax, cy - ay, by - ay, cx - ax
+    left = dx1 * dy2
+    right = dy1 * dx2
+    det = left - right
+    signs = np.array(np.sign(det), dtype=np.int8)
+    uncertain = np.abs(det) <= ORIENT_BOUND * (np.abs(left) + np.abs(right))
+    if uncertain.any():
+        zero_left = (dx1 == 0) | (dy2 == 0)
+        zero_right = (dy1 == 0) | (dx2 == 0)
+        exact = np.where(zero_left, -np.sign(dy1) * np.sign(dx2), np.sign(dx1) * np.sign(dy2))
+        repeated = (bx == cx) & (by == cy)
+        exact = np.where((zero_left & zero_right) | repeated, 0, exact)
+        decided = uncertain & (zero_left | zero_right | repeated)
+        signs[decided] = np.broadcast_to(exact, signs.shape)[decided]
+        uncertain &= ~decided
+    if uncertain.any():
+        coordinates = [np.broadcast_to(a, signs.shape)[uncertain].tolist()
+                       for a in (ax, ay, bx, by, cx, cy)]
+        signs[uncertain] = [_orient_exact(*point) for point in zip(*coordinates)]
+    return signs
+
+
+def _orient_exact(ax, ay, bx, by, cx, cy):
+    """
+    orient in exact integer arithmetic, for the cases the filter cannot
+    decide: every float is an integer over a power of two, so scaled to
+    their largest denominator the coordinates become integers.
+    """
+    ax, ay, bx, by, cx, cy = _integers(ax, ay, bx, by, cx, cy)
+    det = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    return CCW if det > 0 else CW if det < 0 else CLNR
+
+
+def _integers(*values):
+    """Scale floats, each an integer over a power of two, to integers by their largest denominator."""
+    ratios = [float(value).as_integer_ratio() for value in values]
+    scale = max(denominator for _, denominator in ratios)
+    return [numerator * (scale // denominator) for numerator, denominator in ratios]
+
+
+def compare_angles(ax, ay, bx, by, cx, cy, dx, dy):
+    """
+    Compare the angles ABC and ABD at b, each in [0, pi]: -1 if ABC is the
+    smaller, 1 if it is the larger and 0 if they are equal. A degenerate
+    angle, with c or d equal to b, counts as a right angle.
+
+    The cosines decide unless they are within their error bound of each
+    other; only those cases are computed exactly.
+    """
+    ux, uy = ax - bx, ay - by
+    cos_c = _cosine(ux, uy, cx - bx, cy - by)
+    cos_d = _cosine(ux, uy, dx - bx, dy - by)
+    if cos_c > cos_d + COSINE_BOUND:
+        return -1
+    if cos_d > cos_c + COSINE_BOUND:
+        return 1
+    return _compare_angles_exact(ax, ay, bx, by, cx, cy, dx, dy)
+
+
+def _cosine(ux, uy, vx, vy):
+    lengths = sqrt((ux * ux + uy * uy) * (vx * vx + vy * vy))
+    return (ux * vx + uy * vy) / lengths if lengths else 0.0
+
+
+def _compare_angles_exact(ax, ay, bx, by, cx, cy, dx, dy):
+    """compare_angles in exact integer arithmetic, see _orient_exact."""
+    ax, ay, bx, by, cx, cy, dx, dy = _integers(ax, ay, bx, by, cx, cy, dx, dy)
+    ux, uy = ax - bx, ay - by
+    # The cosine of each angle is dot / sqrt(norm), up to the common |ab|.
+    keys = []
+    for vx, vy in ((cx - bx, cy - by), (dx - bx, dy - by)):
+        dot, norm = ux * vx + uy * vy, vx * vx + vy * vy
+        keys.append((0, 1) if norm == 0 else (dot, norm))
+    (dot_c, norm_c), (dot_d, norm_d) = keys
+    if (dot_c >= 0) != (dot_d >= 0):
+        return -1 if dot_c >= 0 else 1
+    # Same signs: compare dot_c / sqrt(norm_c) with dot_d / sqrt(norm_d) squared.
+    difference = dot_c * dot_c * norm_d - dot_d * dot_d * norm_c
+    if dot_c < 0:
+        difference = -difference
+    return -1 if difference > 0 else 1 if difference < 0 else 0
@@ -0,0 +1,231 @@
+from math import comb
+import numpy as np
+from tqdm import tqdm
+
+from obstacles import EdgeYIndex, PreparedObstacles
+from predicates import orient
+from visible_vertices import (CCW, CLNR, bitangent, ccw, edge_in_polygon, edge_intersect,
+                              on_segment, smaller_angle)
+
+PROGRESS_STEP = 1 << 16  # pairs handled between progress bar updates
+NIL = -1  # no node in the rotation tree
+
+
+def rotational_visibility_edges(graph, show_progress=False, reduced=False):
+    """
+    Yield the visible pairs (p, q) of the obstacle graph with one rotational
+    sweep, after Overmars and Welzl, instead of one angular sweep per vertex.
+
+    A single direction rotates from -pi/2 to pi/2. Every pair is met once,
+    from its lexicographically smaller point, and each point only remembers
+    the obstacle edge its ray hits first. When the ray from p passes through
+    a visible q, that edge is taken from the edges at q or from the edge q
+    itself sees, so every pair costs O(1) predicate calls. The pairs come
+    from a rotation tree, see _events: O(n^2) time over all pairs and O(n)
+    memory. The sweep is not output-sensitive; the O(n log n + k) variants
+    need a triangulation of the free space, which this package does not
+    build, and here the O(1) work per invisible pair is a few comparisons.
+    The edges are the same as those of visible_vertices: the same
+    predicates, the same rule for collinear points and the same interior
+    checks. With reduced, only bitangent pairs are yielded. Pairs are
+    yielded as the vertex ids of p and q in obstacles.points.
+    """
+    obstacles = PreparedObstacles.of(graph)
+    order = np.lexsort((obstacles.ys, obstacles.xs))
+    xs, ys = obstacles.xs[order], obstacles.ys[order]
+    ids = order.tolist()
+    points = [obstacles.points[i] for i in ids]
+    incident = [[(k, edge.p2 if is_p1 else edge.p1) for edge, k, is_p1 in obstacles.incident[i]]
+                for i in ids]
+    edges = obstacles.edges
+    ends = list(zip(obstacles.e1, obstacles.e2))  # vertex ids of the ends of every edge
+    adjacent = obstacles.adjacent_ids
+    nearest = _initial_edges(obstacles, xs, ys)
+    prev = [None] * len(points)
+    prev_visible = [False] * len(points)
+
+    with tqdm(total=comb(len(points), 2), disable=not show_progress,
+              desc="Building visibility graph (rotational)") as progress:
+        for count, (i, j) in enumerate(_events(xs.tolist(), ys.tolist()), 1):
+            p, q = points[i], points[j]
+            vq = ids[j]
+            edge = nearest[i]
+            # Does the ray from p reach q before the edge it hits first?
+            reached = edge is None or vq in ends[edge] or not edge_intersect(p, q, edges[edge])
+
+            k = prev[i]
+            if k is not None and ccw(p, points[k], q) == CLNR and on_segment(p, points[k], q):
+                is_visible = prev_visible[i]
+                if is_visible:
+                    behind = nearest[k]
+                    if behind is not None and vq not in ends[behind] and \
+                            edge_intersect(points[k], q, edges[behind]):
+                        is_visible = False
+                    elif vq not in adjacent[ids[k]] and edge_in_polygon(points[k], q, obstacles):
+                        is_visible = False
+            else:
+                is_visible = reached
+            if is_visible and vq not in adjacent[ids[i]]:
+                is_visible = not edge_in_polygon(p, q, obstacles)
+            if is_visible and (not reduced or bitangent(p, q, obstacles)):
+                yield ids[i], vq
+
+            if reached:
+                nearest[i] = _next_edge(p, q, vq, incident[j], edge, ends, nearest[j])
+            prev[i] = j
+            prev_visible[i] = is_visible
+            if count % PROGRESS_STEP == 0:
+                progress.update(PROGRESS_STEP)
+        progress.update(progress.total - progress.n)
+
+def _next_edge(p, q, vq, incident, edge, ends, behind):
+    """Return the edge the ray from p hits first once it has swept past q, vertex vq."""
+    best = None
+    for candidate, other in incident:
+        if ccw(p, q, other) != CCW:
+            continue
+        if best is None or smaller_angle(p, q, other, best[1]):
+            best = (candidate, other)
+    if best is not None:
+        return best[0]
+    if edge is not None and vq in ends[edge]:
+        return behind
+    return edge
+
+
+def _initial_edges(obstacles, xs, ys):
+    """
+    Return, per point, the index of the edge first hit by a ray pointing
+    straight down and turned an infinitesimal angle counter-clockwise.
+    """
+    left = obstacles.e1x <= obstacles.e2x
+    lx = np.where(left, obstacles.e1x, obstacles.e2x)
+    ly = np.where(left, obstacles.e1y, obstacles.e2y)
+    rx = np.where(left, obstacles.e2x, obstacles.e1x)
+    ry = np.where(left, obstacles.e2y, obstacles.e1y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (ry - ly) / (rx - lx)
+    x_index = EdgeYIndex(lx, rx)
+
+    nearest = []
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        candidates = x_index.candidates(x)
+        spans = (lx[candidates] <= x) & (x < rx[candidates])
+        candidates = candidates[spans]
+        hit = ly[candidates] + slope[candidates] * (x - lx[candidates])
+        touching = ((lx[candidates] == x) & (ly[candidates] == y)) | \
+                   ((rx[candidates] == x) & (ry[candidates] == y))
+        below = (hit < y) & ~touching
+        candidates, hit = candidates[below], hit[below]
+        if len(candidates) == 0:
+            nearest.append(None)
+            continue
+        # Highest crossing first; at a shared vertex the steeper edge is above.
+        best = np.lexsort((slope[candidates], hit))[-1]
+        nearest.append(int(candidates[best]))
+    return nearest
+
+
+def _turn(xs, ys, a, b, c):
+    """
+    orient of the points a, b and c, never CLNR: collinear points count as
+    lifted by an infinitesimal y += e * x^2, and points on a vertical line
+    as moved by x -= e' * y^2, with e' much smaller than e. Sorted along a
+    line, every pair then comes after the pairs of smaller points with the
+    same point and before those of larger points: the order the sweep's
+    rule for collinear points needs.
+    """
+    turn = orient(xs[a], ys[a], xs[b], ys[b], xs[c], ys[c])
+    if turn == CLNR:
+        turn = _sign(xs[b], xs[a]) * _sign(xs[c], xs[a]) * _sign(xs[c], xs[b])
+    if turn == CLNR:
+        turn = _sign(ys[b], ys[a]) * _sign(ys[c], ys[a]) * _sign(ys[c], ys[b])
+    return turn
+
+
+def _sign(a, b):
+    return (a > b) - (a < b)
+
+
+def _events(xs, ys):
+    """
+    Yield every pair (i, j), i < j, of the points sorted by x then y, in an
+    order of the rotational sweep, using the rotation tree of Overmars and
+    Welzl: O(n^2) time and O(n) memory.
+
+    The parent of i in the tree is the point j it meets next; n stands for
+    a point above them all, the parent of the points that are done. The
+    children of a point are ordered by the angle of their pair with it, so
+    that every path turns left on its way to the root. Any leaf that is the
+    first child of its parent can be handled; a stack holds them in depth
+    first order and the last is handled first. Once past j, i moves to the
+    point it meets next, which is the parent of j or a point in the
+    triangle of i, j and that parent, found by walking down from the child
+    of the parent before j. Along every point, its pairs then come by angle
+    and, for collinear pairs, in the order of _turn.
+    """
+    n = len(xs)
+    top = n
+    parent, left, right, last = ([NIL] * (n + 1) for _ in range(4))  # last: rightmost child
+
+    def append(i, z):
+        # Make i the last child of z.
+        parent[i], left[i], right[i] = z, last[z], NIL
+        if last[z] != NIL:
+            right[last[z]] = i
+        last[z] = i
+
+    def descend(i, z):
+        # Follow the last children of z that come before z around i.
+        while last[z] != NIL and _turn(xs, ys, i, z, last[z]) < 0:
+            z = last[z]
+        return z
+
+    if n == 0:
+        return
+    # Each point starts at the first point it meets, the tangent from it to
+    # the lower hull of the points after it.
+    append(n - 1, top)
+    for i in range(n - 2, -1, -1):
+        append(i, descend(i, n - 1))
+
+    stack = []
+    nodes = [top]
+    while nodes:
+        v = nodes.pop()
+        if last[v] == NIL:
+            if parent[v] != top and left[v] == NIL:
+                stack.append(v)
+            continue
+        child = last[v]
+        while child != NIL:
+            nodes.append(child)
+            child = left[child]
+
+    while stack:
+        i = stack.pop()
+        j = parent[i]
+        if j == top or left[i] != NIL or last[i] != NIL:
+            continue  # moved or given children since it was pushed
+        yield i, j
+
+        after, grand, z = right[i], parent[j], left[j]
+        # Take i out of the children of j.
+        if after != NIL:
+            left[after] = NIL
+        else:
+            last[j] = NIL
+        if z != NIL and (z > i if grand == top else _turn(xs, ys, i, grand, z) < 0):
+            append(i, descend(i, z))
+        else:
+            # Insert i before j among the children of grand.
+            parent[i], left[i], right[i], left[j] = grand, z, j, i
+            if z != NIL:
+                right[z] = i
+
+        if left[i] == NIL and parent[i] != top:
+            stack.append(i)
+        if after != NIL:
+            stack.append(after)
+        elif left[j] == NIL and parent[j] != top:
+            stack.append(j)
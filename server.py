@@ -0,0 +1,348 @@
+import argparse
+import asyncio
+import ipaddress
+import json
+import math
+import multiprocessing
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from timeit import default_timer
+from urllib.parse import urlsplit
+
+from graph import Point
+from vis_graph import VisGraph
+
+HOST = "127.0.0.1"  # loopback only, the server is not meant to be reachable from outside
+PORT = 8080
+MAX_BODY = 1 << 16  # bytes of JSON accepted per request
+LATENCY_WINDOW = 4096  # latest latencies kept per query kind for the percentiles
+RATE_WINDOW = 60.0  # seconds over which the recent throughput is measured
+QUERIES = ("shortest_path", "distance", "visible_vertices")
+# Query processes start on demand, after the server has sockets open; forked
+# from it they would keep client connections open past their close.
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+_STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+_worker_graph = None  # VisGraph of a query worker, see _init_worker
+
+
+class ServerMetrics:
+    """
+    Request counts, errors, coalesced requests and latencies of a
+    RoutingServer, per query kind.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = default_timer()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.coalesced = Counter()  # requests answered by an identical query in flight
+        self.in_flight = 0
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._finished = deque(maxlen=window)  # completion times, for the recent throughput
+
+    def record(self, kind, seconds, error=False):
+        now = default_timer()
+        self.requests[kind] += 1
+        if error:
+            self.errors[kind] += 1
+        self._latencies[kind].append(seconds)
+        self._finished.append(now)
+
+    def snapshot(self):
+        """Return the metrics as a JSON-serializable dict, latencies in ms."""
+        now = default_timer()
+        uptime = now - self.started
+        recent = [t for t in self._finished if now - t <= RATE_WINDOW]
+        span = min(RATE_WINDOW, uptime)
+        if len(recent) == self._finished.maxlen:
+            span = now - recent[0]  # the window holds fewer than RATE_WINDOW seconds
+        latency = {}
+        for kind, values in self._latencies.items():
+            ordered = sorted(values)
+            latency[kind] = {
+                'count': len(ordered),
+                'mean': 1000 * sum(ordered) / len(ordered),
+                'p50': 1000 * _percentile(ordered, 0.50),
+                'p95': 1000 * _percentile(ordered, 0.95),
+                'p99': 1000 * _percentile(ordered, 0.99),
+                'max': 1000 * ordered[-1],
+            }
+        total = sum(self.requests.values())
+        return {
+            'uptime': uptime,
+            'requests': dict(self.requests),
+            'errors': dict(self.errors),
+            'coalesced': dict(self.coalesced),
+            'in_flight': self.in_flight,
+            'throughput': total / uptime if uptime > 0 else 0.0,
+            'recent_throughput': len(recent) / span if span > 0 else 0.0,
+            'latency_ms': latency,
+        }
+
+
+class RoutingServer:
+    """
+    Serve shortest path, distance and visible vertices queries on one
+    saved visibility graph over HTTP, on a local TCP port or a Unix socket.
+
+    Queries are JSON objects POSTed to /shortest_path, /distance and
+    /visible_vertices; GET /metrics and /health report on the server. The
+    queries run in a pool of worker processes that each open the graph
+    file once; its arrays are memory-mapped, so the workers share its pages.
+    Identical queries arriving while one is running wait for its answer
+    rather than being computed again.
+    """
+
+    def __init__(self, filename, workers=1):
+        """
+        :param filename: Graph file written by VisGraph.save.
+        :param workers: Number of query processes; 0 runs the queries in a
+            single thread of this process instead.
+        """
+        self.filename = filename
+        self.workers = workers
+        self.graph = VisGraph()
+        self.graph.load(filename)
+        self.metrics = ServerMetrics()
+        self._executor = None
+        self._pending = {}  # query key -> future of the query computing it
+
+    async def start(self, host=HOST, port=PORT, path=None):
+        """
+        Start the query workers and listen on host:port, or on the Unix
+        socket path if given. Returns the asyncio.Server.
+
+        :param host: A loopback address; the server has no authentication,
+            so other hosts raise ValueError.
+        """
+        if path is None and not _is_loopback(host):
+            raise ValueError(f"Not a loopback address: {host!r}")
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(self.workers, multiprocessing.get_context(START_METHOD),
+                                                 initializer=_init_worker, initargs=(self.filename,))
+        else:
+            # VisGraph keeps an endpoint cache, so its queries run one at a time.
+            self._executor = ThreadPoolExecutor(1, initializer=_use_graph, initargs=(self.graph,))
+        if path is not None:
+            return await asyncio.start_unix_server(self._serve_connection, path=path)
+        return await asyncio.start_server(self._serve_connection, host, port)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def query(self, key):
+        """
+        Answer a query key, see _query_key, in the worker pool, sharing the
+        answer of an identical query in flight.
+        """
+        future = self._pending.get(key)
+        if future is not None:
+            self.metrics.coalesced[key[0]] += 1
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().run_in_executor(self._executor, _run_query, key)
+        self._pending[key] = future
+        future.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except ValueError as error:  # malformed request line, header or Content-Length
+                    writer.write(_response(400, {'error': str(error)}, False))
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, length = request
+                if length > MAX_BODY:
+                    writer.write(_response(413, {'error': "Request body too large"}, False))
+                    break
+                body = await reader.readexactly(length)
+
+                status, payload = await self._dispatch(method, urlsplit(target).path, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # client went away
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        """Route one request and return (status, JSON payload)."""
+        name = path.strip('/')
+        if name == 'metrics':
+            return (200, self.metrics.snapshot()) if method == 'GET' else (405, {'error': "Use GET"})
+        if name == 'health':
+            return 200, {'status': "ok", 'vertices': len(self.graph.csr),
+                         'edges': int(self.graph.csr.num_edges), 'metric': self.graph.metric,
+                         'reduced': bool(self.graph.reduced), 'contracted': self.graph.ch is not None}
+        if name not in QUERIES:
+            return 404, {'error': f"Unknown endpoint: {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST with a JSON body"}
+
+        start = default_timer()
+        self.metrics.in_flight += 1
+        try:
+            key = _query_key(name, json.loads(body or b'{}'))
+            status, payload = 200, await self.query(key)
+        except (ValueError, TypeError) as error:
+            status, payload = 400, {'error': str(error)}
+        except Exception as error:
+            status, payload = 500, {'error': f"{type(error).__name__}: {error}"}
+        finally:
+            self.metrics.in_flight -= 1
+        self.metrics.record(name, default_timer() - start, error=status != 200)
+        return status, payload
+
+
+async def serve(filename, host=HOST, port=PORT, path=None, workers=1):
+    """Run a RoutingServer until cancelled."""
+    routing = RoutingServer(filename, workers)
+    server = await routing.start(host, port, path)
+    where = path if path is not None else f"http://{host}:{port}"
+    print(f"Serving {filename} on {where} with {workers} query worker(s)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        routing.close()
+
+
+# Helper functions
+def _query_key(kind, request):
+    """
+    Validate a JSON query and turn it into a hashable key, which is also
+    the task sent to the workers: identical queries have equal keys.
+
+    shortest_path takes {"origin": [x, y], "destination": [x, y],
+    "method": "dijkstra"}, distance the same without method and
+    visible_vertices {"point": [x, y]}.
+    """
+    if not isinstance(request, dict):
+        raise ValueError("The request body must be a JSON object")
+    if kind == "visible_vertices":
+        return (kind, *_coordinates(request, 'point'))
+    key = (kind, *_coordinates(request, 'origin'), *_coordinates(request, 'destination'))
+    if kind == "shortest_path":
+        method = request.get('method', "dijkstra")
+        if method not in ("dijkstra", "astar", "bidirectional", "ch"):
+            raise ValueError(f"Unknown shortest path method: {method!r}")
+        key += (method,)
+    return key
+
+
+def _coordinates(request, name):
+    if name not in request:
+        raise ValueError(f"Missing {name!r}")
+    x, y = (float(value) for value in request[name])
+    if not (math.isfinite(x) and math.isfinite(y)):
+        raise ValueError(f"{name!r} must have finite coordinates")
+    return x, y
+
+
+async def _read_request(reader):
+    """
+    Read the request line and headers of one request. Returns (method,
+    target, version, headers, body length), or None once the client has
+    closed the connection. Raises ValueError for a malformed request.
+    """
+    request_line = await reader.readline()  # ValueError beyond the stream's line limit
+    if not request_line:
+        return None
+    parts = request_line.decode('latin-1').split()
+    if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+        raise ValueError("Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, colon, value = line.decode('latin-1').partition(':')
+        if not colon:
+            raise ValueError("Malformed header line")
+        headers[name.strip().lower()] = value.strip()
+    length = headers.get('content-length', '0')
+    if not (length.isascii() and length.isdigit()):
+        raise ValueError(f"Malformed Content-Length: {length!r}")
+    return (*parts, headers, int(length))
+
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {_STATUS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+def _init_worker(filename):
+    """
+    Pool initializer: open the graph file once per worker. Its arrays are
+    memory maps, so every worker reads the same pages.
+    """
+    global _worker_graph
+    _worker_graph = VisGraph()
+    _worker_graph.load(filename)
+
+
+def _use_graph(graph):
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _run_query(key):
+    """Answer a query key, see _query_key, on the graph of this worker."""
+    graph = _worker_graph
+    kind = key[0]
+    if kind == "visible_vertices":
+        vertices = graph.find_visible(Point(*key[1:3]))
+        return {'vertices': [[point.x, point.y] for point in vertices]}
+    origin, destination = Point(*key[1:3]), Point(*key[3:5])
+    if kind == "distance":
+        distance = float(graph.distances_from(origin, [destination])[0])
+        return {'distance': distance if math.isfinite(distance) else None}
+    path = graph.shortest_path(origin, destination, method=key[5])
+    if path is None:
+        return {'path': None, 'distance': None}
+    return {'path': [[point.x, point.y] for point in path], 'distance': graph.path_length(path)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve shortest path queries on a saved visibility graph.")
+    parser.add_argument("filename", nargs="?", default="GSHHS_c_L1.graph")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="query processes; 0 answers queries in a thread of the server")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.filename, HOST, args.port, args.unix, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import numpy as np
+
+from graph import Graph, Point
+
+
+def read_rings(filename, bbox=None, levels=None):
+    """
+    Read the polygon rings of a shapefile into flat coordinate arrays.
+
+    Every part of a shape, see shape.parts, is its own ring; its closing
+    point and repeated consecutive points are dropped. Ring k is made of
+    the points offsets[k] to offsets[k + 1] - 1.
+
+    :param filename: Shapefile name, with or without extension.
+    :param bbox: (xmin, ymin, xmax, ymax): keep only the shapes whose
+        bounding box overlaps it.
+    :param levels: Keep only the shapes whose "level" attribute is one of
+        these, e.g. (1,) for the land of a GSHHS file mixing levels.
+    :return: (xs, ys, offsets) as float64, float64 and int64 arrays.
+    """
+    import shapefile  # pyshp, only needed to read shapefiles
+
+    reader = shapefile.Reader(filename)
+    try:
+        if levels is not None:
+            if 'level' not in [field[0] for field in reader.fields]:
+                raise ValueError(f"{filename} has no level attribute")
+            levels = set(levels)
+            shapes = (item.shape for item in reader.iterShapeRecords(fields=['level'], bbox=bbox)
+                      if item.record['level'] in levels)
+        else:
+            shapes = reader.iterShapes(bbox=bbox)
+
+        chunks, sizes = [], []
+        for shape in shapes:
+            if not shape.points:
+                continue
+            points = np.asarray(shape.points, dtype=np.float64)[:, :2]
+            bounds = list(shape.parts) + [len(points)]
+            for start, stop in zip(bounds, bounds[1:]):
+                ring = _clean_ring(points[start:stop])
+                if len(ring):
+                    chunks.append(ring)
+                    sizes.append(len(ring))
+    finally:
+        reader.close()
+
+    coordinates = np.concatenate(chunks) if chunks else np.zeros((0, 2))
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    return coordinates[:, 0].copy(), coordinates[:, 1].copy(), offsets
+
+
+def load_graph(filename, bbox=None, levels=None):
+    """Read a shapefile, see read_rings, straight into an obstacle Graph."""
+    return Graph.from_rings(*read_rings(filename, bbox, levels))
+
+
+def ring_polygons(xs, ys, offsets):
+    """Return the rings of flat coordinate arrays as lists of Points."""
+    xs, ys, offsets = xs.tolist(), ys.tolist(), np.asarray(offsets).tolist()
+    return [[Point(x, y) for x, y in zip(xs[start:stop], ys[start:stop])]
+            for start, stop in zip(offsets, offsets[1:])]
+
+
+def _clean_ring(ring):
+    """Drop repeated consecutive points, including the closing point, of an (n, 2) ring."""
+    if len(ring) > 1:
+        ring = ring[np.any(ring != np.roll(ring, -1, axis=0), axis=1)]
+    return ring
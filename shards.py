@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+from graph_file import write_graph_file
+
+MANIFEST = "manifest.json"
+COMPLETED = "completed.txt"
+MERGE_BUCKET_EDGES = 1 << 23  # directed edges held in memory at once by merge
+
+
+class ShardStore:
+    """
+    A directory of visibility edge shards written by a checkpointed build.
+
+    Every finished batch of sweeps is saved as shard_<batch>.npy, an (m, 2)
+    array of (source, visible) obstacle point ids, and its id is appended to
+    completed.txt. manifest.json records what is being built, so a restarted
+    build only runs the batches that are not completed yet.
+    """
+
+    def __init__(self, directory, fingerprint, batches):
+        """
+        Open or create the store in directory.
+
+        :param fingerprint: Description of the build; a store made for a
+            different one is refused rather than resumed.
+        :param batches: Number of batches of the build.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        manifest = {'fingerprint': fingerprint, 'batches': batches}
+        path = os.path.join(directory, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as file:
+                if json.load(file) != manifest:
+                    raise ValueError(f"{directory} holds shards of a different build")
+        else:
+            _write_atomic(path, json.dumps(manifest).encode('utf-8'))
+        self.batches = batches
+        self.completed = self._read_completed()
+
+    def _read_completed(self):
+        completed = set()
+        path = os.path.join(self.directory, COMPLETED)
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    # A torn last line from an interrupted append is ignored.
+                    if line.endswith('\n') and os.path.exists(self._shard_path(int(line))):
+                        completed.add(int(line))
+        return completed
+
+    def pending(self):
+        """Return the ids of the batches that still have to be run."""
+        return [batch for batch in range(self.batches) if batch not in self.completed]
+
+    def write(self, batch, pairs):
+        """Save the (source, visible) id pairs of a finished batch."""
+        array = np.asarray(pairs, dtype=np.int32).reshape(-1, 2)
+        path = self._shard_path(batch)
+        with open(path + '.tmp', 'wb') as file:
+            np.save(file, array)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + '.tmp', path)
+        with open(os.path.join(self.directory, COMPLETED), 'a') as file:
+            file.write(f"{batch}\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self.completed.add(batch)
+
+    def merge(self, filename, xs, ys, polygon_ids, weight, arrays, **metadata):
+        """
+        Merge the shards into a graph file with the CSR adjacency of all
+        obstacle points, see VisGraph.save.
+
+        Both directions of every pair are spread over bucket files by source
+        id, then each bucket is deduplicated and appended to memory-mapped
+        indices and weights, so memory stays bounded by MERGE_BUCKET_EDGES.
+
+        :param weight: Vectorized edge weight of coordinate arrays, see metrics.
+        :param arrays: The other arrays of the graph file, i.e. the obstacles.
+        """
+        if len(self.completed) != self.batches:
+            raise ValueError(f"{self.batches - len(self.completed)} batches have not been built yet")
+        count = len(xs)
+        paths = [self._shard_path(batch) for batch in range(self.batches)]
+        directed = 2 * sum(len(np.load(path, mmap_mode='r')) for path in paths)
+        buckets = max(1, -(-directed // MERGE_BUCKET_EDGES))
+        rows = max(1, -(-count // buckets))
+        bucket_paths = [os.path.join(self.directory, f"bucket_{k:04d}.bin") for k in range(buckets)]
+
+        try:
+            bucket_files = [open(path, 'wb') for path in bucket_paths]
+            try:
+                for path in paths:
+                    pairs = np.load(path)
+                    both = np.concatenate((pairs, pairs[:, ::-1]))
+                    which = both[:, 0] // rows
+                    for k in np.unique(which).tolist():
+                        both[which == k].tofile(bucket_files[k])
+            finally:
+                for file in bucket_files:
+                    file.close()
+
+            indptr = np.zeros(count + 1, dtype=np.int32)
+            indices = np.memmap(os.path.join(self.directory, 'indices.bin'), dtype=np.int32,
+                                mode='w+', shape=(max(directed, 1),))
+            weights = np.memmap(os.path.join(self.directory, 'weights.bin'), dtype=np.float64,
+                                mode='w+', shape=(max(directed, 1),))
+            filled = 0
+            for path in bucket_paths:
+                both = np.fromfile(path, dtype=np.int32).reshape(-1, 2)
+                keys = np.unique(both[:, 0].astype(np.int64) * count + both[:, 1])
+                sources, targets = keys // count, keys % count
+                indptr[1:] += np.bincount(sources, minlength=count)[:count].astype(np.int32)
+                indices[filled:filled + len(keys)] = targets
+                weights[filled:filled + len(keys)] = weight(xs[sources], ys[sources], xs[targets], ys[targets])
+                filled += len(keys)
+            np.cumsum(indptr, out=indptr)
+
+            arrays = dict(arrays, xs=xs, ys=ys, polygon_ids=polygon_ids, indptr=indptr,
+                          indices=indices[:filled], weights=weights[:filled])
+            write_graph_file(filename, arrays, **metadata)
+            del indices, weights, arrays
+        finally:
+            for path in bucket_paths + [os.path.join(self.directory, name)
+                                        for name in ('indices.bin', 'weights.bin')]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _shard_path(self, batch):
+        return os.path.join(self.directory, f"shard_{batch:06d}.npy")
+
+
+def fingerprint(*arrays, **parameters):
+    """Return a digest of the obstacle arrays and build parameters."""
+    digest = hashlib.sha1(json.dumps(parameters, sort_keys=True).encode('utf-8'))
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _write_atomic(path, data):
+    with open(path + '.tmp', 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + '.tmp', path)
@@ -1,4 +1,5 @@
 from heapq import heapify, heappush, heappop
+from metrics import euclidean
 from visible_vertices import edge_distance
 
 try:
@@ -11,7 +12,7 @@ except AttributeError:
         return iter(d.items())
 
 
-def dijkstra(graph, origin, destination, add_to_visgraph=None):
+def dijkstra(graph, origin, destination, add_to_visgraph=None, distance=edge_distance):
     """Find shortest paths from origin to all vertices in the graph using Dijkstra's algorithm."""
     distances = {}  # Shortest distances to each vertex
     predecessors = {}  # Tracks the path
@@ -19,21 +20,17 @@ def dijkstra(graph, origin, destination, add_to_visgraph=None):
     priority_queue[origin] = 0  # Origin starts with distance 0
 
     while priority_queue:
-        current_vertex = priority_queue.pop_smallest()
-        distances[current_vertex] = priority_queue.get(current_vertex, 0)
+        current_vertex = priority_queue.smallest()
+        distances[current_vertex] = priority_queue[current_vertex]
+        priority_queue.pop_smallest()
 
         if current_vertex == destination:  # Stop if destination reached
             break
 
-        # Get adjacent edges
-        edges = graph[current_vertex]
-        if add_to_visgraph is not None and current_vertex in add_to_visgraph:
-            edges = edges | add_to_visgraph[current_vertex]
-
         # Relax edges
-        for edge in edges:
+        for edge in _edges(graph, current_vertex, add_to_visgraph):
             neighbor = edge.get_adjacent(current_vertex)
-            path_length = distances[current_vertex] + edge_distance(current_vertex, neighbor)
+            path_length = distances[current_vertex] + distance(current_vertex, neighbor)
             if neighbor in distances:  # Already visited
                 if path_length < distances[neighbor]:
                     raise ValueError("Graph contains a negative weight cycle")
@@ -44,10 +41,235 @@ def dijkstra(graph, origin, destination, add_to_visgraph=None):
     return distances, predecessors
 
 
-def shortest_path(graph, origin, destination, add_to_visgraph=None):
-    """Compute the shortest path from origin to destination."""
-    
-    distances, predecessors = dijkstra(graph, origin, destination, add_to_visgraph)
+def astar(graph, origin, destination, add_to_visgraph=None, distance=edge_distance):
+    """Find the shortest path from origin to destination with A*, using the
+    straight-line distance to destination as an admissible heuristic."""
+    distances = {}  # Settled shortest distances
+    tentative = {origin: 0}  # Best known distances of vertices in the queue
+    predecessors = {}
+    priority_queue = PriorityDict()
+    priority_queue[origin] = distance(origin, destination)
+
+    while priority_queue:
+        current_vertex = priority_queue.pop_smallest()
+        distances[current_vertex] = tentative.pop(current_vertex)
+
+        if current_vertex == destination:
+            break
+
+        for edge in _edges(graph, current_vertex, add_to_visgraph):
+            neighbor = edge.get_adjacent(current_vertex)
+            if neighbor in distances:
+                continue
+            path_length = distances[current_vertex] + distance(current_vertex, neighbor)
+            if neighbor not in tentative or path_length < tentative[neighbor]:
+                tentative[neighbor] = path_length
+                priority_queue[neighbor] = path_length + distance(neighbor, destination)
+                predecessors[neighbor] = current_vertex
+
+    return distances, predecessors
+
+
+def bidirectional_dijkstra(graph, origin, destination, add_to_visgraph=None,
+                           distance=edge_distance):
+    """Find the shortest path from origin to destination by growing Dijkstra
+    trees from both ends until no shorter meeting point can exist."""
+    distances = ({}, {})  # Settled distances from origin and from destination
+    tentative = ({origin: 0}, {destination: 0})
+    parents = ({}, {})
+    queues = (PriorityDict(), PriorityDict())
+    queues[0][origin] = 0
+    queues[1][destination] = 0
+    best, meeting = (0, origin) if origin == destination else (float('inf'), None)
+
+    while queues[0] and queues[1]:
+        if queues[0][queues[0].smallest()] + queues[1][queues[1].smallest()] >= best:
+            break
+        side = 0 if len(queues[0]) <= len(queues[1]) else 1
+        current_vertex = queues[side].pop_smallest()
+        distances[side][current_vertex] = tentative[side].pop(current_vertex)
+
+        for edge in _edges(graph, current_vertex, add_to_visgraph):
+            neighbor = edge.get_adjacent(current_vertex)
+            if neighbor in distances[side]:
+                continue
+            path_length = distances[side][current_vertex] + distance(current_vertex, neighbor)
+            if neighbor not in tentative[side] or path_length < tentative[side][neighbor]:
+                tentative[side][neighbor] = path_length
+                queues[side][neighbor] = path_length
+                parents[side][neighbor] = current_vertex
+            other = distances[1 - side].get(neighbor, tentative[1 - side].get(neighbor))
+            if other is not None and path_length + other < best:
+                best, meeting = path_length + other, neighbor
+
+    return _join_trees(parents, meeting, destination, best)
+
+
+def _join_trees(parents, meeting, destination, best):
+    """Join the two trees of a bidirectional search, which met at meeting,
+    into predecessors along a single origin-destination path."""
+    predecessors = {}
+    if meeting is None:
+        return {}, predecessors
+    vertex = meeting
+    while vertex in parents[0]:
+        predecessors[vertex] = parents[0][vertex]
+        vertex = parents[0][vertex]
+    vertex = meeting
+    while vertex in parents[1]:
+        predecessors[parents[1][vertex]] = vertex
+        vertex = parents[1][vertex]
+    return {destination: best}, predecessors
+
+
+def dijkstra_csr(csr, origin, destination, extra_edges=None):
+    """Dijkstra's algorithm over a CSRGraph with integer vertex ids.
+    extra_edges maps an id to (neighbour id, weight) pairs for temporary
+    query edges; ids from len(csr) on are query points outside the graph."""
+    return dijkstra_csr_targets(csr, origin, (destination,), extra_edges)
+
+
+def dijkstra_csr_targets(csr, origin, targets, extra_edges=None):
+    """Grow one Dijkstra tree over a CSRGraph from origin and stop once
+    every id in targets is settled, for one-to-many queries."""
+    remaining = set(targets)
+    distances = {}
+    predecessors = {}
+    tentative = {origin: 0.0}
+    heap = [(0.0, origin)]
+
+    while heap and remaining:
+        distance, current_vertex = heappop(heap)
+        if current_vertex in distances:
+            continue
+        distances[current_vertex] = distance
+        remaining.discard(current_vertex)
+        if not remaining:
+            break
+
+        for neighbor, weight in _csr_edges(csr, current_vertex, extra_edges):
+            path_length = distance + weight
+            if neighbor not in distances and path_length < tentative.get(neighbor, float('inf')):
+                tentative[neighbor] = path_length
+                predecessors[neighbor] = current_vertex
+                heappush(heap, (path_length, neighbor))
+
+    return distances, predecessors
+
+
+def astar_csr(csr, origin, destination, extra_edges=None, heuristic=None):
+    """A* over a CSRGraph with integer vertex ids. heuristic(i) is a lower
+    bound on the distance from id i to destination, 0 by default."""
+    distances = {}
+    predecessors = {}
+    tentative = {origin: 0.0}
+    heap = [(heuristic(origin) if heuristic else 0.0, origin)]
+
+    while heap:
+        _, current_vertex = heappop(heap)
+        if current_vertex in distances:
+            continue
+        distance = distances[current_vertex] = tentative[current_vertex]
+        if current_vertex == destination:
+            break
+
+        for neighbor, weight in _csr_edges(csr, current_vertex, extra_edges):
+            path_length = distance + weight
+            if neighbor not in distances and path_length < tentative.get(neighbor, float('inf')):
+                tentative[neighbor] = path_length
+                predecessors[neighbor] = current_vertex
+                heappush(heap, (path_length + (heuristic(neighbor) if heuristic else 0.0), neighbor))
+
+    return distances, predecessors
+
+
+def bidirectional_csr(csr, origin, destination, extra_edges=None):
+    """bidirectional_dijkstra over a CSRGraph with integer vertex ids;
+    extra_edges must hold every temporary edge in both directions."""
+    distances = ({}, {})
+    tentative = ({origin: 0.0}, {destination: 0.0})  # also keeps the settled distances
+    parents = ({}, {})
+    heaps = ([(0.0, origin)], [(0.0, destination)])
+    best, meeting = (0.0, origin) if origin == destination else (float('inf'), None)
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        distance, current_vertex = heappop(heaps[side])
+        if current_vertex in distances[side]:
+            continue
+        distances[side][current_vertex] = distance
+
+        for neighbor, weight in _csr_edges(csr, current_vertex, extra_edges):
+            if neighbor in distances[side]:
+                continue
+            path_length = distance + weight
+            if path_length < tentative[side].get(neighbor, float('inf')):
+                tentative[side][neighbor] = path_length
+                parents[side][neighbor] = current_vertex
+                heappush(heaps[side], (path_length, neighbor))
+            other = tentative[1 - side].get(neighbor)
+            if other is not None and path_length + other < best:
+                best, meeting = path_length + other, neighbor
+
+    return _join_trees(parents, meeting, destination, best)
+
+
+def _csr_edges(csr, vertex, extra_edges):
+    """Yield the (neighbour id, weight) pairs at vertex, including the
+    temporary query edges; ids from len(csr) on have only those."""
+    if vertex < len(csr):
+        indptr, indices, weights = csr.rows()
+        for k in range(indptr[vertex], indptr[vertex + 1]):
+            yield indices[k], weights[k]
+    if extra_edges is not None and vertex in extra_edges:
+        yield from extra_edges[vertex]
+
+
+def path_ids(predecessors, origin, destination):
+    """Return the ids on the path from origin to destination in a Dijkstra
+    tree, or None if destination was not reached."""
+    if destination != origin and destination not in predecessors:
+        return None
+    path = [destination]
+    while path[-1] != origin:
+        path.append(predecessors[path[-1]])
+    path.reverse()
+    return path
+
+
+SEARCHES = {
+    "dijkstra": dijkstra,
+    "astar": astar,
+    "bidirectional": bidirectional_dijkstra,
+}
+
+CSR_SEARCHES = {
+    "dijkstra": dijkstra_csr,
+    "astar": astar_csr,
+    "bidirectional": bidirectional_csr,
+}
+
+
+def _edges(graph, vertex, add_to_visgraph):
+    """Return the edges at vertex, including the temporary query edges."""
+    edges = graph[vertex]
+    if add_to_visgraph is not None and vertex in add_to_visgraph:
+        edges = edges | add_to_visgraph[vertex]
+    return edges
+
+
+def shortest_path(graph, origin, destination, add_to_visgraph=None, method="dijkstra",
+                  distance=edge_distance):
+    """Compute the shortest path from origin to destination. method is
+    "dijkstra", "astar" or "bidirectional"; all return a shortest path.
+    distance gives the length of an edge between two points; for A* it
+    must satisfy the triangle inequality."""
+    if method not in SEARCHES:
+        raise ValueError(f"Unknown shortest path method: {method!r}")
+    distances, predecessors = SEARCHES[method](graph, origin, destination, add_to_visgraph,
+                                               distance)
     path = []
     while destination:
         path.append(destination)
@@ -58,6 +280,47 @@ def shortest_path(graph, origin, destination, add_to_visgraph=None):
     return path
 
 
+def shortest_path_csr(csr, origin, destination, add_to_visgraph=None, distance=edge_distance,
+                      method="dijkstra", metric=None):
+    """Compute the shortest path from origin to destination on a CSRGraph;
+    the search runs on integer vertex ids and method is as for
+    shortest_path. add_to_visgraph holds the query edges of origin and
+    destination when they are not vertices of the graph; distance weighs
+    them like the edges of csr. A* takes its heuristic from metric, the
+    array form of distance, see metrics; planar distance by default.
+    Returns None if destination cannot be reached."""
+    if method not in CSR_SEARCHES:
+        raise ValueError(f"Unknown shortest path method: {method!r}")
+    ids = {}
+    for point in (origin, destination):
+        i = csr.index_of(point)
+        ids[point] = i if i is not None else ids.get(point, len(csr) + len(ids))
+    extra_edges = {}
+    if add_to_visgraph is not None:
+        for edge in add_to_visgraph.get_edges():
+            i = ids.get(edge.p1, csr.index_of(edge.p1))
+            j = ids.get(edge.p2, csr.index_of(edge.p2))
+            if i is None or j is None:
+                continue  # a vertex without visibility edges leads nowhere
+            weight = distance(edge.p1, edge.p2)
+            extra_edges.setdefault(i, []).append((j, weight))
+            extra_edges.setdefault(j, []).append((i, weight))
+
+    if method == "astar":
+        bounds = (metric or euclidean)(csr.xs, csr.ys, destination.x, destination.y).tolist()
+        points = {i: point for point, i in ids.items()}
+        distances, predecessors = astar_csr(
+            csr, ids[origin], ids[destination], extra_edges,
+            lambda i: bounds[i] if i < len(bounds) else distance(points[i], destination))
+    else:
+        distances, predecessors = CSR_SEARCHES[method](csr, ids[origin], ids[destination], extra_edges)
+    points = {i: point for point, i in ids.items()}
+    path = path_ids(predecessors, ids[origin], ids[destination])
+    if path is None:
+        return None
+    return [points[i] if i in points else csr.point(i) for i in path]
+
+
 class PriorityDict(dict):
     """Dictionary used as a priority queue, with support for priority updates."""
     
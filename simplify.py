@@ -0,0 +1,203 @@
+from heapq import heapify, heappop, heappush
+from math import floor, hypot, sqrt
+
+from graph import Edge, Point
+from visible_vertices import ccw, edge_intersect
+
+CELL_VERTICES = 4  # vertices per grid cell of the simplification index, on average
+
+
+def simplify_polygons(polygons, tolerance):
+    """
+    Simplify polygons outward only: a vertex is dropped only when the chord
+    between its neighbours runs outside the polygon, so every simplified
+    polygon contains its original and a path that avoids the simplified
+    obstacles also avoids the original ones.
+
+    Vertices are dropped cheapest first. A drop is refused when any original
+    vertex it removes would end up more than tolerance from the new outline,
+    or when the area it adds would cover or touch any other vertex or edge,
+    of the same or another polygon, so the polygons stay simple and disjoint.
+
+    :param polygons: List of polygons, each a list of Points; a closing point
+        equal to the first one is ignored.
+    :param tolerance: Largest distance, in coordinate units, from an original
+        vertex to the simplified outline.
+    :return: The simplified polygons as lists of new Points, in input order.
+    """
+    return _Simplifier(polygons).run(tolerance)
+
+
+def resolution_levels(polygons, tolerances):
+    """
+    Simplify polygons once per tolerance, in increasing order. Each level
+    continues from the previous one, so it contains the levels of lower
+    tolerance, while its tolerance still holds against the original polygons.
+
+    :return: A list of (tolerance, polygons) pairs, coarsest last.
+    """
+    simplifier = _Simplifier(polygons)
+    return [(tolerance, simplifier.run(tolerance)) for tolerance in sorted(tolerances)]
+
+
+class _Simplifier:
+    """Doubly linked rings of all polygons with a uniform grid over their edges."""
+
+    def __init__(self, polygons):
+        self.points = []  # every vertex, polygons one after another
+        self.ring = []  # polygon index of every vertex
+        self.prev = []
+        self.next = []
+        self.sizes = []  # vertices left per polygon
+        self.orientation = []  # CCW or CW per polygon
+        self.starts = []
+        for polygon in polygons:
+            points = list(polygon)
+            if len(points) > 1 and points[0] == points[-1]:
+                points.pop()
+            start, count = len(self.points), len(points)
+            self.starts.append(start)
+            self.sizes.append(count)
+            self.orientation.append(1 if _signed_area(points) > 0 else -1)
+            for k, point in enumerate(points):
+                self.points.append(Point(point.x, point.y))
+                self.ring.append(len(self.sizes) - 1)
+                self.prev.append(start + (k - 1) % count)
+                self.next.append(start + (k + 1) % count)
+        self.alive = [True] * len(self.points)
+        # Original vertices removed between a vertex and its next one.
+        self.removed = [[] for _ in self.points]
+
+        xs = [point.x for point in self.points] or [0.0]
+        ys = [point.y for point in self.points] or [0.0]
+        extent = max(max(xs) - min(xs), max(ys) - min(ys)) or 1.0
+        self.cell = extent / max(1.0, sqrt(len(self.points) / CELL_VERTICES))
+        self.vertex_cells = {}
+        self.edge_cells = {}
+        for i, point in enumerate(self.points):
+            self.vertex_cells.setdefault(self._cell_of(point), set()).add(i)
+            if self.next[i] != i:
+                self._index_edge(i)
+
+    def run(self, tolerance):
+        """Drop vertices up to tolerance; may be called again with a larger one."""
+        version = [0] * len(self.points)
+        queue = []
+        for i in range(len(self.points)):
+            cost = self._cost(i)
+            if cost is not None and cost <= tolerance:
+                queue.append((cost, i, 0))
+        heapify(queue)
+        while queue:
+            cost, i, seen = heappop(queue)
+            if not self.alive[i] or seen != version[i]:
+                continue
+            if not self._free(i):
+                continue
+            a, b = self.prev[i], self.next[i]
+            self._remove(i)
+            for j in (a, b):
+                version[j] += 1
+                cost = self._cost(j)
+                if cost is not None and cost <= tolerance:
+                    heappush(queue, (cost, j, version[j]))
+
+        polygons = []
+        for ring, start in enumerate(self.starts):
+            polygon = []
+            if self.sizes[ring]:
+                i = start
+                while not self.alive[i]:
+                    i += 1
+                first = i
+                while True:
+                    polygon.append(Point(self.points[i].x, self.points[i].y))
+                    i = self.next[i]
+                    if i == first:
+                        break
+            polygons.append(polygon)
+        return polygons
+
+    def _cost(self, i):
+        """Distance from the outline to the farthest original vertex dropping i removes, or None."""
+        ring = self.ring[i]
+        if self.sizes[ring] <= 3:
+            return None
+        a, b = self.prev[i], self.next[i]
+        pa, p, pb = self.points[a], self.points[i], self.points[b]
+        turn = ccw(pa, p, pb)
+        if turn * self.orientation[ring] > 0:
+            return None  # convex vertex: the chord would cut into the polygon
+        if turn == 0 and (p.x - pa.x) * (pb.x - p.x) + (p.y - pa.y) * (pb.y - p.y) < 0:
+            return None  # tip of a spike, which the chord would cut off
+        return max(_segment_distance(self.points[k], pa, pb)
+                   for k in self.removed[a] + [i] + self.removed[i])
+
+    def _free(self, i):
+        """True if the triangle added by dropping i touches no other vertex or edge."""
+        a, b = self.prev[i], self.next[i]
+        pa, p, pb = self.points[a], self.points[i], self.points[b]
+        cells = self._cells_between(min(pa.x, p.x, pb.x), min(pa.y, p.y, pb.y),
+                                    max(pa.x, p.x, pb.x), max(pa.y, p.y, pb.y))
+        orientation = ccw(pa, p, pb) or 1
+        for cell in cells:
+            for k in self.vertex_cells.get(cell, ()):
+                if k in (a, i, b):
+                    continue
+                q = self.points[k]
+                if (ccw(pa, p, q) * orientation >= 0 and ccw(p, pb, q) * orientation >= 0
+                        and ccw(pb, pa, q) * orientation >= 0):
+                    return False
+        chord = (pa, pb)
+        checked = set()
+        for cell in self._cells_between(min(pa.x, pb.x), min(pa.y, pb.y), max(pa.x, pb.x), max(pa.y, pb.y)):
+            for k in self.edge_cells.get(cell, ()):
+                if k in checked or k in (self.prev[a], a, i, b):
+                    continue
+                checked.add(k)
+                if edge_intersect(*chord, Edge(self.points[k], self.points[self.next[k]])):
+                    return False
+        return True
+
+    def _remove(self, i):
+        a, b = self.prev[i], self.next[i]
+        self._unindex_edge(a)
+        self._unindex_edge(i)
+        self.vertex_cells[self._cell_of(self.points[i])].discard(i)
+        self.next[a], self.prev[b] = b, a
+        self.removed[a] = self.removed[a] + [i] + self.removed[i]
+        self.removed[i] = []
+        self.alive[i] = False
+        self.sizes[self.ring[i]] -= 1
+        self._index_edge(a)
+
+    def _index_edge(self, i):
+        p, q = self.points[i], self.points[self.next[i]]
+        for cell in self._cells_between(min(p.x, q.x), min(p.y, q.y), max(p.x, q.x), max(p.y, q.y)):
+            self.edge_cells.setdefault(cell, set()).add(i)
+
+    def _unindex_edge(self, i):
+        p, q = self.points[i], self.points[self.next[i]]
+        for cell in self._cells_between(min(p.x, q.x), min(p.y, q.y), max(p.x, q.x), max(p.y, q.y)):
+            self.edge_cells[cell].discard(i)
+
+    def _cell_of(self, point):
+        return floor(point.x / self.cell), floor(point.y / self.cell)
+
+    def _cells_between(self, x1, y1, x2, y2):
+        # Cells are widened by one so that points on a cell border are found.
+        c1, r1 = floor(x1 / self.cell) - 1, floor(y1 / self.cell) - 1
+        c2, r2 = floor(x2 / self.cell) + 1, floor(y2 / self.cell) + 1
+        return [(c, r) for c in range(c1, c2 + 1) for r in range(r1, r2 + 1)]
+
+
+def _signed_area(points):
+    return sum(p.x * q.y - q.x * p.y for p, q in zip(points, points[1:] + points[:1])) / 2
+
+
+def _segment_distance(point, a, b):
+    """Distance from point to the segment ab."""
+    dx, dy = b.x - a.x, b.y - a.y
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((point.x - a.x) * dx + (point.y - a.y) * dy) / length))
+    return hypot(point.x - a.x - t * dx, point.y - a.y - t * dy)
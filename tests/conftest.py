@@ -0,0 +1,31 @@
+import os
+import sys
+
+# The modules live at the top of the repository, next to main.py.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generators import DATASETS, free_points  # the scenes the tests run on
+from graph import Point
+from vis_graph import VisGraph
+
+
+def build(polygons, **options):
+    """Return a VisGraph built on polygons without a progress bar, see VisGraph.build."""
+    graph = VisGraph()
+    graph.build([list(polygon) for polygon in polygons], show_progress=False, **options)
+    return graph
+
+
+def copy(polygons):
+    """Return polygons made of new Points, for graphs that must not share them."""
+    return [[Point(point.x, point.y) for point in polygon] for polygon in polygons]
+
+
+def edge_set(edges):
+    """Return edges as a set of unordered coordinate pairs, comparable across graphs."""
+    return {frozenset(((edge.p1.x, edge.p1.y), (edge.p2.x, edge.p2.y))) for edge in edges}
+
+
+def visibility_edges(graph):
+    """Return the visibility edges of a VisGraph, see edge_set."""
+    return edge_set(graph.visgraph.get_edges())
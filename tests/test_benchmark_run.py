@@ -0,0 +1,13 @@
+from benchmarks.run import run_case
+
+
+def test_every_stage_reports_its_memory():
+    results = run_case("convex", 64, 0, [1, 2], ["lee"], ["dijkstra"])
+    stages = [(result["benchmark"], result.get("workers")) for result in results]
+    assert stages == [("graph", None), ("visible_vertices", None), ("build", 1), ("build", 2),
+                      ("shortest_path", None), ("save", None), ("load", None), ("loaded_shortest_path", None)]
+    for result in results:
+        assert 0 < result["rss_start_mb"] <= result["rss_peak_mb"] and result["seconds"] >= 0
+    # The two build workers are sampled with the process that started them.
+    build = {result["workers"]: result for result in results if result["benchmark"] == "build"}
+    assert build[2]["rss_peak_mb"] > build[1]["rss_peak_mb"]
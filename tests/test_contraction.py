@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from conftest import DATASETS, build, free_points
+from vis_graph import VisGraph
+
+
+@pytest.mark.parametrize("dataset", ["grid", "concave"])
+def test_hierarchy_paths_equal_dijkstra(tmp_path, dataset):
+    # The grid has many shortest paths of equal length, which witness
+    # searches and shortcuts must handle.
+    polygons = DATASETS[dataset](100, 14)
+    graph = build(polygons)
+    graph.contract(show_progress=False)
+    filename = str(tmp_path / "contracted.graph")
+    graph.save(filename)
+    loaded = VisGraph()
+    loaded.load(filename)
+    assert loaded.ch is not None
+
+    rnd = random.Random(14)
+    points = free_points(6, polygons, 14)
+    pairs = list(zip(points, points[3:])) + [tuple(rnd.sample(list(graph.points), 2)) for _ in range(15)]
+    for origin, destination in pairs:
+        expected = graph.shortest_path(origin, destination)
+        for searched in (graph, loaded):
+            path = searched.shortest_path(origin, destination, method="ch")
+            assert path[0] == origin and path[-1] == destination
+            assert searched.path_length(path) == pytest.approx(graph.path_length(expected))
+            # Unpacked shortcuts: every leg is an edge of the graph or an attachment.
+            for p, q in zip(path[1:-2], path[2:-1]):
+                i, j = graph.csr.index_of(p), graph.csr.index_of(q)
+                assert j in graph.csr.neighbors(i)[0].tolist()
+
+
+def test_hierarchy_is_dropped_when_the_obstacles_change():
+    graph = build(DATASETS["convex"](100, 15))
+    graph.contract(show_progress=False)
+    graph.remove_polygon(0)
+    with pytest.raises(ValueError):
+        graph.shortest_path(*free_points(2, DATASETS["convex"](100, 15), 15), method="ch")
@@ -0,0 +1,23 @@
+from conftest import DATASETS, build
+from graph import Point
+from vis_graph import VisGraph
+
+
+def test_endpoint_cache_reuses_and_invalidates_attachments():
+    polygons = DATASETS["convex"](100, 11)
+    cached, uncached = build(polygons), VisGraph(cache_size=0)
+    uncached.build([list(polygon) for polygon in polygons], show_progress=False)
+    # Along the free corridor left of the first column of cells.
+    origin, destination = Point(0, 10), Point(0, 190)
+
+    path = cached.shortest_path(origin, destination)
+    assert path == [origin, destination]
+    assert cached.cache_stats()['misses'] == 2
+    assert cached.shortest_path(origin, destination) == path == uncached.shortest_path(origin, destination)
+    assert cached.cache_stats()['hits'] == 2
+
+    for graph in (cached, uncached):
+        graph.add_polygon([Point(-1, 99), Point(1, 99), Point(1, 101), Point(-1, 101)])
+    path = cached.shortest_path(origin, destination)
+    assert len(path) > 2 and path == uncached.shortest_path(origin, destination)
+    assert cached.cache_stats()['misses'] == 4
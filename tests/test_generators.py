@@ -0,0 +1,16 @@
+import shapefile
+
+from benchmarks.generators import gshhs_polygons
+
+
+def test_gshhs_polygons_has_a_polygon_per_shape_part(tmp_path):
+    filename = str(tmp_path / "islands")
+    with shapefile.Writer(filename, shapeType=shapefile.POLYGON) as writer:
+        writer.field("level", "N")
+        # One shape of two islands, closed rings as shapefiles store them.
+        writer.poly([[(0, 0), (0, 1), (1, 1), (1, 0), (0, 0)],
+                     [(3, 0), (3, 1), (4, 1), (4, 0), (3, 0)]])
+        writer.record(1)
+    polygons = gshhs_polygons(filename)
+    assert [[(point.x, point.y) for point in polygon] for polygon in polygons] == \
+        [[(0, 0), (0, 1), (1, 1), (1, 0)], [(3, 0), (3, 1), (4, 1), (4, 0)]]
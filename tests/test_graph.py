@@ -0,0 +1,54 @@
+import math
+
+import numpy as np
+
+from conftest import DATASETS, edge_set
+from graph import CSRGraph, Graph, Point, SortedPoints, VertexIds
+from obstacles import PreparedObstacles
+from visible_vertices import visible_ids, visible_vertices
+
+
+def test_csr_round_trip():
+    graph = Graph(DATASETS["concave"](100, 8))
+    csr = CSRGraph.from_graph(graph)
+    assert len(csr) == len(graph.get_points())
+    assert csr.num_edges == len(graph.get_edges())
+    assert edge_set(csr.to_graph().get_edges()) == edge_set(graph.get_edges())
+    for point in graph.get_points():
+        i = csr.index_of(point)
+        assert csr.point(i) == point and csr.point(i).polygon_id == point.polygon_id
+        neighbours, weights = csr.neighbors(i)
+        assert {csr.point(j) for j in neighbours.tolist()} == set(graph.get_adjacent_points(point))
+        for j, weight in zip(neighbours.tolist(), weights.tolist()):
+            assert weight == math.hypot(csr.xs[j] - point.x, csr.ys[j] - point.y)
+
+
+def test_vertex_ids_are_dense_and_keyed_by_coordinates():
+    points = [Point(1.5, 2), Point(0, 0, 3), Point(1.5, 2.0, 7), Point(-1, 4)]
+    ids = VertexIds(points)
+    assert [ids[point] for point in points] == [0, 1, 0, 2]
+    assert len(ids) == 3 and ids.point(0) is points[0]
+    assert Point(0.0, 0.0) in ids and Point(0, 1) not in ids and ids.get(Point(0, 1)) is None
+    assert ids.add(Point(0, 1)) == 3
+    xs, ys, polygon_ids = ids.arrays()
+    assert xs.tolist() == [1.5, 0, -1, 0] and ys.tolist() == [2, 0, 4, 1]
+    assert polygon_ids.tolist() == [-1, 3, -1, -1]
+
+
+def test_sorted_points_find_ids_by_coordinates():
+    xs, ys = np.array([1.5, 0, -1, 1.5, 0]), np.array([2, 0, 4, -3, 1])
+    ids = SortedPoints(xs, ys)
+    assert [ids[Point(x, y)] for x, y in zip(xs, ys)] == [0, 1, 2, 3, 4]
+    assert len(ids) == 5 and Point(1.5, 2.0, 7) in ids
+    assert ids.get(Point(1.5, 0)) is None and ids.get(Point(2, 2), -1) == -1
+    assert Point(0, 0.5) not in ids and Point(-2, 4) not in ids
+    assert ids.ids(np.array([0, 1.5, 9]), np.array([1, -3, 9])).tolist() == [4, 3, -1]
+
+
+def test_visible_ids_name_the_visible_vertices():
+    polygons = DATASETS["concave"](100, 19)
+    obstacles = PreparedObstacles(Graph(polygons))
+    for point in obstacles.points[::5]:
+        ids = visible_ids(point, obstacles)
+        assert [obstacles.points[i] for i in ids] == visible_vertices(point, obstacles)
+        assert all(obstacles.index[obstacles.points[i]] == i for i in ids)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from conftest import DATASETS, build, free_points
+from graph_file import read_graph_file, write_graph_file
+from vis_graph import VisGraph
+
+
+def test_arrays_and_metadata_round_trip(tmp_path):
+    filename = str(tmp_path / "arrays.graph")
+    arrays = {'a': np.arange(10, dtype=np.int32), 'b': np.linspace(0, 1, 7).reshape(7, 1),
+              'empty': np.zeros(0, dtype=np.int64)}
+    write_graph_file(filename, arrays, reduced=True, metric="haversine")
+    read, metadata = read_graph_file(filename)
+    assert metadata == {'reduced': True, 'metric': "haversine"}
+    for name, array in arrays.items():
+        assert read[name].dtype == array.dtype and np.array_equal(read[name], array)
+    assert isinstance(read['a'], np.memmap) and not read['a'].flags.writeable
+
+
+def test_other_files_are_rejected(tmp_path):
+    filename = tmp_path / "other.graph"
+    filename.write_bytes(b"not a graph file at all")
+    with pytest.raises(ValueError):
+        read_graph_file(str(filename))
+
+
+@pytest.mark.parametrize("reduced", [False, True])
+def test_saved_graph_answers_like_the_built_one(tmp_path, reduced):
+    polygons = DATASETS["fractal"](128, 9)
+    built = build(polygons, reduced=reduced)
+    filename = str(tmp_path / "fractal.graph")
+    built.save(filename)
+    loaded = VisGraph()
+    loaded.load(filename)
+
+    assert loaded.reduced == reduced and loaded.metric == built.metric
+    for name in ("xs", "ys", "polygon_ids", "indptr", "indices", "weights"):
+        assert np.array_equal(getattr(loaded.csr, name), getattr(built.csr, name))
+    points = free_points(6, polygons, 9)
+    for origin, destination in zip(points, points[3:]):
+        assert loaded.shortest_path(origin, destination) == built.shortest_path(origin, destination)
+    # Queries run on obstacles prepared from the arrays, without a Graph.
+    assert loaded.obstacles.graph is None and loaded._graph is None
+    assert set(loaded.graph.get_edges()) == set(built.graph.get_edges())
@@ -0,0 +1,55 @@
+from conftest import build
+from graph import Point
+from graph_worker import GraphWorker
+
+START, END = Point(-1, -1), Point(9, 7)
+
+
+def _square(x, y):
+    return [Point(x, y), Point(x + 2, y), Point(x + 2, y + 2), Point(x, y + 2)]
+
+
+def _results(worker, count):
+    """Wait for the next count results of the worker's current generation."""
+    results = []
+    while len(results) < count:
+        generation, kind, value = worker.results.get(timeout=60)
+        if generation == worker.generation:
+            results.append((kind, value))
+    return results
+
+
+def test_worker_thread_posts_the_edge_changes():
+    polygons = [_square(0, 0), _square(5, 1), _square(2, 4)]
+    worker = GraphWorker()
+    for polygon in polygons:
+        worker.add_polygon(polygon)
+    worker.shortest_path(START, END)
+    results = _results(worker, 4)
+
+    edges = set()
+    for kind, (added, removed) in results[:3]:
+        assert kind == "edges"
+        edges.difference_update(removed)
+        edges.update(added)
+    built = build(polygons)
+    assert edges == set(built.visgraph.get_edges())
+    assert results[3] == ("path", built.shortest_path(START, END))
+    assert worker.progress() == (3, 3) and not worker.busy
+
+
+def test_reset_discards_older_generations():
+    worker = GraphWorker()
+    worker.add_polygon(_square(0, 0))
+    worker.add_polygon(_square(5, 1))
+    worker.reset()
+    worker.add_polygon(_square(2, 4))
+    worker.shortest_path(START, END)
+    (reset, _), (edges, (added, removed)), path = _results(worker, 3)
+
+    built = build([_square(2, 4)])
+    assert (reset, edges) == ("reset", "edges")
+    assert set(added) == set(built.visgraph.get_edges()) and not removed
+    assert path == ("path", built.shortest_path(START, END))
+    # Polygons dropped by the reset still count as done.
+    assert worker.progress() == (3, 3)
@@ -0,0 +1,45 @@
+import pytest
+
+from conftest import DATASETS, build, copy, edge_set, free_points, visibility_edges
+from vis_graph import VisGraph
+
+
+def _change(graph, update, *args):
+    before = visibility_edges(graph)
+    update(*args)
+    after = visibility_edges(graph)
+    added, removed = graph.changed_edges
+    # The edges changed are reported, and the CSR form waits for a query.
+    assert edge_set(added) == after - before and edge_set(removed) == before - after
+    assert graph._csr is None
+    assert edge_set(graph.csr.to_graph().get_edges()) == after
+
+
+@pytest.mark.parametrize("reduced", [False, True])
+@pytest.mark.parametrize("dataset, seed, k", [("grid", 0, 5), ("concave", 1, 0), ("convex", 2, 7)])
+def test_incremental_updates_equal_a_rebuild(dataset, seed, k, reduced):
+    polygons = DATASETS[dataset](100, seed)
+    rest = polygons[:k] + polygons[k + 1:]
+
+    graph = build(copy(rest), reduced=reduced)
+    _change(graph, graph.add_polygon, copy([polygons[k]])[0])
+    assert visibility_edges(graph) == visibility_edges(build(copy(polygons), reduced=reduced))
+
+    graph = build(copy(polygons), reduced=reduced)
+    _change(graph, graph.remove_polygon, k)
+    assert visibility_edges(graph) == visibility_edges(build(copy(rest), reduced=reduced))
+
+
+def test_incremental_updates_of_a_loaded_graph(tmp_path):
+    polygons = DATASETS["concave"](100, 4)
+    filename = str(tmp_path / "concave.graph")
+    build(copy(polygons)).save(filename)
+    graph = VisGraph()
+    graph.load(filename)
+    graph.remove_polygon(3)
+    graph.remove_polygon(6)
+    graph.add_polygon(copy([polygons[3]])[0])
+    expected = build(copy(polygons[:6] + polygons[7:]))
+    assert visibility_edges(graph) == visibility_edges(expected)
+    origin, destination = free_points(2, polygons, 4)
+    assert graph.shortest_path(origin, destination) == expected.shortest_path(origin, destination)
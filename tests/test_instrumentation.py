@@ -0,0 +1,65 @@
+import threading
+
+import instrumentation
+import visible_vertices
+from conftest import DATASETS, build, free_points, visibility_edges
+from vis_graph import VisGraph
+
+
+def test_build_and_query_statistics():
+    polygons = DATASETS["concave"](100, 16)
+    plain = build(polygons)
+    original = visible_vertices.edge_in_polygon
+
+    for workers in (1, 2):
+        graph = VisGraph()
+        stats = graph.build(polygons, workers=workers, show_progress=False, stats=True)
+        assert visibility_edges(graph) == visibility_edges(plain)
+        assert stats.counts["open_edges.insert"] > 0 and stats.counts["edge_intersect"] > 0
+        assert stats.seconds["build"] >= stats.seconds["build.edges"] > 0
+        # The wrappers are removed again.
+        assert instrumentation.current() is None and visible_vertices.edge_in_polygon is original
+
+    origin, destination = free_points(2, polygons, 16)
+    path, stats = graph.shortest_path(origin, destination, stats=True)
+    assert path == plain.shortest_path(origin, destination)
+    assert stats.counts["search.pops"] > 0 and stats.peaks["search.queue_size"] > 0
+
+
+def test_merged_statistics():
+    first, second = instrumentation.Stats(), instrumentation.Stats()
+    first.count("ccw", 2)
+    first.peak("search.queue_size", 5)
+    second.count("ccw", 3)
+    second.add_time("build", 1.5)
+    second.peak("search.queue_size", 3)
+    first.merge(second.as_dict())
+    assert first.as_dict() == {"counts": {"ccw": 5}, "seconds": {"build": 1.5},
+                               "peaks": {"search.queue_size": 5}}
+
+
+def test_statistics_per_thread():
+    polygons = DATASETS["convex"](60, 4)
+    graph = VisGraph()
+    original = visible_vertices.edge_in_polygon
+    started, stop = threading.Event(), threading.Event()
+    counted = {}
+
+    def other():
+        with instrumentation.collect() as stats:
+            started.set()
+            stop.wait()
+        counted["other"] = stats.counts["ccw"]
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    started.wait()
+    with instrumentation.collect() as stats:
+        graph.build(polygons, show_progress=False)
+    # The other thread still collects, so the wrappers stay installed, but
+    # only count the calls of the thread that makes them.
+    assert visible_vertices.edge_in_polygon is not original
+    assert instrumentation.current() is None and stats.counts["ccw"] > 0
+    stop.set()
+    thread.join()
+    assert counted["other"] == 0 and visible_vertices.edge_in_polygon is original
@@ -0,0 +1,42 @@
+import math
+
+import numpy as np
+import pytest
+
+from conftest import build
+from graph import Point
+from metrics import EARTH_RADIUS, get_metric, haversine, haversine_distance
+from vis_graph import VisGraph
+
+
+def test_haversine_distances():
+    # A degree of longitude along the equator, and of latitude anywhere.
+    degree = 2 * math.pi * EARTH_RADIUS / 360
+    assert haversine_distance(Point(0, 0), Point(1, 0)) == pytest.approx(degree)
+    assert haversine_distance(Point(30, 40), Point(30, 41)) == pytest.approx(degree)
+    assert haversine_distance(Point(0, 0), Point(180, 0)) == pytest.approx(math.pi * EARTH_RADIUS)
+    xs, ys = np.array([-8.9316, 103.85, 0.0]), np.array([37.0088, 1.29, 89.9])
+    assert haversine(xs[:-1], ys[:-1], xs[1:], ys[1:]) == pytest.approx(
+        [haversine_distance(Point(xs[k], ys[k]), Point(xs[k + 1], ys[k + 1])) for k in range(2)])
+
+
+def test_unknown_metric():
+    with pytest.raises(ValueError):
+        get_metric("manhattan")
+    with pytest.raises(ValueError):
+        VisGraph().build([], metric="manhattan")
+
+
+def test_edge_weights_use_the_graph_metric():
+    square = [[Point(10, 10), Point(12, 10), Point(12, 12), Point(10, 12)]]
+    graph = build(square, metric="haversine")
+    csr = graph.csr
+    sources = np.repeat(np.arange(len(csr)), np.diff(csr.indptr))
+    assert csr.weights == pytest.approx(haversine(csr.xs[sources], csr.ys[sources],
+                                                  csr.xs[csr.indices], csr.ys[csr.indices]))
+    origin, destination = Point(9, 11), Point(13, 11)
+    path = graph.shortest_path(origin, destination)
+    assert len(path) == 4
+    assert graph.path_length(path) == pytest.approx(
+        sum(haversine_distance(p, q) for p, q in zip(path, path[1:])))
+    assert graph.distances_from(origin, [destination])[0] == pytest.approx(graph.path_length(path))
@@ -0,0 +1,35 @@
+from conftest import DATASETS, free_points
+from graph import Graph, Point
+from obstacles import PreparedObstacles
+from visible_vertices import polygon_crossing, polygon_crossing_indexed, visible_vertices
+
+
+def test_prepared_obstacles_give_the_same_sweeps_as_the_graph():
+    polygons = DATASETS["concave"](100, 4)
+    graph = Graph(polygons)
+    obstacles = PreparedObstacles(graph)
+    assert PreparedObstacles.of(obstacles) is obstacles
+    for point in list(obstacles.points[::7]) + free_points(5, polygons, 4):
+        assert set(visible_vertices(point, obstacles)) == set(visible_vertices(point, graph))
+
+
+def test_reflex_vertices():
+    # An L shape, counter-clockwise, and the same shape clockwise.
+    outline = [Point(0, 0), Point(2, 0), Point(2, 1), Point(1, 1), Point(1, 2), Point(0, 2)]
+    for polygon in (outline, outline[::-1]):
+        obstacles = PreparedObstacles(Graph([polygon]))
+        assert [point for point in obstacles.points if obstacles.is_reflex(point)] == [Point(1, 1)]
+    assert not obstacles.is_reflex(Point(5, 5))
+
+
+def test_indexed_polygon_crossing_matches_the_edge_scan():
+    # The grid's squares put many sample points level with vertices and
+    # edges, the collinear cases of the crossing count.
+    for name in ("grid", "concave"):
+        obstacles = PreparedObstacles(Graph(DATASETS[name](100, 5)))
+        points = [Point(x, y) for x in range(0, 500, 5) for y in range(0, 500, 5)]
+        points += [Point(point.x + 0.5, point.y) for point in obstacles.points]
+        for polygon_id, edges in obstacles.graph.polygons.items():
+            indexed = obstacles.polygons[polygon_id]
+            assert [polygon_crossing_indexed(point, indexed) for point in points] == \
+                [polygon_crossing(point, edges) for point in points]
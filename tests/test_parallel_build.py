@@ -0,0 +1,11 @@
+import pytest
+
+from conftest import DATASETS, build, visibility_edges
+
+
+@pytest.mark.parametrize("reduced", [False, True])
+def test_parallel_build_equals_serial_build(reduced):
+    polygons = DATASETS["concave"](200, 10)
+    serial = build(polygons, reduced=reduced)
+    parallel = build(polygons, workers=2, reduced=reduced)
+    assert visibility_edges(parallel) == visibility_edges(serial)
@@ -0,0 +1,48 @@
+from fractions import Fraction
+import random
+
+import numpy as np
+
+from predicates import CCW, CLNR, CW, compare_angles, orient, orient_array
+
+
+def _exact_orient(ax, ay, bx, by, cx, cy):
+    ax, ay, bx, by, cx, cy = map(Fraction, (ax, ay, bx, by, cx, cy))
+    det = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    return CCW if det > 0 else CW if det < 0 else CLNR
+
+
+def test_orient_near_degenerate_points():
+    # Points one ulp off the line through (0.5, 0.5) and (12, 12), where the
+    # plain floating-point determinant gets the sign wrong or returns zero.
+    rnd = random.Random(0)
+    for _ in range(2000):
+        x = 0.5 + rnd.randint(-64, 64) * 2.0 ** -53
+        y = 0.5 + rnd.randint(-64, 64) * 2.0 ** -53
+        args = (x, y, 12.0, 12.0, 24.0, 24.0)
+        assert orient(*args) == _exact_orient(*args)
+
+
+def test_orient_array_matches_orient():
+    rnd = random.Random(1)
+    xs = np.array([0.5 + rnd.randint(-8, 8) * 2.0 ** -53 for _ in range(200)])
+    ys = np.array([0.5 + rnd.randint(-8, 8) * 2.0 ** -53 for _ in range(200)])
+    signs = orient_array(xs, ys, 12.0, 12.0, 24.0, 24.0)
+    assert signs.tolist() == [orient(x, y, 12.0, 12.0, 24.0, 24.0) for x, y in zip(xs, ys)]
+
+
+def test_compare_angles_beyond_cosine_precision():
+    # Both angles are within 1e-11 of pi: their cosines round to -1.0, and
+    # an acos of a truncated cosine would call them equal.
+    assert compare_angles(-1.0, 0.0, 0.0, 0.0, 1.0, 1e-11, 1.0, 2e-11) == 1
+    assert compare_angles(-1.0, 0.0, 0.0, 0.0, 1.0, 2e-11, 1.0, 1e-11) == -1
+    assert compare_angles(-1.0, 0.0, 0.0, 0.0, 2.0, 2e-11, 1.0, 1e-11) == 0
+
+
+def test_compare_angles_ordinary_cases():
+    # Angles at the origin, measured from the positive x axis.
+    assert compare_angles(1.0, 0.0, 0.0, 0.0, 1.0, 1.0, 0.0, 1.0) == -1
+    assert compare_angles(1.0, 0.0, 0.0, 0.0, -1.0, 1.0, 0.0, 1.0) == 1
+    assert compare_angles(1.0, 0.0, 0.0, 0.0, 0.0, 3.0, 0.0, -3.0) == 0
+    # A degenerate angle counts as a right angle.
+    assert compare_angles(1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0) == 0
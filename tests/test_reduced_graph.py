@@ -0,0 +1,55 @@
+import math
+import random
+
+import pytest
+
+from conftest import DATASETS, build, edge_set, free_points
+from graph import Point
+from visible_vertices import bitangent
+
+
+def _plus():
+    """A plus sign; its inner corners (1, 1), (-1, 1), (-1, -1) and (1, -1) are reflex."""
+    return [[Point(1, -3), Point(1, -1), Point(3, -1), Point(3, 1), Point(1, 1), Point(1, 3),
+             Point(-1, 3), Point(-1, 1), Point(-3, 1), Point(-3, -1), Point(-1, -1), Point(-1, -3)]]
+
+
+@pytest.mark.parametrize("dataset", ["convex", "concave", "fractal"])
+def test_reduced_edges_are_the_bitangent_edges_of_the_full_graph(dataset):
+    polygons = DATASETS[dataset](200, 1)
+    full, reduced = build(polygons), build(polygons, reduced=True)
+    expected = [edge for edge in full.visgraph.get_edges() if bitangent(edge.p1, edge.p2, full.obstacles)]
+    assert edge_set(reduced.visgraph.get_edges()) == edge_set(expected)
+
+
+@pytest.mark.parametrize("reduced", [False, True])
+@pytest.mark.parametrize("method", ["dijkstra", "astar", "bidirectional", "ch"])
+def test_path_between_reflex_vertices_goes_around_the_polygon(reduced, method):
+    graph = build(_plus(), reduced=reduced)
+    if method == "ch":
+        graph.contract(show_progress=False)
+    origin, destination = Point(1, 1), Point(-1, -1)
+    path = graph.shortest_path(origin, destination, method=method)
+    # Around the right and bottom arms: (1, 1) (3, 1) (3, -1) (1, -3) (-1, -3) (-1, -1).
+    assert graph.path_length(path) == pytest.approx(8 + math.sqrt(8))
+    assert path[0] == origin and path[-1] == destination
+
+
+@pytest.mark.parametrize("dataset", ["convex", "concave", "fractal"])
+def test_reduced_paths_from_vertices_are_as_short_as_full(dataset):
+    polygons = DATASETS[dataset](200, 1)
+    full, reduced = build(polygons), build(polygons, reduced=True)
+    reduced.contract(show_progress=False)
+    rnd = random.Random(0)
+    vertices = [Point(point.x, point.y) for point in full.points]
+    for _ in range(20):
+        origin, destination = rnd.sample(vertices, 2)
+        expected = full.path_length(full.shortest_path(origin, destination))
+        for method in ("dijkstra", "astar", "bidirectional", "ch"):
+            path = reduced.shortest_path(origin, destination, method=method)
+            assert reduced.path_length(path) == pytest.approx(expected)
+
+    origins = rnd.sample(vertices, 4) + free_points(2, polygons, 1)
+    destinations = rnd.sample(vertices, 4) + free_points(2, polygons, 2)
+    assert reduced.distance_matrix(origins, destinations) == \
+        pytest.approx(full.distance_matrix(origins, destinations))
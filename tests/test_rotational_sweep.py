@@ -0,0 +1,61 @@
+import random
+import tracemalloc
+
+import pytest
+
+from conftest import DATASETS
+from graph import Graph
+from obstacles import PreparedObstacles
+from rotational_sweep import _events, rotational_visibility_edges
+from vis_graph import _visibility_pairs
+
+
+def _undirected(pairs):
+    return {(min(i, j), max(i, j)) for i, j in pairs}
+
+
+@pytest.mark.parametrize("dataset, vertices", [
+    ("grid", 100), ("grid", 200), ("convex", 200), ("concave", 200), ("fractal", 200),
+])
+@pytest.mark.parametrize("reduced", [False, True])
+def test_same_edges_as_lee(dataset, vertices, reduced):
+    obstacles = PreparedObstacles(Graph(DATASETS[dataset](vertices, 3)))
+    lee = _undirected(_visibility_pairs(obstacles, range(len(obstacles.points)), reduced))
+    rotational = _undirected(rotational_visibility_edges(obstacles, reduced=reduced))
+    assert rotational == lee
+
+
+def _check_order(xs, ys):
+    n = len(xs)
+    pairs = list(_events(xs, ys))
+    assert sorted(pairs) == [(i, j) for i in range(n) for j in range(i + 1, n)]
+    # Every point meets the directions of its pairs in counter-clockwise order.
+    last = {}
+    for i, j in pairs:
+        dx, dy = xs[j] - xs[i], ys[j] - ys[i]
+        for point in (i, j):
+            if point in last:
+                px, py = last[point]
+                assert px * dy - py * dx >= 0
+            last[point] = (dx, dy)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_events_in_rotational_order(seed):
+    rnd = random.Random(seed)
+    # Small integer coordinates give many collinear and vertical pairs.
+    points = sorted({(rnd.randint(0, 5), rnd.randint(0, 5)) for _ in range(rnd.randint(1, 25))})
+    _check_order([x for x, _ in points], [y for _, y in points])
+
+
+def test_events_in_linear_memory():
+    rnd = random.Random(0)
+    points = sorted((rnd.random(), rnd.random()) for _ in range(1000))
+    xs, ys = [x for x, _ in points], [y for _, y in points]
+    tracemalloc.start()
+    for _ in _events(xs, ys):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Half a million pairs, a few arrays of 1000 nodes.
+    assert peak < 1 << 20
@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import build
+from graph import CSRGraph, Point
+from server import MAX_BODY, START_METHOD, RoutingServer
+from shortest_path import shortest_path_csr
+
+SQUARE = [[Point(0, 0), Point(2, 0), Point(2, 2), Point(0, 2)]]
+QUERY = {"origin": [-1, 1], "destination": [3, 1]}
+
+
+async def _post(port, endpoint, query, version="HTTP/1.1"):
+    body = json.dumps(query).encode()
+    return await _send(port, f"POST /{endpoint} {version}\r\nContent-Length: {len(body)}\r\n"
+                             f"Connection: close\r\n\r\n".encode() + body)
+
+
+async def _get(port, endpoint):
+    return await _send(port, f"GET /{endpoint} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+
+
+async def _send(port, request):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()  # returns once the server closes the connection
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+def _serve(filename, workers, queries, client=None):
+    """Answer queries, (endpoint, JSON query[, HTTP version]), or run client(routing, port)."""
+    async def run():
+        routing = RoutingServer(filename, workers)
+        server = await routing.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            if client is not None:
+                return await asyncio.wait_for(client(routing, port), 60)
+            return await asyncio.wait_for(asyncio.gather(*(_post(port, *query) for query in queries)), 60)
+        finally:
+            server.close()
+            routing.close()
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def square(tmp_path):
+    graph = build(SQUARE)
+    filename = str(tmp_path / "square.graph")
+    graph.save(filename)
+    return graph, filename
+
+
+def test_process_workers_close_connections(square):
+    graph, filename = square
+    queries = [("shortest_path", dict(QUERY, method=method))
+               for method in ("dijkstra", "astar", "bidirectional")] * 2
+    queries += [("distance", QUERY), ("visible_vertices", {"point": [-1, 1]}, "HTTP/1.0")]
+    answers = _serve(filename, 2, queries)
+    assert all(status == 200 for status, _ in answers)
+    expected = graph.path_length(graph.shortest_path(Point(-1, 1), Point(3, 1)))
+    assert [answer["distance"] for _, answer in answers[:7]] == [expected] * 7
+    assert sorted(map(tuple, answers[7][1]["vertices"])) == [(0, 0), (0, 2)]
+
+
+def test_unreachable_destination_has_no_path():
+    csr = CSRGraph.from_pairs([0.0, 1.0, 5.0, 6.0], [0.0, 0.0, 0.0, 0.0], [0, 0, 1, 1], [(0, 1), (2, 3)])
+    for method in ("dijkstra", "astar", "bidirectional"):
+        assert shortest_path_csr(csr, Point(0, 0), Point(6, 0), method=method) is None
+        assert shortest_path_csr(csr, Point(0, 0), Point(1, 0), method=method) == [Point(0, 0), Point(1, 0)]
+
+
+def test_query_processes_start_from_a_forkserver(square):
+    async def client(routing, port):
+        return routing._executor._mp_context.get_start_method(), await _post(port, "distance", QUERY)
+    method, (status, answer) = _serve(square[1], 1, [], client)
+    assert method == START_METHOD and status == 200 and answer["distance"] == pytest.approx(2 + 2 * 2 ** 0.5)
+
+
+def test_identical_queries_in_flight_are_coalesced(square):
+    key = ("shortest_path", -1.0, 1.0, 3.0, 1.0, "dijkstra")
+
+    async def client(routing, port):
+        answers = await asyncio.gather(*(routing.query(key) for _ in range(3)), routing.query(key[:5] + ("astar",)))
+        return answers, routing.metrics.coalesced
+    answers, coalesced = _serve(square[1], 0, [], client)
+    assert answers[0] == answers[1] == answers[2] and answers[3]["distance"] == answers[0]["distance"]
+    assert coalesced == {"shortest_path": 2}
+
+
+def test_metrics_count_requests_and_errors(square):
+    async def client(routing, port):
+        for _ in range(3):
+            await _post(port, "distance", QUERY)
+        await _post(port, "distance", {"origin": [0, "x"], "destination": [3, 1]})
+        return await _get(port, "metrics")
+    status, metrics = _serve(square[1], 0, [], client)
+    assert status == 200
+    assert metrics["requests"] == {"distance": 4} and metrics["errors"] == {"distance": 1}
+    assert metrics["latency_ms"]["distance"]["count"] == 4 and metrics["in_flight"] == 0
+    assert 0 < metrics["latency_ms"]["distance"]["p50"] <= metrics["latency_ms"]["distance"]["max"]
+
+
+@pytest.mark.parametrize("request_head, status", [
+    (f"POST /distance HTTP/1.1\r\nContent-Length: {MAX_BODY + 1}\r\n\r\n", 413),
+    ("GARBAGE\r\n\r\n", 400),
+    ("POST /distance\r\n\r\n", 400),
+    ("POST /distance HTTP/1.1\r\nContent-Length: ten\r\n\r\n", 400),
+    ("POST /distance HTTP/1.1\r\nContent-Length: -1\r\n\r\n", 400),
+    ("POST /distance HTTP/1.1\r\nno colon here\r\n\r\n", 400),
+])
+def test_malformed_and_oversized_requests_are_answered(square, request_head, status):
+    async def client(routing, port):
+        return await _send(port, request_head.encode())
+    assert _serve(square[1], 0, [], client)[0] == status
+
+
+def test_only_loopback_addresses_are_served(square):
+    routing = RoutingServer(square[1], 0)
+    with pytest.raises(ValueError):
+        asyncio.run(routing.start(host="0.0.0.0", port=0))
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import shapefile
+
+from graph import Graph
+from shapefile_loader import load_graph, read_rings, ring_polygons
+
+
+@pytest.fixture
+def shoreline(tmp_path):
+    filename = str(tmp_path / "shoreline")
+    with shapefile.Writer(filename, shapeType=shapefile.POLYGON) as writer:
+        writer.field("level", "N")
+        # Two islands in one shape, closed and with a repeated point.
+        writer.poly([[(0, 0), (0, 1), (1, 1), (1, 1), (1, 0), (0, 0)],
+                     [(3, 0), (3, 1), (4, 1), (4, 0), (3, 0)]])
+        writer.record(1)
+        writer.poly([[(10, 10), (10, 12), (12, 12), (12, 10), (10, 10)]])
+        writer.record(2)
+    return filename
+
+
+def test_rings_per_shape_part(shoreline):
+    xs, ys, offsets = read_rings(shoreline)
+    assert offsets.tolist() == [0, 4, 8, 12]
+    rings = [list(zip(xs[start:stop].tolist(), ys[start:stop].tolist()))
+             for start, stop in zip(offsets[:-1], offsets[1:])]
+    assert rings == [[(0, 0), (0, 1), (1, 1), (1, 0)], [(3, 0), (3, 1), (4, 1), (4, 0)],
+                     [(10, 10), (10, 12), (12, 12), (12, 10)]]
+
+
+def test_shape_filters(shoreline):
+    assert len(read_rings(shoreline, bbox=(9, 9, 20, 20))[2]) == 2
+    assert read_rings(shoreline, levels=(1,))[2].tolist() == [0, 4, 8]
+    assert len(read_rings(shoreline, levels=(3,))[0]) == 0
+
+
+def test_ring_graph_equals_polygon_graph(shoreline):
+    rings = read_rings(shoreline)
+    expected = Graph(ring_polygons(*rings))
+    for graph in (Graph.from_rings(*rings), load_graph(shoreline)):
+        assert set(graph.get_edges()) == set(expected.get_edges())
+        assert {point: point.polygon_id for point in graph.get_points()} == \
+            {point: point.polygon_id for point in expected.get_points()}
+
+
+def test_short_rings_are_skipped():
+    graph = Graph.from_rings(np.array([0.0, 1.0, 5.0, 6.0, 6.0]), np.array([0.0, 0.0, 5.0, 5.0, 6.0]),
+                             np.array([0, 2, 5]))
+    assert len(graph.get_points()) == 3 and len(graph.get_edges()) == 3
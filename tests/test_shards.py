@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+import vis_graph
+from conftest import DATASETS, build, visibility_edges
+from shards import COMPLETED
+from vis_graph import VisGraph
+
+
+@pytest.mark.parametrize("reduced", [False, True])
+def test_checkpointed_build_equals_build(tmp_path, reduced):
+    polygons = DATASETS["concave"](100, 17)
+    built = build(polygons, reduced=reduced)
+    checkpointed = VisGraph()
+    checkpointed.build_checkpointed(polygons, str(tmp_path / "shards"), str(tmp_path / "graph"),
+                                    show_progress=False, reduced=reduced, batch_size=10)
+    assert visibility_edges(checkpointed) == visibility_edges(built)
+    assert checkpointed.reduced == reduced
+
+
+def test_resume_runs_only_the_unfinished_batches(tmp_path, monkeypatch):
+    polygons = DATASETS["concave"](100, 17)
+    directory, filename = str(tmp_path / "shards"), str(tmp_path / "graph")
+    graph = VisGraph()
+    graph.build_checkpointed(polygons, directory, filename, show_progress=False, batch_size=10)
+    expected = visibility_edges(graph)
+
+    # An interruption after three batches, in the middle of the fourth line.
+    completed = os.path.join(directory, COMPLETED)
+    with open(completed) as file:
+        lines = file.readlines()
+    with open(completed, "w") as file:
+        file.writelines(lines[:3] + [lines[3].rstrip("\n")])
+
+    sweeps = []
+    original = vis_graph._visibility_pairs
+
+    def counted(obstacles, ids, reduced=False):
+        sweeps.append(ids)
+        return original(obstacles, ids, reduced)
+
+    monkeypatch.setattr(vis_graph, "_visibility_pairs", counted)
+    resumed = VisGraph()
+    resumed.build_checkpointed(polygons, directory, filename, show_progress=False, batch_size=10)
+    assert len(sweeps) == len(lines) - 3
+    assert visibility_edges(resumed) == expected
+
+    with pytest.raises(ValueError):
+        VisGraph().build_checkpointed(polygons, directory, filename, show_progress=False, reduced=True,
+                                      batch_size=10)
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from conftest import DATASETS, build, free_points
+from shortest_path import shortest_path
+
+METHODS = ("dijkstra", "astar", "bidirectional")
+
+
+@pytest.fixture(scope="module")
+def concave():
+    polygons = DATASETS["concave"](200, 6)
+    graph = build(polygons)
+    return polygons, graph
+
+
+def test_searches_find_paths_as_short_as_dijkstra(concave):
+    polygons, graph = concave
+    points = free_points(12, polygons, 6)
+    vertices = list(graph.points)
+    rnd = random.Random(6)
+    pairs = list(zip(points, points[6:])) + [tuple(rnd.sample(vertices, 2)) for _ in range(6)]
+    for origin, destination in pairs:
+        expected = graph.path_length(graph.shortest_path(origin, destination))
+        for method in METHODS[1:]:
+            path = graph.shortest_path(origin, destination, method=method)
+            assert path[0] == origin and path[-1] == destination
+            assert graph.path_length(path) == pytest.approx(expected)
+
+
+def test_point_graph_searches_agree_with_the_csr_searches(concave):
+    _, graph = concave
+    visgraph = graph.visgraph
+    rnd = random.Random(7)
+    for _ in range(6):
+        origin, destination = rnd.sample(list(graph.points), 2)
+        expected = graph.path_length(graph.shortest_path(origin, destination))
+        for method in METHODS:
+            path = shortest_path(visgraph, origin, destination, method=method)
+            assert graph.path_length(path) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_queries_equal_single_queries(concave, workers):
+    polygons, graph = concave
+    origins = free_points(3, polygons, 12) + [graph.points[0]]
+    destinations = free_points(4, polygons, 13) + [graph.points[5], origins[0]]
+    paths = graph.shortest_paths(origins, destinations, workers=workers)
+    matrix = graph.distance_matrix(origins, destinations, workers=workers)
+    for i, origin in enumerate(origins):
+        expected = [graph.path_length(graph.shortest_path(origin, destination)) for destination in destinations]
+        assert [graph.path_length(path) for path in paths[i]] == pytest.approx(expected)
+        assert all(path[0] == origin and path[-1] == destination
+                   for path, destination in zip(paths[i], destinations))
+        assert matrix[i] == pytest.approx(expected)
+        assert graph.distances_from(origin, destinations) == pytest.approx(expected)
@@ -0,0 +1,55 @@
+import math
+
+import pytest
+
+from conftest import DATASETS, build, free_points
+from graph import Graph
+from simplify import resolution_levels
+from vis_graph import build_levels
+from visible_vertices import CLNR, ccw, on_segment, polygon_crossing, visible_vertices
+
+TOLERANCES = [0.5, 2.0, 5.0]
+
+
+def _covers(edges, point):
+    """True if point lies inside or on the boundary of the polygon of edges."""
+    return polygon_crossing(point, edges) or any(
+        ccw(edge.p1, point, edge.p2) == CLNR and on_segment(edge.p1, point, edge.p2) for edge in edges)
+
+
+def _distance(point, edges):
+    def to_edge(a, b):
+        length = (b.x - a.x) ** 2 + (b.y - a.y) ** 2
+        t = max(0.0, min(1.0, ((point.x - a.x) * (b.x - a.x) + (point.y - a.y) * (b.y - a.y)) / length))
+        return math.hypot(point.x - a.x - t * (b.x - a.x), point.y - a.y - t * (b.y - a.y))
+    return min(to_edge(edge.p1, edge.p2) for edge in edges)
+
+
+def test_levels_grow_outward_within_tolerance():
+    original = DATASETS["fractal"](128, 18)
+    previous, sizes = original, [sum(len(polygon) for polygon in original)]
+    for tolerance, polygons in resolution_levels(original, TOLERANCES):
+        assert len(polygons) == len(original)
+        simplified = Graph(polygons).polygons
+        for k, polygon in enumerate(original):
+            edges = simplified[k]
+            assert all(_covers(edges, point) for point in previous[k])
+            assert max(_distance(point, edges) for point in polygon) <= tolerance
+        sizes.append(sum(len(polygon) for polygon in polygons))
+        previous = polygons
+    assert sizes == sorted(sizes, reverse=True) and sizes[-1] < sizes[0] / 2
+
+
+def test_level_paths_avoid_the_original_obstacles():
+    original = DATASETS["fractal"](128, 18)
+    full = build(original)
+    points = free_points(8, original, 18)
+    levels = build_levels(original, TOLERANCES, show_progress=False)
+    assert [tolerance for tolerance, _ in levels] == TOLERANCES
+    for tolerance, graph in levels:
+        for origin, destination in zip(points, points[4:]):
+            path = graph.shortest_path(origin, destination)
+            for p, q in zip(path, path[1:]):
+                assert q in visible_vertices(p, full.obstacles, destination=q)
+            expected = full.path_length(full.shortest_path(origin, destination))
+            assert graph.path_length(path) >= expected - 1e-9
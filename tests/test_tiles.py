@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from conftest import DATASETS, build, free_points
+from graph import Point
+from graph_file import read_graph_file
+from tiles import OBSTACLE_STORE, TiledVisGraph, _tile_filename
+from visible_vertices import visible_vertices
+
+
+@pytest.fixture(scope="module")
+def scene(tmp_path_factory):
+    # Concave polygons spanning several 130-wide tiles, with narrow bays.
+    polygons = DATASETS["concave"](400, 7)
+    full = build(polygons)
+    tiled = TiledVisGraph.build(polygons, str(tmp_path_factory.mktemp("tiles")), 130, show_progress=False)
+    return polygons, full, tiled
+
+
+def _crosses(full, path):
+    return any(q not in visible_vertices(full._obstacle_point(p), full.obstacles, destination=q)
+               for p, q in zip(path, path[1:]))
+
+
+def test_tiled_paths_avoid_every_obstacle(scene):
+    polygons, full, tiled = scene
+    points = free_points(20, polygons, 3)
+    rnd = random.Random(0)
+    for _ in range(15):
+        origin, destination = rnd.sample(points, 2)
+        path = tiled.shortest_path(origin, destination)
+        assert path[0] == origin and path[-1] == destination
+        assert not _crosses(full, path)
+        expected = full.path_length(full.shortest_path(origin, destination))
+        assert tiled.path_length(path) >= expected - 1e-9
+
+
+def test_points_outside_the_built_tiles(scene):
+    polygons, full, tiled = scene
+    origin = free_points(1, polygons, 4)[0]
+    destination = Point((tiled.extent[2] + 3) * 130 + 5, (tiled.extent[3] + 2) * 130 + 5)
+    path = tiled.shortest_path(origin, destination)
+    assert path[0] == origin and path[-1] == destination
+    assert not _crosses(full, path)
+
+
+def test_queries_load_a_corridor_of_tiles(scene):
+    polygons, full, tiled = scene
+    tiled = TiledVisGraph(tiled.directory)
+    left, bottom, right, top = tiled.extent
+    origin = Point(left * 130 + 5, bottom * 130 + 5)
+    destination = Point(right * 130 + 125, top * 130 + 125)
+    path = tiled.shortest_path(origin, destination)
+    assert path[0] == origin and path[-1] == destination
+    assert not _crosses(full, path)
+    assert len(tiled.tiles & set(tiled._loaded)) < len(tiled.tiles)
+    # Only the tiles holding an endpoint have their obstacles prepared.
+    assert set(tiled._prepared) == {tiled.tile_of(origin), tiled.tile_of(destination)}
+
+
+def test_obstacles_are_stored_once(scene):
+    polygons, full, tiled = scene
+    store, _ = read_graph_file(f"{tiled.directory}/{OBSTACLE_STORE}")
+    assert len(store['obstacle_xs']) == sum(len(polygon) for polygon in polygons)
+    for key in tiled.tiles:
+        arrays, _ = read_graph_file(f"{tiled.directory}/{_tile_filename(key)}")
+        assert 'obstacle_xs' not in arrays
+        assert set(arrays['polygon_ids'].tolist()) <= set(arrays['polygons'].tolist()) | {-1}
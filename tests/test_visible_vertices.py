@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+
+from conftest import DATASETS, free_points
+from graph import Edge, Graph, Point
+from obstacles import PreparedObstacles
+from visible_vertices import (INFINTY, OpenEdges, edge_intersect, point_edge_distance, visible_ids,
+                              visible_pairs_array, visible_vertices)
+
+
+def test_visibility_is_symmetric_along_collinear_boundaries():
+    # Vertices of the grid's squares line up along their sides, so sweeps
+    # pass through runs of collinear vertices and along polygon edges.
+    obstacles = PreparedObstacles(Graph(DATASETS["grid"](100, 0)))
+    visible = [set(visible_ids(point, obstacles)) for point in obstacles.points]
+    assert all(i in visible[j] for i in range(len(visible)) for j in visible[i])
+
+
+def test_pairwise_visibility_matches_the_sweep():
+    for name in ("grid", "concave", "fractal"):
+        obstacles = PreparedObstacles(Graph(DATASETS[name](100, 1)))
+        for i, point in enumerate(obstacles.points):
+            others = np.arange(len(obstacles.points))
+            others = others[others != i]
+            expected = set(visible_ids(point, obstacles))
+            assert set(others[visible_pairs_array(obstacles, i, others)].tolist()) == expected
+
+
+def _brute_force(point, graph):
+    """The vertices whose segment from point meets no edge but those at the vertex."""
+    edges = graph.get_edges()
+    return {vertex for vertex in graph.get_points()
+            if not any(edge_intersect(point, vertex, edge) for edge in edges if vertex not in edge)}
+
+
+def test_visible_vertices_match_brute_force():
+    for name in ("convex", "concave", "fractal"):
+        polygons = DATASETS[name](100, 2)
+        graph = Graph(polygons)
+        obstacles = PreparedObstacles(graph)
+        for point in free_points(10, polygons, 2):
+            assert set(visible_vertices(point, obstacles)) == _brute_force(point, graph)
+
+
+def test_open_edges_stay_ordered_by_ray_distance():
+    rnd = random.Random(0)
+    origin, ray = Point(0, 0), Point(INFINTY, 0)
+    edges = [Edge(Point(x, -1 - rnd.random()), Point(x + rnd.random(), 1 + rnd.random()))
+             for x in rnd.sample(range(1, 1000), 200)]
+    open_edges = OpenEdges()
+    for edge in edges:
+        open_edges.insert(origin, ray, edge)
+    by_distance = sorted(edges, key=lambda edge: point_edge_distance(origin, ray, edge))
+    assert list(open_edges) == by_distance
+
+    for edge in rnd.sample(edges, 150):
+        open_edges.delete(origin, ray, edge)
+        by_distance.remove(edge)
+        assert len(open_edges) == len(by_distance)
+        assert open_edges.smallest() == by_distance[0]
+    assert list(open_edges) == by_distance
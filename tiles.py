@@ -0,0 +1,417 @@
+import json
+import os
+from collections import OrderedDict
+from math import floor
+from multiprocessing import Pool
+from tqdm import tqdm
+import numpy as np
+
+from graph import CSRGraph, Graph, Point
+from graph_file import read_graph_file, write_graph_file
+from metrics import get_metric
+from obstacles import PreparedObstacles
+from shortest_path import dijkstra_csr_targets, path_ids
+from vis_graph import OBSTACLE_ARRAYS, VisGraph, _unobstructed, _visibility_pairs
+from visible_vertices import CLNR, ccw, on_segment, polygon_crossing, visible_vertices
+
+TILE_INDEX = "tiles.json"
+OBSTACLE_STORE = "obstacles.graph"  # the polygons of every tile, stored once
+PORTALS_PER_SIDE = 8  # portal intervals along each tile border by default
+LOADED_TILES = 64  # tile CSR graphs kept in memory by a TiledVisGraph at once
+PREPARED_TILES = 8  # tiles whose obstacles are kept prepared to attach query points
+
+
+class TiledVisGraph:
+    """
+    A visibility graph partitioned into square tiles, for maps too large to
+    build or hold as one VisGraph.
+
+    Every tile holds the visibility edges among the obstacle vertices inside
+    it, plus portal points spaced along its borders, as a CSR graph saved to
+    its own file. The obstacles are saved once, to an obstacle store shared
+    by the tiles, which only list the ids of the polygons overlapping them.
+    Neighbouring tiles share the portals on their common border, which
+    stitches them together. A query loads the tiles of a corridor along the
+    line between its endpoints, widened if no path is found in it, and
+    prepares the obstacles of the tiles holding its endpoints only. Queries
+    outside the built tiles pass through obstacle-free tiles made on the fly.
+
+    Paths cross tile borders only at portals or obstacle vertices, so they
+    can be longer than the shortest path of an untiled graph by up to the
+    portal spacing per crossing; they never cross an obstacle.
+    """
+
+    def __init__(self, directory, max_tiles=LOADED_TILES):
+        """
+        Open a tiled graph written by build.
+
+        :param max_tiles: Number of tile graphs kept loaded for queries.
+        """
+        self.directory = directory
+        with open(os.path.join(directory, TILE_INDEX)) as file:
+            index = json.load(file)
+        self.tile_size = index['tile_size']
+        self.portals_per_side = index['portals_per_side']
+        self.reduced = index['reduced']
+        self.metric = index['metric']
+        self.tiles = {tuple(key) for key in index['tiles']}
+        cols, rows = zip(*self.tiles)
+        self.extent = (min(cols), min(rows), max(cols), max(rows))  # corner keys of the built tiles
+        self.max_tiles = max_tiles
+        self._store = read_graph_file(os.path.join(directory, OBSTACLE_STORE))[0]
+        self._loaded = OrderedDict()  # (col, row) -> CSRGraph
+        self._prepared = OrderedDict()  # (col, row) -> VisGraph of the tile with its obstacles
+
+    @classmethod
+    def build(cls, input_data, directory, tile_size, portals_per_side=PORTALS_PER_SIDE, workers=1,
+              show_progress=True, reduced=False, metric="euclidean"):
+        """
+        Build one tile graph per tile of the obstacles' bounding box, widened
+        by a tile on every side so routes can pass around the outermost
+        obstacles, and write them with the obstacle store and an index to
+        directory.
+
+        :param input_data: List of polygons representing obstacles.
+        :param tile_size: Side of a tile, in the units of the coordinates.
+        :param portals_per_side: Portal intervals along each tile border.
+        :param workers: Number of processes building tiles in parallel.
+        :param reduced: Build reduced tile graphs, see VisGraph.build.
+        :param metric: Edge weight metric, see VisGraph.build.
+        :return: The TiledVisGraph of directory.
+        """
+        get_metric(metric)
+        os.makedirs(directory, exist_ok=True)
+        graph = Graph([[Point(point.x, point.y) for point in polygon]
+                       for polygon in input_data if len(polygon) > 2])
+        store = os.path.join(directory, OBSTACLE_STORE)
+        write_graph_file(store, _store_arrays(graph), reduced=reduced, metric=metric)
+        boxes = {}
+        for polygon_id, edges in graph.polygons.items():
+            points = [point for edge in edges for point in (edge.p1, edge.p2)]
+            boxes[polygon_id] = (min(point.x for point in points), min(point.y for point in points),
+                                 max(point.x for point in points), max(point.y for point in points))
+        if boxes:
+            cols = range(floor(min(box[0] for box in boxes.values()) / tile_size) - 1,
+                         floor(max(box[2] for box in boxes.values()) / tile_size) + 2)
+            rows = range(floor(min(box[1] for box in boxes.values()) / tile_size) - 1,
+                         floor(max(box[3] for box in boxes.values()) / tile_size) + 2)
+        else:
+            cols = rows = range(0, 1)
+
+        # Ids of the polygons per tile whose bounding box meets the closed tile.
+        members = {(col, row): [] for col in cols for row in rows}
+        for polygon_id, box in boxes.items():
+            for col in range(floor(box[0] / tile_size) - 1, floor(box[2] / tile_size) + 2):
+                for row in range(floor(box[1] / tile_size) - 1, floor(box[3] / tile_size) + 2):
+                    if col * tile_size <= box[2] and box[0] <= (col + 1) * tile_size and \
+                            row * tile_size <= box[3] and box[1] <= (row + 1) * tile_size:
+                        members[col, row].append(polygon_id)
+
+        tasks = [(key, members[key], store, tile_size, portals_per_side, reduced, metric,
+                  os.path.join(directory, _tile_filename(key))) for key in members]
+        if workers > 1:
+            with Pool(workers) as pool:
+                for _ in tqdm(pool.imap_unordered(_build_tile, tasks), total=len(tasks),
+                              disable=not show_progress, desc="Building tiles (parallel)"):
+                    pass
+        else:
+            for task in tqdm(tasks, disable=not show_progress, desc="Building tiles"):
+                _build_tile(task)
+
+        index = {'tile_size': tile_size, 'portals_per_side': portals_per_side, 'reduced': reduced,
+                 'metric': metric, 'tiles': sorted(members)}
+        with open(os.path.join(directory, TILE_INDEX), 'w') as file:
+            json.dump(index, file)
+        return cls(directory)
+
+    def tile_of(self, point):
+        """Return the (col, row) key of the tile containing point."""
+        return floor(point.x / self.tile_size), floor(point.y / self.tile_size)
+
+    def tile(self, key):
+        """
+        Return the CSR graph of a tile, loading it if necessary. Tiles
+        outside the built ones hold no obstacles and are made of portals only.
+        """
+        csr = self._loaded.get(key)
+        if csr is not None:
+            self._loaded.move_to_end(key)
+            return csr
+        if key in self.tiles:
+            arrays, _ = read_graph_file(os.path.join(self.directory, _tile_filename(key)))
+            csr = CSRGraph(arrays['xs'], arrays['ys'], arrays['polygon_ids'],
+                           arrays['indptr'], arrays['indices'], arrays['weights'])
+        else:
+            csr = self._tile_graph(key, []).csr
+        self._loaded[key] = csr
+        if len(self._loaded) > self.max_tiles:
+            self._loaded.popitem(last=False)
+        return csr
+
+    def _prepared_tile(self, key):
+        """
+        Return the VisGraph of a tile, its CSR graph with the polygons
+        overlapping it prepared from the obstacle store, to attach query
+        points to it.
+        """
+        graph = self._prepared.get(key)
+        if graph is not None:
+            self._prepared.move_to_end(key)
+            return graph
+        if key in self.tiles:
+            arrays, _ = read_graph_file(os.path.join(self.directory, _tile_filename(key)))
+            graph = VisGraph(cache_size=0)
+            graph.obstacles = _tile_obstacles(self._store, arrays['polygons'])
+            graph.csr = self.tile(key)
+            graph.reduced, graph.metric = self.reduced, self.metric
+        else:
+            graph = self._tile_graph(key, [])
+        self._prepared[key] = graph
+        if len(self._prepared) > PREPARED_TILES:
+            self._prepared.popitem(last=False)
+        return graph
+
+    def _tile_graph(self, key, polygon_ids):
+        return _tile_graph(key, _tile_obstacles(self._store, polygon_ids), self.tile_size,
+                           self.portals_per_side, self.reduced, self.metric)
+
+    def shortest_path(self, origin, destination, margin=1):
+        """
+        Compute a shortest path between two points through the tiles.
+
+        :param margin: Tiles added on every side of the tiles along the line
+            between the endpoint tiles to form the first corridor searched;
+            it is doubled until a path is found or the corridor holds every
+            built tile.
+        :return: List of points of the path, or None if there is none.
+        """
+        start, end = self.tile_of(origin), self.tile_of(destination)
+        while True:
+            corridor = _corridor(start, end, margin)
+            path = self._search(corridor, origin, destination)
+            if path is not None or self.tiles.issubset(corridor):
+                return path
+            margin = max(2 * margin, 1)
+
+    def path_length(self, path):
+        """Return the length of a path of points in the metric of the tiles."""
+        distance = get_metric(self.metric)[1]
+        return sum(distance(p, q) for p, q in zip(path, path[1:]))
+
+    def _search(self, keys, origin, destination):
+        """Run Dijkstra on the tiles of keys, stitched together at their portals."""
+        csr, offsets, inverse = _stitch([self.tile(key) for key in keys])
+        offsets = dict(zip(keys, offsets))
+        distance = get_metric(self.metric)[1]
+
+        def attachment(point):
+            key = self.tile_of(point)
+            graph, offset = self._prepared_tile(key), offsets[key]
+            edges = [(inverse[offset + i], weight) for i, weight in graph._attachment_edges(point)]
+            portals = np.flatnonzero(graph.csr.polygon_ids == -1)
+            xs, ys = graph.csr.xs[portals], graph.csr.ys[portals]
+            seen = _unobstructed(point.x, point.y, xs, ys, graph.obstacles)
+            edges += [(inverse[offset + i], distance(point, graph.csr.point(i)))
+                      for i in portals[seen].tolist()]
+            return edges
+
+        origin_id = csr.index_of(origin)
+        dest_id = csr.index_of(destination)
+        extra_edges = {}
+        if origin_id is None:
+            origin_id = len(csr)
+            extra_edges[origin_id] = attachment(origin)
+        if dest_id is None:
+            dest_id = len(csr) + 1
+            for i, weight in attachment(destination):
+                extra_edges.setdefault(i, []).append((dest_id, weight))
+            if origin_id == len(csr) and self.tile_of(origin) == self.tile_of(destination) and \
+                    self._prepared_tile(self.tile_of(origin))._sees(origin, destination):
+                extra_edges[origin_id].append((dest_id, distance(origin, destination)))
+
+        _, predecessors = dijkstra_csr_targets(csr, origin_id, [dest_id], extra_edges)
+        ids = path_ids(predecessors, origin_id, dest_id)
+        if ids is None:
+            return None
+        ends = {len(csr): origin, len(csr) + 1: destination}
+        return [ends[i] if i in ends else csr.point(i) for i in ids]
+
+
+def _tile_filename(key):
+    return f"tile_{key[0]}_{key[1]}.graph"
+
+
+def _store_arrays(graph):
+    """
+    Return the obstacle arrays of graph, see Graph.to_arrays, with the
+    vertices and edges ordered by polygon id, and the index ranges of every
+    polygon's vertices and edges in them, so the polygons of a tile are
+    read from the store by slicing.
+    """
+    xs, ys, polygon_ids, edges, edge_polygons = graph.to_arrays()
+    order = np.argsort(polygon_ids, kind='stable')
+    renumber = np.empty(len(order), dtype=np.int32)
+    renumber[order] = np.arange(len(order), dtype=np.int32)
+    edge_order = np.argsort(edge_polygons, kind='stable')
+    count = max(graph.polygons, default=-1) + 2
+    arrays = dict(zip(OBSTACLE_ARRAYS, (xs[order], ys[order], polygon_ids[order],
+                                         renumber[edges[edge_order]], edge_polygons[edge_order])))
+    arrays['polygon_vertices'] = np.searchsorted(polygon_ids[order], np.arange(count)).astype(np.int64)
+    arrays['polygon_edges'] = np.searchsorted(edge_polygons[edge_order], np.arange(count)).astype(np.int64)
+    return arrays
+
+
+def _tile_obstacles(store, polygon_ids):
+    """
+    Prepare the polygons polygon_ids of an obstacle store, see
+    _store_arrays, with the vertices their edges share with other polygons.
+    """
+    edge_ids = _ranges(store['polygon_edges'], polygon_ids)
+    edges = store['obstacle_edges'][edge_ids]
+    vertex_ids = np.union1d(_ranges(store['polygon_vertices'], polygon_ids), edges.reshape(-1))
+    return PreparedObstacles.from_arrays(
+        store['obstacle_xs'][vertex_ids], store['obstacle_ys'][vertex_ids],
+        store['obstacle_polygon_ids'][vertex_ids], np.searchsorted(vertex_ids, edges).astype(np.int32),
+        store['obstacle_edge_polygons'][edge_ids])
+
+
+def _ranges(indptr, ids):
+    """Return the concatenated ranges indptr[i]:indptr[i + 1] of the ids."""
+    return np.concatenate([np.arange(indptr[i], indptr[i + 1]) for i in ids] +
+                          [np.zeros(0, dtype=np.int64)])
+
+
+def _build_tile(task):
+    """
+    Build and save the CSR graph of one tile, with the ids of the polygons
+    overlapping it.
+
+    :param task: (key, polygon ids, obstacle store filename, tile_size,
+        portals_per_side, reduced, metric, filename).
+    """
+    key, polygon_ids, store, tile_size, portals_per_side, reduced, metric, filename = task
+    obstacles = _tile_obstacles(read_graph_file(store)[0], polygon_ids)
+    csr = _tile_graph(key, obstacles, tile_size, portals_per_side, reduced, metric).csr
+    arrays = {'xs': csr.xs, 'ys': csr.ys, 'polygon_ids': csr.polygon_ids, 'indptr': csr.indptr,
+              'indices': csr.indices, 'weights': csr.weights,
+              'polygons': np.array(polygon_ids, dtype=np.int32)}
+    write_graph_file(filename, arrays, reduced=reduced, metric=metric)
+
+
+def _tile_graph(key, obstacles, tile_size, portals_per_side, reduced, metric):
+    """
+    Return the VisGraph of one tile: the visibility edges between the
+    vertices inside the tile of the whole polygons overlapping it, obstacles,
+    extended with portals. The polygons are not clipped, so the edges are
+    checked against every obstacle they can meet; polygons missing from the
+    tile only lie beyond it, where no edge reaches.
+    """
+    col, row = key
+    graph = VisGraph(cache_size=0)
+    graph.obstacles = obstacles
+    graph.reduced, graph.metric = reduced, metric
+    inside = _inside(key, tile_size, obstacles.xs, obstacles.ys)
+    pairs = [(i, j) for i, j in _visibility_pairs(obstacles, np.flatnonzero(inside).tolist(), reduced)
+             if inside[j]]
+
+    # Portals get the ids after the obstacle vertices.
+    portals = [point for point in _portals(col, row, tile_size, portals_per_side)
+               if not _blocked(point, obstacles)]
+    first = len(obstacles.points)
+    xs = np.array([point.x for point in portals])
+    ys = np.array([point.y for point in portals])
+    for k, portal in enumerate(portals):
+        for vertex in graph._attachable(portal, visible_vertices(portal, obstacles)):
+            i = obstacles.index[vertex]
+            if inside[i]:
+                pairs.append((first + k, i))
+        others = np.arange(k + 1, len(portals))
+        others = others[_unobstructed(portal.x, portal.y, xs[others], ys[others], obstacles)]
+        pairs.extend((first + k, first + j) for j in others.tolist())
+    graph.csr = CSRGraph.from_pairs(np.concatenate((obstacles.xs, xs)), np.concatenate((obstacles.ys, ys)),
+                                    np.concatenate((obstacles.polygon_ids, np.full(len(portals), -1))),
+                                    pairs, get_metric(metric)[0])
+    return graph
+
+
+def _inside(key, tile_size, xs, ys):
+    """Mask of the points xs, ys in the closed square of the tile key."""
+    col, row = key
+    return (xs >= col * tile_size) & (xs <= (col + 1) * tile_size) & \
+           (ys >= row * tile_size) & (ys <= (row + 1) * tile_size)
+
+
+def _corridor(start, end, margin):
+    """
+    Return the keys of the tiles within margin tiles, on every side, of the
+    tiles along the line from tile start to tile end.
+    """
+    steps = max(abs(end[0] - start[0]), abs(end[1] - start[1]), 1)
+    fractions = np.arange(steps + 1) / steps
+    cols = start[0] + np.rint((end[0] - start[0]) * fractions).astype(np.int64)
+    rows = start[1] + np.rint((end[1] - start[1]) * fractions).astype(np.int64)
+    keys = []
+    # The line's rows near every column form one run, as it moves a tile at a time.
+    for col in range(int(cols.min()) - margin, int(cols.max()) + margin + 1):
+        near = rows[np.abs(cols - col) <= margin]
+        keys.extend((col, row) for row in range(int(near.min()) - margin, int(near.max()) + margin + 1))
+    return keys
+
+
+def _portals(col, row, tile_size, portals_per_side):
+    """
+    Points spaced along the borders of a tile. Each border is computed the
+    same way for both tiles it separates, so they get identical portals.
+    """
+    step = tile_size / portals_per_side
+    points = {}
+    for r in (row, row + 1):  # bottom and top border
+        for k in range(portals_per_side + 1):
+            point = Point(col * tile_size + k * step, r * tile_size)
+            points[point] = point
+    for c in (col, col + 1):  # left and right border
+        for k in range(portals_per_side + 1):
+            point = Point(c * tile_size, row * tile_size + k * step)
+            points[point] = point
+    return list(points)
+
+
+def _blocked(point, obstacles):
+    """True if point lies inside or on the boundary of a polygon of PreparedObstacles."""
+    for polygon in obstacles.polygons.values():
+        if not polygon.in_bbox(point.x, point.y):
+            continue
+        for edge in polygon.edges:
+            if ccw(edge.p1, point, edge.p2) == CLNR and on_segment(edge.p1, point, edge.p2):
+                return True
+        if polygon_crossing(point, polygon.edges):
+            return True
+    return False
+
+
+def _stitch(csrs):
+    """
+    Join tile CSR graphs into one, merging vertices at the same coordinates,
+    i.e. the portals tiles share.
+
+    :return: (the CSRGraph, the offset of every tile's ids in the
+        concatenated ids, the merged id of every concatenated id).
+    """
+    offsets = np.cumsum([0] + [len(csr) for csr in csrs[:-1]]).tolist()
+    xs = np.concatenate([csr.xs for csr in csrs])
+    ys = np.concatenate([csr.ys for csr in csrs])
+    polygon_ids = np.concatenate([csr.polygon_ids for csr in csrs])
+    coordinates, first, inverse = np.unique(np.column_stack((xs, ys)), axis=0,
+                                            return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sources = np.concatenate([np.repeat(np.arange(len(csr)) + offset, np.diff(csr.indptr))
+                              for csr, offset in zip(csrs, offsets)])
+    targets = np.concatenate([np.asarray(csr.indices) + offset for csr, offset in zip(csrs, offsets)])
+    weights = np.concatenate([csr.weights for csr in csrs])
+    sources, targets = inverse[sources], inverse[targets]
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(len(coordinates) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(sources, minlength=len(coordinates)), out=indptr[1:])
+    csr = CSRGraph(coordinates[:, 0].copy(), coordinates[:, 1].copy(), polygon_ids[first],
+                   indptr, targets[order].astype(np.int32), weights[order])
+    return csr, offsets, inverse.tolist()
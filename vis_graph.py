@@ -1,11 +1,36 @@
 from timeit import default_timer
+from collections import OrderedDict
 from multiprocessing import Pool
 from tqdm import tqdm
+import numpy as np
 from warnings import warn
 
-from graph import Graph, Edge
-from shortest_path import shortest_path
-from visible_vertices import visible_vertices
+import instrumentation
+from contraction import ContractionHierarchy
+from graph import CSRGraph, Graph, Edge
+from graph_file import read_graph_file, write_graph_file
+from metrics import get_metric
+from obstacles import PreparedObstacles
+from predicates import CCW, CW, orient_array
+from rotational_sweep import rotational_visibility_edges
+from shards import ShardStore, fingerprint
+from simplify import resolution_levels
+from shortest_path import dijkstra_csr_targets, path_ids, shortest_path_csr
+from visible_vertices import (bitangent, edge_in_polygon, edge_intersect_array, tangent_at,
+                              visible_ids, visible_pairs_array, visible_vertices)
+
+MAX_BATCH_SIZE = 64  # points per parallel task at most
+BATCHES_PER_WORKER = 16  # aim for this many tasks per worker to balance load
+
+ATTACH_CACHE_SIZE = 4096  # query points whose visible vertices are cached
+UNOBSTRUCTED_CHUNK = 1 << 22  # segment-edge tests per numpy block in _unobstructed
+# Graph file arrays of the obstacle graph, in the order of Graph.to_arrays.
+OBSTACLE_ARRAYS = ('obstacle_xs', 'obstacle_ys', 'obstacle_polygon_ids', 'obstacle_edges',
+                   'obstacle_edge_polygons')
+
+_worker_obstacles = None  # PreparedObstacles of a pool worker, see _init_worker
+_worker_reduced = False
+_worker_query = None  # (csr, extra edges, target ids, want paths) of a query worker
 
 
 class VisGraph:
@@ -13,73 +38,588 @@ class VisGraph:
     Class representing a visibility graph for pathfinding and visibility checks.
     """
 
-    def __init__(self):
-        self.graph = None  # Graph representing the obstacles
-        self.visgraph = None  # Visibility graph
-        self.points = None  # Points from the obstacle graph
-        self.pts = None
+    def __init__(self, cache_size=ATTACH_CACHE_SIZE):
+        """
+        :param cache_size: Number of query points whose visible vertices are
+            kept for reuse by shortest_path (0 disables the cache).
+        """
+        self._loaded = None  # obstacle arrays of a loaded graph file, see load
+        self.graph = None  # Graph representing the obstacles, built from _loaded on first use
+        self.visgraph = None  # Visibility graph, built from csr on first use after load
+        self.obstacles = None  # PreparedObstacles shared by every sweep
+        self.reduced = False  # Only bitangent edges between non-reflex vertices
+        self.metric = "euclidean"  # Name of the edge weight metric, see metrics
+        self.csr = None  # Frozen CSR adjacency of visgraph for Dijkstra, built again on first use after edits
+        self.changed_edges = ([], [])  # edges added and removed by the last add_polygon or remove_polygon
+        self.ch = None  # ContractionHierarchy of csr, see contract
+        self.version = 0  # Bumped whenever the obstacles or edges change
+        self.cache_size = cache_size
+        self._attach_cache = OrderedDict()  # (x, y) -> vertices visible from that point
+        self._attach_version = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def graph(self):
+        if self._graph is None and self._loaded is not None:
+            self._graph = Graph.from_arrays(*self._loaded.values())
+            self._loaded = None  # the Graph may change from here on
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph):
+        self._graph = graph
+        self._loaded = None
+
+    @property
+    def obstacles(self):
+        if self._obstacles is None:
+            if self._loaded is not None:
+                self._obstacles = PreparedObstacles.from_arrays(*self._loaded.values())
+            elif self._graph is not None:
+                self._obstacles = PreparedObstacles(self._graph)
+        return self._obstacles
+
+    @obstacles.setter
+    def obstacles(self, obstacles):
+        self._obstacles = obstacles
 
-    def build(self, input_data, workers=1, show_progress=True):
+    @property
+    def points(self):
+        """Points from the obstacle graph, by vertex id."""
+        return self.obstacles.points if self.obstacles is not None else None
+
+    @property
+    def pts(self):
+        return self.points
+
+    @property
+    def csr(self):
+        if self._csr is None and self._pairs is not None:
+            obstacles = self.obstacles
+            self._csr = CSRGraph.from_pairs(obstacles.xs, obstacles.ys, obstacles.polygon_ids, self._pairs,
+                                            get_metric(self.metric)[0])
+        return self._csr
+
+    @csr.setter
+    def csr(self, csr):
+        self._csr = csr
+        self._pairs = None  # vertex id pairs of the edges while they are edited, see _edge_pairs
+
+    @property
+    def visgraph(self):
+        if self._visgraph is None and self.csr is not None:
+            self._visgraph = self.csr.to_graph()
+        return self._visgraph
+
+    @visgraph.setter
+    def visgraph(self, visgraph):
+        self._visgraph = visgraph
+
+    def build(self, input_data, workers=1, show_progress=True, algorithm="lee", reduced=False,
+              metric="euclidean", stats=False):
         """
         Build the visibility graph from input obstacle data.
 
-        :param input_data: List of polygons representing obstacles.
+        :param input_data: List of polygons representing obstacles, or an
+            obstacle Graph such as shapefile_loader.load_graph returns.
         :param workers: Number of parallel workers (1 for single-threaded).
         :param show_progress: Whether to display progress bar.
+        :param algorithm: "lee" for one angular sweep per vertex, O(n^2 log n),
+            or "rotational" for a single rotational sweep over all vertex pairs.
+        :param reduced: Keep only the edges a shortest path can use: edges between
+            non-reflex vertices that are tangent to the obstacles at both ends.
+        :param metric: Edge weight, computed once here and stored with the graph:
+            "euclidean" for planar distance or "haversine" for great-circle km
+            between longitude/latitude points.
+        :param stats: Collect predicate counts and phase times, see
+            instrumentation, including those of the pool workers.
+        :return: The instrumentation.Stats of the build if stats, else None.
         """
-        self.graph = Graph(input_data)
-        self.visgraph = Graph([])
-        self.points = self.graph.get_points()
-        self.pts = self.points
+        if algorithm not in ("lee", "rotational"):
+            raise ValueError(f"Unknown visibility graph algorithm: {algorithm!r}")
+        get_metric(metric)
+        if stats:
+            with instrumentation.collect() as collected:
+                start = default_timer()
+                self.build(input_data, workers, show_progress, algorithm, reduced, metric)
+                collected.add_time("build", default_timer() - start)
+            return collected
+        collecting = instrumentation.current()
+        if collecting is not None:
+            start = default_timer()
 
-        batch_size = 10
-        point_batches = [self.points[i:i + batch_size] for i in range(0, len(self.points), batch_size)]
+        self.graph = input_data if isinstance(input_data, Graph) else Graph(input_data)
+        self.visgraph = None
+        self._prepare_obstacles()
+        self.reduced = reduced
+        self.metric = metric
+        if collecting is not None:
+            collecting.add_time("build.prepare", default_timer() - start)
+            start = default_timer()
 
-        if workers == 1:
-            for batch in tqdm(point_batches, disable=not show_progress, desc="Building visibility graph"):
-                for edge in _generate_visibility_edges(self.graph, batch):
-                    self.visgraph.add_edge(edge)
+        # Edges are collected as vertex id pairs of self.points and only
+        # become Points again if visgraph is used.
+        pairs = []
+        if algorithm == "rotational":
+            if workers != 1:
+                warn("The rotational sweep runs in a single process; workers is ignored.")
+            pairs.extend(rotational_visibility_edges(self.obstacles, show_progress, reduced))
+        elif workers == 1:
+            batch_size = 10
+            batches = [range(i, min(i + batch_size, len(self.points)))
+                       for i in range(0, len(self.points), batch_size)]
+            for batch in tqdm(batches, disable=not show_progress, desc="Building visibility graph"):
+                pairs.extend(_visibility_pairs(self.obstacles, batch, reduced))
         else:
-            with Pool(workers) as pool:
-                results = list(
-                    tqdm(
-                        pool.imap(_process_visibility_batch, [(self.graph, batch) for batch in point_batches]),
-                        total=len(point_batches),
-                        disable=not show_progress,
-                        desc="Building visibility graph (parallel)",
-                    )
-                )
-                for result in results:
-                    for edge in result:
-                        self.visgraph.add_edge(edge)
-
-    def shortest_path(self, origin, destination):
+            # Workers receive the obstacles once, then only index ranges; they
+            # return vertex id pairs that are merged as they arrive.
+            batch_size = max(1, min(MAX_BATCH_SIZE, len(self.points) // (workers * BATCHES_PER_WORKER)))
+            ranges = [(i, min(i + batch_size, len(self.points)))
+                      for i in range(0, len(self.points), batch_size)]
+            initargs = (self.obstacles, reduced, collecting is not None)
+            with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+                for batch_pairs, worker_stats in tqdm(
+                    pool.imap_unordered(_process_visibility_batch, ranges),
+                    total=len(ranges),
+                    disable=not show_progress,
+                    desc="Building visibility graph (parallel)",
+                ):
+                    if collecting is not None:
+                        collecting.merge(worker_stats)
+                        merge_start = default_timer()
+                    pairs.extend(batch_pairs)
+                    if collecting is not None:
+                        collecting.add_time("build.merge", default_timer() - merge_start)
+        if collecting is not None:
+            collecting.add_time("build.edges", default_timer() - start)
+            start = default_timer()
+        self.csr = CSRGraph.from_pairs(*self.obstacles.index.arrays(), pairs, get_metric(self.metric)[0])
+        if collecting is not None:
+            collecting.add_time("build.csr", default_timer() - start)
+
+    def build_checkpointed(self, input_data, directory, filename, workers=1, show_progress=True,
+                           reduced=False, metric="euclidean", batch_size=MAX_BATCH_SIZE):
+        """
+        Build the visibility graph with the per-vertex sweep and write it to
+        a graph file, keeping the edges on disk instead of in memory.
+
+        The edges of every finished batch of sweeps are saved as a shard in
+        directory, see shards.ShardStore. Calling this again with the same
+        obstacles and options after an interruption only runs the batches
+        that were not completed. The shards are then merged into filename,
+        which is loaded.
+
+        :param input_data: List of polygons or obstacle Graph, see build.
+        :param directory: Directory for the shards and their manifest.
+        :param filename: Graph file to write, see save.
+        :param workers: Number of parallel workers (1 for single-threaded).
+        :param show_progress: Whether to display progress bar.
+        :param reduced: Keep only bitangent edges, see build.
+        :param metric: Edge weight, see build.
+        :param batch_size: Points swept per shard.
+        """
+        get_metric(metric)
+        self.graph = input_data if isinstance(input_data, Graph) else Graph(input_data)
+        self.visgraph = None
+        self._prepare_obstacles()
+        obstacles = self.obstacles
+        arrays = self._obstacle_arrays()
+        batches = -(-len(self.points) // batch_size)
+        store = ShardStore(directory, fingerprint(obstacles.xs, obstacles.ys, *arrays.values(),
+                                                  reduced=reduced, batch_size=batch_size), batches)
+
+        tasks = [(batch, batch * batch_size, min((batch + 1) * batch_size, len(self.points)))
+                 for batch in store.pending()]
+        with tqdm(total=batches, initial=batches - len(tasks), disable=not show_progress,
+                  desc="Building visibility graph (checkpointed)") as progress:
+            if workers == 1:
+                for batch, start, stop in tasks:
+                    store.write(batch, _visibility_pairs(obstacles, range(start, stop), reduced))
+                    progress.update(1)
+            elif tasks:
+                with Pool(workers, initializer=_init_worker, initargs=(obstacles, reduced)) as pool:
+                    for batch, pairs in pool.imap_unordered(_process_shard_batch, tasks):
+                        store.write(batch, pairs)
+                        progress.update(1)
+
+        polygon_ids = np.array([point.polygon_id for point in obstacles.points], dtype=np.int32)
+        store.merge(filename, obstacles.xs, obstacles.ys, polygon_ids, get_metric(metric)[0], arrays,
+                    reduced=reduced, metric=metric)
+        self.load(filename)
+
+    def shortest_path(self, origin, destination, method="dijkstra", stats=False):
         """
         Compute the shortest path between two points, considering visibility.
 
         :param origin: Starting point.
         :param destination: Destination point.
-        :return: List of points representing the shortest path.
+        :param method: Search to run: "dijkstra", "astar", "bidirectional" or
+            "ch". The searches run on the vertex ids of the CSR adjacency,
+            "ch" on the contraction hierarchy built by contract.
+        :param stats: Collect search and sweep statistics, see instrumentation.
+        :return: List of points representing the shortest path, None if
+            destination cannot be reached, or (path, instrumentation.Stats)
+            if stats.
         """
-        origin_exists = origin in self.visgraph
-        dest_exists = destination in self.visgraph
+        if stats:
+            with instrumentation.collect() as collected:
+                start = default_timer()
+                path = self.shortest_path(origin, destination, method)
+                collected.add_time("shortest_path", default_timer() - start)
+            return path, collected
+        if method == "ch":
+            return self._shortest_path_ch(origin, destination)
+        distance, metric = self._point_distance, get_metric(self.metric)[0]
+        origin_exists = self._graph_id(origin) is not None
+        dest_exists = self._graph_id(destination) is not None
 
         if origin_exists and dest_exists:
-            return shortest_path(self.visgraph, origin, destination)
+            return shortest_path_csr(self.csr, origin, destination, distance=distance,
+                                     method=method, metric=metric)
 
         additional_graph = Graph([])
 
         if not origin_exists:
-            visible_from_origin = visible_vertices(origin, self.graph, destination=destination)
-            for vertex in visible_from_origin:
+            for vertex in self._visible_from(origin):
                 additional_graph.add_edge(Edge(origin, vertex))
 
         if not dest_exists:
-            visible_from_dest = visible_vertices(destination, self.graph, origin=origin)
-            for vertex in visible_from_dest:
+            for vertex in self._visible_from(destination):
                 additional_graph.add_edge(Edge(destination, vertex))
 
-        return shortest_path(self.visgraph, origin, destination, add_to_visgraph=additional_graph)
+        if not origin_exists and not dest_exists and self._sees(origin, destination):
+            additional_graph.add_edge(Edge(origin, destination))
+
+        return shortest_path_csr(self.csr, origin, destination, add_to_visgraph=additional_graph,
+                                 distance=distance, method=method, metric=metric)
+
+    def path_length(self, path):
+        """
+        Return the length of a path of points in the metric of the graph,
+        the quantity shortest_path minimizes.
+        """
+        return sum(self._point_distance(p, q) for p, q in zip(path, path[1:]))
+
+    @property
+    def _point_distance(self):
+        return get_metric(self.metric)[1]
+
+    def contract(self, show_progress=True):
+        """
+        Preprocess the built graph into a contraction hierarchy for
+        shortest_path(..., method="ch"). It is saved with the graph and
+        dropped when the obstacles change.
+
+        :param show_progress: Whether to display progress bar.
+        """
+        self.ch = ContractionHierarchy.build(self.csr, show_progress=show_progress)
+
+    def _shortest_path_ch(self, origin, destination):
+        """
+        Shortest path by a bidirectional upward search in the contraction
+        hierarchy; endpoints outside the graph seed the searches with their
+        attachment edges. Returns None if destination is unreachable.
+        """
+        if self.ch is None:
+            raise ValueError("No contraction hierarchy: call contract() first")
+        origin_id, dest_id = self._graph_id(origin), self._graph_id(destination)
+        sources = [(origin_id, 0.0)] if origin_id is not None else self._attachment_edges(origin)
+        targets = [(dest_id, 0.0)] if dest_id is not None else self._attachment_edges(destination)
+        length, ids = self.ch.query(sources, targets)
+
+        if origin_id is None and dest_id is None and self._sees(origin, destination) and \
+                self._point_distance(origin, destination) <= length:
+            return [origin, destination]
+        if ids is None:
+            return None
+        path = [self.csr.point(i) for i in ids]
+        if origin_id is None and path[0] != origin:
+            path.insert(0, origin)
+        if dest_id is None and path[-1] != destination:
+            path.append(destination)
+        return path
+
+    def shortest_paths(self, origins, destinations, workers=1):
+        """
+        Compute the shortest paths from every origin to every destination.
+
+        One Dijkstra tree is grown per origin and stopped once all
+        destinations are settled; every endpoint is attached to the graph
+        once.
+
+        :param origins: Starting points.
+        :param destinations: Destination points.
+        :param workers: Number of processes the origins are spread over.
+        :return: paths[i][j], the path from origins[i] to destinations[j] as a
+            list of points, or None if it is unreachable.
+        """
+        points, trees = self._query_trees(origins, destinations, workers, with_paths=True)
+        return [[None if ids is None else [points[i] for i in ids] for ids in paths]
+                for _, paths in trees]
+
+    def distance_matrix(self, origins, destinations, workers=1):
+        """
+        Compute the shortest path lengths from every origin to every destination.
+
+        :param origins: Starting points.
+        :param destinations: Destination points.
+        :param workers: Number of processes the origins are spread over.
+        :return: Dense (len(origins), len(destinations)) float array; inf
+            where a destination is unreachable.
+        """
+        _, trees = self._query_trees(origins, destinations, workers, with_paths=False)
+        matrix = np.full((len(origins), len(destinations)), np.inf)
+        for row, (distances, _) in zip(matrix, trees):
+            row[:] = distances
+        return matrix
+
+    def distances_from(self, origin, targets):
+        """
+        Compute the shortest path lengths from one origin to many targets.
+
+        :param origin: Starting point.
+        :param targets: Destination points.
+        :return: Float array of path lengths; inf where unreachable.
+        """
+        return self.distance_matrix([origin], targets)[0]
+
+    def _query_trees(self, origins, destinations, workers, with_paths):
+        """
+        Attach the endpoints and run one Dijkstra tree per origin.
+
+        :return: (points, trees), where points maps ids to points and trees
+            holds, per origin, the destination distances and id paths.
+        """
+        origins, destinations = list(origins), list(destinations)
+        ids = {}
+        points = _IdPoints(self.csr)
+        for point in origins + destinations:
+            if point not in ids:
+                i = self.csr.index_of(point)
+                if i is None:
+                    i = len(self.csr) + len(points.extra)
+                    points.extra[i] = point
+                ids[point] = i
+
+        # Edges into destinations attached to the graph, shared by every origin.
+        shared = {}
+        outside = [point for point in dict.fromkeys(destinations) if self._graph_id(point) is None]
+        for point in outside:
+            for i, weight in self._attachment_edges(point):
+                shared.setdefault(i, []).append((ids[point], weight))
+
+        tasks = []
+        for origin in origins:
+            edges = []
+            if self._graph_id(origin) is None:
+                edges = self._attachment_edges(origin)
+                seen = self._sees_all(origin, outside)
+                edges += [(ids[point], self._point_distance(origin, point))
+                          for point, free in zip(outside, seen.tolist()) if free and point != origin]
+            tasks.append((ids[origin], edges))
+
+        query = (self.csr, shared, [ids[point] for point in destinations], with_paths)
+        if workers > 1 and len(tasks) > 1:
+            chunksize = max(1, len(tasks) // (workers * BATCHES_PER_WORKER))
+            with Pool(workers, initializer=_init_query_worker, initargs=(query,)) as pool:
+                trees = pool.map(_query_origin, tasks, chunksize=chunksize)
+        else:
+            _init_query_worker(query)
+            trees = [_query_origin(task) for task in tasks]
+        return points, trees
+
+    def _graph_id(self, point):
+        """
+        Return the CSR id of point if searches can start or end at it
+        directly, or None if it has to be attached to the graph like a free
+        point. In a reduced graph every endpoint is attached: the first and
+        last legs of a path need only be tangent at their far end, so the
+        bitangent edges of a vertex can miss them.
+        """
+        return None if self.reduced else self.csr.index_of(point)
+
+    def _obstacle_point(self, point):
+        """Return the obstacle vertex at point, which knows its polygon, or point itself."""
+        i = self.obstacles.index.get(point)
+        return point if i is None else self.obstacles.points[i]
+
+    def _attachment_edges(self, point):
+        """Return (vertex id, distance) pairs joining a query point to the CSR graph."""
+        edges = []
+        for vertex in self._visible_from(point):
+            i = self.csr.index_of(vertex)
+            if i is not None:  # vertices without any visibility edge lead nowhere
+                edges.append((i, self._point_distance(point, vertex)))
+        return edges
+
+    def _visible_from(self, point):
+        """
+        Return the graph vertices a query point attaches to, from the LRU
+        cache when the point was queried before at the same graph version.
+        """
+        if self._attach_version != self.version:
+            self._attach_cache.clear()
+            self._attach_version = self.version
+        key = (point.x, point.y)
+        vertices = self._attach_cache.get(key)
+        if vertices is not None:
+            self._attach_cache.move_to_end(key)
+            self.cache_hits += 1
+            return vertices
+        self.cache_misses += 1
+        vertices = self._attachable(point, visible_vertices(self._obstacle_point(point), self.obstacles))
+        if self.cache_size > 0:
+            self._attach_cache[key] = vertices
+            if len(self._attach_cache) > self.cache_size:
+                self._attach_cache.popitem(last=False)
+        return vertices
+
+    def _sees(self, p1, p2):
+        """Return True if p1 sees p2, see _sees_all."""
+        return bool(self._sees_all(p1, [p2])[0])
+
+    def _sees_all(self, point, others):
+        """
+        Return a mask of the points others visible from point: no obstacle
+        edge blocks the segment to them and, as in visible_vertices, it does
+        not run through the interior of a polygon both ends are vertices of.
+        """
+        seen = _unobstructed(point.x, point.y, np.array([other.x for other in others]),
+                             np.array([other.y for other in others]), self.obstacles)
+        p = self._obstacle_point(point)
+        for k in np.flatnonzero(seen).tolist():
+            q = self._obstacle_point(others[k])
+            if q not in self.obstacles.adjacent_points(p) and edge_in_polygon(p, q, self.obstacles):
+                seen[k] = False
+        return seen
+
+    def cache_stats(self):
+        """
+        Return hit and miss counts and the size of the endpoint cache.
+        """
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'size': len(self._attach_cache),
+            'max_size': self.cache_size,
+        }
+
+    def _attachable(self, point, vertices):
+        """
+        Keep the visible vertices a query point may be connected to; in a
+        reduced graph only those the line from point is tangent at.
+        """
+        if not self.reduced:
+            return vertices
+        return [vertex for vertex in vertices if tangent_at(point, vertex, self.obstacles)]
+
+    def add_polygon(self, polygon):
+        """
+        Add an obstacle polygon to a built graph without rebuilding it: the
+        visibility edges that meet the polygon are checked again and
+        visibility is computed for the new vertices only. The edges added
+        and removed are left in changed_edges.
+
+        :param polygon: List of points of the new polygon.
+        :return: The id of the new polygon.
+        """
+        pairs = self._edge_pairs()
+        new_edges = self.graph.add_polygon(polygon)
+        old = self.obstacles
+        obstacles = old.with_polygon(self.graph, new_edges)
+        pairs = _renumbered(pairs, obstacles.ids_of(old.xs, old.ys))
+
+        xs, ys = obstacles.xs, obstacles.ys
+        meeting = np.flatnonzero(_crossing(xs[pairs[:, 0]], ys[pairs[:, 0]],
+                                           xs[pairs[:, 1]], ys[pairs[:, 1]], new_edges))
+        touched = {}
+        for k, i, j in zip(meeting.tolist(), pairs[meeting, 0].tolist(), pairs[meeting, 1].tolist()):
+            touched.setdefault(i, []).append((k, j))
+        blocked = []
+        for i, others in touched.items():
+            seen = visible_pairs_array(obstacles, i, [j for _, j in others])
+            blocked.extend(k for (k, _), visible in zip(others, seen.tolist()) if not visible)
+
+        new_ids = dict.fromkeys(obstacles.index[point] for edge in new_edges for point in (edge.p1, edge.p2))
+        added = _visibility_pairs(obstacles, new_ids, self.reduced)
+        self._edit_edges(obstacles, np.delete(pairs, blocked, axis=0), added,
+                         [Edge(obstacles.points[i], obstacles.points[j]) for i, j in pairs[blocked].tolist()])
+        return polygon[0].polygon_id
+
+    def remove_polygon(self, polygon_id):
+        """
+        Remove an obstacle polygon from a built graph without rebuilding it:
+        edges at its vertices are dropped and only the vertex pairs whose
+        segment met the polygon are checked for visibility again, see
+        _pairs_crossing. The edges added and removed are left in
+        changed_edges.
+
+        :param polygon_id: Id of the polygon to remove.
+        """
+        pairs = self._edge_pairs()
+        old_edges = self.graph.remove_polygon(polygon_id)
+        old = self.obstacles
+        obstacles, renumber = old.without_polygon(self.graph, polygon_id, old_edges)
+        gone = (renumber[pairs] < 0).any(axis=1)
+        removed = [Edge(old.points[i], old.points[j]) for i, j in pairs[gone].tolist()]
+        pairs = _renumbered(pairs[~gone], renumber)
+
+        ids = np.arange(len(obstacles.points))
+        if self.reduced:
+            ids = ids[~np.asarray(obstacles.reflex, dtype=bool)]
+        candidates = _pairs_crossing(obstacles.xs, obstacles.ys, ids, old_edges)
+        # Pairs that are edges already stay, whatever the polygon did.
+        n = len(obstacles.points)
+        candidates = candidates[~np.isin(candidates[:, 0].astype(np.int64) * n + candidates[:, 1],
+                                         pairs[:, 0].astype(np.int64) * n + pairs[:, 1])]
+        added = []
+        starts = np.flatnonzero(np.diff(candidates[:, 0], prepend=-1))
+        for i, others in zip(candidates[starts, 0].tolist(), np.split(candidates[:, 1], starts[1:])):
+            p = obstacles.points[i]
+            for j in others[visible_pairs_array(obstacles, i, others)].tolist():
+                if self.reduced and not bitangent(p, obstacles.points[j], obstacles):
+                    continue
+                added.append((i, j))
+        self._edit_edges(obstacles, pairs, added, removed)
+
+    def _edge_pairs(self):
+        """
+        Return the visibility edges as an array of (i, j), i < j, vertex id
+        pairs of obstacles, taken from csr unless edited since.
+        """
+        if self._pairs is None:
+            csr = self._csr
+            ids = self.obstacles.ids_of(csr.xs, csr.ys)
+            sources = np.repeat(np.arange(len(csr)), np.diff(csr.indptr))
+            once = sources < csr.indices
+            self._pairs = np.sort(ids[np.column_stack((sources[once], csr.indices[once]))], axis=1)
+        return self._pairs
+
+    def _edit_edges(self, obstacles, pairs, added, removed):
+        """
+        Switch to the edited obstacles, with the visibility edges pairs, in
+        their ids, and the new edges added. The CSR form is only built again
+        when it is used, so several edits in a row pay for it once.
+        """
+        added = np.unique(np.sort(np.asarray(added, dtype=np.int64).reshape(-1, 2), axis=1), axis=0)
+        self.obstacles = obstacles
+        self._pairs = np.concatenate((pairs, added))
+        self._csr = None
+        self.ch = None
+        self.version += 1
+        points = obstacles.points
+        self.changed_edges = ([Edge(points[i], points[j]) for i, j in added.tolist()], removed)
+        if self._visgraph is not None:
+            for edge in removed:
+                self._visgraph.remove_edge(edge)
+            for edge in self.changed_edges[0]:
+                self._visgraph.add_edge(edge)
+
+    def _prepare_obstacles(self):
+        self.obstacles = PreparedObstacles(self.graph)
+        self.ch = None
+        self.version += 1
 
     def find_visible(self, point):
         """
@@ -88,47 +628,265 @@ class VisGraph:
         :param point: The point of interest.
         :return: List of visible vertices.
         """
-        return visible_vertices(point, self.graph)
+        return visible_vertices(point, self.obstacles)
 
     def save(self, filename):
         """
-        Save the obstacle graph and visibility graph to a file.
+        Save the obstacle graph, the visibility graph and, once contracted,
+        its contraction hierarchy to a binary graph file of flat arrays, see
+        graph_file.
         """
-        with open(filename, 'wb') as file:
-            pickle.dump((self.graph, self.visgraph), file, protocol=pickle.HIGHEST_PROTOCOL)
+        arrays = self._obstacle_arrays()
+        arrays.update({
+            'xs': self.csr.xs,
+            'ys': self.csr.ys,
+            'polygon_ids': self.csr.polygon_ids,
+            'indptr': self.csr.indptr,
+            'indices': self.csr.indices,
+            'weights': self.csr.weights,
+        })
+        if self.ch is not None:
+            arrays.update(self.ch.to_arrays())
+        write_graph_file(filename, arrays, reduced=self.reduced, metric=self.metric)
+
+    def _obstacle_arrays(self):
+        if self._loaded is not None:
+            return dict(self._loaded)
+        return dict(zip(OBSTACLE_ARRAYS, self.graph.to_arrays()))
 
     def load(self, filename):
         """
-        Load the obstacle graph and visibility graph from a file.
+        Load the obstacle graph and visibility graph from a file. The arrays
+        stay memory-mapped: the obstacles are prepared straight from them on
+        first use, and graph and visgraph are only built if used.
         """
-        with open(filename, 'rb') as file:
-            self.graph, self.visgraph = pickle.load(file)
+        arrays, metadata = read_graph_file(filename)
+        self.graph = None
+        self._loaded = {name: arrays[name] for name in OBSTACLE_ARRAYS}
+        self.obstacles = None
+        self.csr = CSRGraph(arrays['xs'], arrays['ys'], arrays['polygon_ids'],
+                            arrays['indptr'], arrays['indices'], arrays['weights'])
+        self.visgraph = None
+        self.reduced = metadata['reduced']
+        self.metric = metadata.get('metric', "euclidean")
+        self.ch = None
+        self.version += 1
+        if 'ch_rank' in arrays:
+            self.ch = ContractionHierarchy.from_arrays(arrays)
+
+
+def build_levels(input_data, tolerances, **build_options):
+    """
+    Build one visibility graph per resolution level of the obstacles, see
+    simplify.resolution_levels. Obstacles are only ever simplified outward,
+    so a path of any level avoids the original obstacles as well; query
+    points within tolerance of an obstacle may lie inside its simplified
+    outline, though.
+
+    :param input_data: List of polygons representing obstacles.
+    :param tolerances: Simplification tolerance of every level, in the
+        units of the polygon coordinates.
+    :param build_options: Passed on to VisGraph.build.
+    :return: A list of (tolerance, VisGraph) pairs, coarsest last.
+    """
+    graphs = []
+    for tolerance, polygons in resolution_levels(input_data, tolerances):
+        graph = VisGraph()
+        graph.build(polygons, **build_options)
+        graphs.append((tolerance, graph))
+    return graphs
 
 
 # Helper functions
-def _generate_visibility_edges(graph, points):
+class _IdPoints:
+    """Map query ids to points: graph vertices from the CSR, others from extra."""
+
+    def __init__(self, csr):
+        self.csr = csr
+        self.extra = {}
+
+    def __getitem__(self, i):
+        return self.extra[i] if i in self.extra else self.csr.point(i)
+
+
+def _renumbered(pairs, renumber):
+    """Return the id pairs with their ids renumbered, dropping those with a removed vertex (-1)."""
+    pairs = renumber[pairs].reshape(-1, 2)
+    return pairs[(pairs >= 0).all(axis=1)]
+
+
+def _pairs_crossing(xs, ys, ids, edges):
+    """
+    Return the (i, j), i < j, pairs of the vertex ids ids whose segment
+    meets any of edges, see _crossing. A vertex beyond a side of the edges'
+    bounding box is only paired with the vertices on the box's side of it,
+    a slice of the ids sorted by x or by y, instead of with all of them.
+    """
+    edges = list(edges)
+    if not edges or len(ids) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    xmin = min(min(edge.p1.x, edge.p2.x) for edge in edges)
+    xmax = max(max(edge.p1.x, edge.p2.x) for edge in edges)
+    ymin = min(min(edge.p1.y, edge.p2.y) for edge in edges)
+    ymax = max(max(edge.p1.y, edge.p2.y) for edge in edges)
+    by_x, by_y = ids[np.argsort(xs[ids], kind='stable')], ids[np.argsort(ys[ids], kind='stable')]
+    sorted_xs, sorted_ys = xs[by_x], ys[by_y]
+    x_low, x_high = np.searchsorted(sorted_xs, xmin, 'left'), np.searchsorted(sorted_xs, xmax, 'right')
+    y_low, y_high = np.searchsorted(sorted_ys, ymin, 'left'), np.searchsorted(sorted_ys, ymax, 'right')
+
+    sources, targets = [], []
+    for i, x, y in zip(ids.tolist(), xs[ids].tolist(), ys[ids].tolist()):
+        sides = [ids]
+        if x < xmin:
+            sides.append(by_x[x_low:])
+        elif x > xmax:
+            sides.append(by_x[:x_high])
+        if y < ymin:
+            sides.append(by_y[y_low:])
+        elif y > ymax:
+            sides.append(by_y[:y_high])
+        others = min(sides, key=len)
+        others = others[others > i]
+        others = np.sort(others[_crossing(x, y, xs[others], ys[others], edges)])
+        sources.append(np.full(len(others), i, dtype=np.int64))
+        targets.append(others)
+    return np.column_stack((np.concatenate(sources), np.concatenate(targets))).astype(np.int64)
+
+
+def _crossing(px, py, qx, qy, edges):
+    """
+    Return a mask of the segments p-q that meet any of edges, a few obstacle
+    edges, touching included; segments missing the edges' bounding box are
+    skipped.
+    """
+    px, py, qx, qy = np.broadcast_arrays(px, py, qx, qy)
+    edges = list(edges)
+    crossing = np.zeros(px.shape, dtype=bool)
+    if not edges:
+        return crossing
+    xmin = min(min(edge.p1.x, edge.p2.x) for edge in edges)
+    xmax = max(max(edge.p1.x, edge.p2.x) for edge in edges)
+    ymin = min(min(edge.p1.y, edge.p2.y) for edge in edges)
+    ymax = max(max(edge.p1.y, edge.p2.y) for edge in edges)
+    near = (np.maximum(px, qx) >= xmin) & (np.minimum(px, qx) <= xmax) & \
+           (np.maximum(py, qy) >= ymin) & (np.minimum(py, qy) <= ymax)
+    # A segment whose line passes the box with all corners to one side misses it.
+    sides = [orient_array(px[near], py[near], qx[near], qy[near], x, y)
+             for x, y in ((xmin, ymin), (xmin, ymax), (xmax, ymin), (xmax, ymax))]
+    near[near] = ~(np.all([side == CCW for side in sides], axis=0) |
+                   np.all([side == CW for side in sides], axis=0))
+    px, py, qx, qy = px[near], py[near], qx[near], qy[near]
+    hit = np.zeros(px.shape, dtype=bool)
+    for edge in edges:
+        hit |= edge_intersect_array(px, py, qx, qy, edge.p1.x, edge.p1.y, edge.p2.x, edge.p2.y)
+    crossing[near] = hit
+    return crossing
+
+
+def _unobstructed(px, py, qx, qy, obstacles):
+    """
+    Return a mask of the segments from p to the points q that meet no
+    obstacle edge other than the edges at p or q.
+    """
+    free = np.ones(len(qx), dtype=bool)
+    e1x, e1y = obstacles.e1x[None, :], obstacles.e1y[None, :]
+    e2x, e2y = obstacles.e2x[None, :], obstacles.e2y[None, :]
+    at_p = ((e1x == px) & (e1y == py)) | ((e2x == px) & (e2y == py))
+    rows = max(1, UNOBSTRUCTED_CHUNK // max(len(obstacles.edges), 1))
+    for start in range(0, len(qx), rows):
+        cx, cy = qx[start:start + rows, None], qy[start:start + rows, None]
+        at_q = ((e1x == cx) & (e1y == cy)) | ((e2x == cx) & (e2y == cy))
+        hit = edge_intersect_array(px, py, cx, cy, e1x, e1y, e2x, e2y) & ~at_p & ~at_q
+        free[start:start + rows] = ~hit.any(axis=1)
+    return free
+
+
+def _init_worker(obstacles, reduced, instrumented=False):
+    """
+    Pool initializer: keep the prepared obstacles in the worker so they are
+    transferred once per worker rather than once per batch. With
+    instrumented, the worker collects its own statistics.
+    """
+    global _worker_obstacles, _worker_reduced
+    _worker_obstacles, _worker_reduced = obstacles, reduced
+    instrumentation.reset()  # collectors inherited from a forked parent count into its copy
+    if instrumented:
+        instrumentation.enable()
+
+
+def _init_query_worker(query):
+    """
+    Pool initializer: keep the CSR graph and the shared query edges in the
+    worker so they are transferred once per worker rather than per origin.
+    """
+    global _worker_query
+    _worker_query = query
+
+
+def _query_origin(task):
+    """
+    Grow the Dijkstra tree of one origin until every target is settled.
+
+    :param task: (origin id, extra (neighbour id, weight) pairs of the origin).
+    :return: (distances to the targets, id paths to the targets or None).
+    """
+    csr, shared, targets, with_paths = _worker_query
+    origin, edges = task
+    extra_edges = shared
+    if edges:
+        extra_edges = dict(shared)
+        extra_edges[origin] = shared.get(origin, []) + edges
+    distances, predecessors = dijkstra_csr_targets(csr, origin, targets, extra_edges)
+    paths = None
+    if with_paths:
+        paths = [path_ids(predecessors, origin, target) for target in targets]
+    return [distances.get(target, float('inf')) for target in targets], paths
+
+
+def _visibility_pairs(obstacles, ids, reduced=False):
+    """
+    Return the (i, j) vertex id pairs of the visibility edges of the
+    obstacle points with the given ids.
+
+    :param obstacles: PreparedObstacles of the obstacle graph.
+    :param ids: Vertex ids, positions in obstacles.points, to sweep from.
+    :param reduced: Skip reflex points and keep only bitangent edges.
+    """
+    points = obstacles.points
+    pairs = []
+    for i in ids:
+        if reduced and obstacles.reflex[i]:
+            continue
+        for j in visible_ids(points[i], obstacles):
+            if reduced and not bitangent(points[i], points[j], obstacles):
+                continue
+            pairs.append((i, j))
+    return pairs
+
+
+def _process_shard_batch(task):
     """
-    Generate visibility edges for a given batch of points.
+    Pool task of a checkpointed build.
 
-    :param graph: The graph representing obstacles.
-    :param points: List of points for which visibility edges are calculated.
-    :return: List of visibility edges.
+    :param task: (batch id, start, stop) range of obstacle point indices.
+    :return: The batch id and the (i, j) point index pairs of its edges.
     """
-    edges = []
-    for p1 in points:
-        for p2 in visible_vertices(p1, graph):
-            edges.append(Edge(p1, p2))
-    return edges
+    batch, start, stop = task
+    return batch, _visibility_pairs(_worker_obstacles, range(start, stop), _worker_reduced)
 
 
-def _process_visibility_batch(args):
+def _process_visibility_batch(batch):
     """
     Wrapper for processing visibility graph batches in parallel.
 
-    :param args: Tuple containing the graph and batch of points.
-    :return: List of visibility edges.
+    :param batch: (start, stop) range of obstacle point indices.
+    :return: List of (i, j) point index pairs of visibility edges, and the
+        statistics of the batch as a dict if the worker is instrumented.
     """
-    try:
-        return _generate_visibility_edges(*args)
-    except KeyboardInterrupt:
-        pass
\ No newline at end of file
+    pairs = _visibility_pairs(_worker_obstacles, range(*batch), _worker_reduced)
+    stats = instrumentation.current()
+    if stats is None:
+        return pairs, None
+    collected = stats.as_dict()
+    stats.clear()
+    return pairs, collected
@@ -1,34 +1,96 @@
 from __future__ import division
-from math import pi, sqrt, atan, acos
+from math import pi, sqrt, atan
+from random import Random
+from functools import cmp_to_key
+from timeit import default_timer
+import numpy as np
+import instrumentation
 from graph import Point
+from obstacles import PreparedObstacles
+from predicates import CCW, CLNR, CW, ccw, compare_angles, orient, orient_array
 
 INFINTY = 10000
-CCW = 1     #counter-clockwise
-CW = -1     #clockwise
-CLNR = 0    #collinear
-"""To address inaccuracies caused by floating-point representation errors,
-    some functions require rounding or truncating floating-point numbers to 
-    a specific tolerance level."""
-CT = 10     #collision tolerance
-T = 10**CT
-T2 = 10.0**CT
+"""Orientation tests and angle comparisons are exact, see predicates."""
+ANGLE_TIE = 1e-12   # sweep angles this close are ordered exactly, see _angular_order
+PAIR_ROWS = 64  # segments per numpy block in visible_pairs_array
+
+class _OpenEdgeNode(object):
+
+    __slots__ = ('edge', 'next', 'prev')
+
+    def __init__(self, edge, level):
+        self.edge = edge
+        self.next = [self] * level
+        self.prev = [self] * level
+
 
 class OpenEdges(object):
-    
+    """Sweep status E ordered by distance along the current ray.
+
+    Edges are kept in a circular, doubly linked skip list so insert and
+    delete take O(log n) comparisons. The ray distance and ray crossing of
+    each edge are cached for as long as the ray stays the same, and every
+    edge maps to its node so delete unlinks it without searching."""
+
+    MAX_LEVEL = 32
+
     def __init__(self):
-        self._open_edges = []
+        self._head = _OpenEdgeNode(None, self.MAX_LEVEL)
+        self._level = 1
+        self._len = 0
+        self._nodes = {}
+        self._random = Random(0)
+        self._ray = None
+        self._crossing = {}
+        self._distance = {}
 
     def insert(self, p1, p2, edge):
-        self._open_edges.insert(self._index(p1, p2, edge), edge)
+        update = self._search(p1, p2, edge)
+        level = self._random_level()
+        if level > self._level:
+            self._level = level
+        node = self._nodes[id(edge)] = _OpenEdgeNode(edge, level)
+        for i in range(level):
+            before = update[i]
+            after = before.next[i]
+            node.prev[i], node.next[i] = before, after
+            before.next[i] = after.prev[i] = node
+        self._len += 1
+
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def _set_ray(self, p1, p2):
+        if self._ray is None or self._ray[0] is not p1 or self._ray[1] is not p2:
+            self._ray = (p1, p2)
+            self._crossing.clear()
+            self._distance.clear()
+
+    def _crosses(self, p1, p2, edge):
+        key = id(edge)
+        crosses = self._crossing.get(key)
+        if crosses is None:
+            crosses = self._crossing[key] = edge_intersect(p1, p2, edge)
+        return crosses
+
+    def _ray_distance(self, p1, p2, edge):
+        key = id(edge)
+        distance = self._distance.get(key)
+        if distance is None:
+            distance = self._distance[key] = point_edge_distance(p1, p2, edge)
+        return distance
 
     def _less_than(self, p1, p2, edge1, edge2):
         """Return True if edge1 is smaller than edge2, False otherwise."""
         if edge1 == edge2:
             return False
-        if not edge_intersect(p1, p2, edge2):
+        if not self._crosses(p1, p2, edge2):
             return True
-        edge1_dist = point_edge_distance(p1, p2, edge1)
-        edge2_dist = point_edge_distance(p1, p2, edge2)
+        edge1_dist = self._ray_distance(p1, p2, edge1)
+        edge2_dist = self._ray_distance(p1, p2, edge2)
         if edge1_dist > edge2_dist:
             return False
         if edge1_dist < edge2_dist:
@@ -39,65 +101,115 @@ class OpenEdges(object):
                 same_point = edge1.p1
             else:
                 same_point = edge1.p2
-            tan_inverse_edge1 = tan_inverse2(p1, p2, edge1.get_adjacent(same_point))
-            tan_inverse_edge2 = tan_inverse2(p1, p2, edge2.get_adjacent(same_point))
-            if tan_inverse_edge1 < tan_inverse_edge2:
-                return True
-            return False
+            return smaller_angle(p1, p2, edge1.get_adjacent(same_point),
+                                 edge2.get_adjacent(same_point))
+
+    def _search(self, p1, p2, edge):
+        """Return, per level, the last node whose edge is not greater than edge."""
+        self._set_ray(p1, p2)
+        head = self._head
+        node = head
+        update = [head] * self.MAX_LEVEL
+        for i in range(self._level - 1, -1, -1):
+            after = node.next[i]
+            while after is not head and not self._less_than(p1, p2, edge, after.edge):
+                node = after
+                after = node.next[i]
+            update[i] = node
+        return update
 
-    def _index(self, p1, p2, edge):
-        lo, hi = 0, len(self._open_edges)
-        while lo < hi:
-            mid = (lo + hi) // 2
-            if self._less_than(p1, p2, edge, self._open_edges[mid]):
-                hi = mid  # Narrow search range to the lower half
-            else:
-                lo = mid + 1  # Narrow search range to the upper half
-        return lo
-    
     def smallest(self):
-        return self._open_edges[0]
+        return self._head.next[0].edge
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not self._head:
+            yield node.edge
+            node = node.next[0]
 
-    def __getitem__(self, index):
-        return self._open_edges[index]
-    
     def __len__(self):
-        return len(self._open_edges)
+        return self._len
 
     def delete(self, p1, p2, edge):
-        index = self._index(p1, p2, edge) - 1
-        if self._open_edges[index] == edge:
-            del self._open_edges[index]
+        node = self._nodes.pop(id(edge), None)
+        if node is None:
+            return
+        for i in range(len(node.next)):
+            node.prev[i].next[i] = node.next[i]
+            node.next[i].prev[i] = node.prev[i]
+        self._len -= 1
 
 def visible_vertices(point, graph, origin=None, destination=None):
-    
-    edges = graph.get_edges()
-    points = graph.get_points()
-    if origin: points.append(origin)
-    if destination: points.append(destination)
-    points.sort(key=lambda p: (tan_inverse(point, p), edge_distance(point, p)))   # here points is like A(research paper)
-    
+    """Return the vertices visible from point. graph is the obstacle Graph or,
+    to skip preparing it on every call, its PreparedObstacles."""
+    obstacles = PreparedObstacles.of(graph)
+    extra = [p for p in (origin, destination) if p]
+    points = obstacles.points
+    count = len(points)
+    return [points[i] if i < count else extra[i - count]
+            for i in visible_ids(point, obstacles, extra)]
+
+
+def visible_ids(point, obstacles, extra=()):
+    """visible_vertices by id: return the vertex ids of the visible obstacle
+    vertices, and len(obstacles.points) + k for a visible extra[k]."""
+    stats = instrumentation.current()
+    if stats is not None:
+        start = default_timer()
+    points = list(obstacles.points)
+    xs, ys = obstacles.xs, obstacles.ys
+    # Vertex id of every point; extra points that are no vertex get -1.
+    ids = list(range(len(points))) + [obstacles.index.get(p, -1) for p in extra]
+    if extra:
+        points.extend(extra)
+        xs = np.append(xs, [p.x for p in extra])
+        ys = np.append(ys, [p.y for p in extra])
+    incident = obstacles.incident + tuple(
+        obstacles.incident[i] if i != -1 else () for i in ids[len(obstacles.points):])
+    own = obstacles.index.get(point, -1)
+    skip = set(np.flatnonzero((xs == point.x) & (ys == point.y)).tolist())
+
+    order = _angular_order(point, xs, ys)   # here points is like A(research paper)
+
+    # Orientation of every obstacle edge seen from point; reversed for p2.
+    orientation = orient_array(point.x, point.y, obstacles.e1x, obstacles.e1y,
+                            obstacles.e2x, obstacles.e2y).tolist()
+    if stats is not None:
+        stats.add_time("visible_vertices.sort", default_timer() - start)
+        start = default_timer()
+
     open_edges = OpenEdges() # it will our data structure E (research parer)
     point_inf = Point(INFINTY, point.y)
-    for edge in edges:
-        if point in edge: continue
-        if edge_intersect(point, point_inf, edge):
-            if on_segment(point, edge.p1, point_inf): continue
-            if on_segment(point, edge.p2, point_inf): continue
-            open_edges.insert(point, point_inf, edge)
-
+    seeds = obstacles.seed_candidates(point.y)
+    e1x, e1y = obstacles.e1x[seeds], obstacles.e1y[seeds]
+    e2x, e2y = obstacles.e2x[seeds], obstacles.e2y[seeds]
+    touching = ((e1x == point.x) & (e1y == point.y)) | ((e2x == point.x) & (e2y == point.y))
+    crossing = edge_intersect_array(point.x, point.y, point_inf.x, point_inf.y, e1x, e1y, e2x, e2y)
+    on_ray = on_segment_array(point.x, point.y, e1x, e1y, point_inf.x, point_inf.y) | \
+             on_segment_array(point.x, point.y, e2x, e2y, point_inf.x, point_inf.y)
+    for index in seeds[crossing & ~touching & ~on_ray].tolist():
+        open_edges.insert(point, point_inf, obstacles.edges[index])
+    if stats is not None:
+        stats.add_time("visible_vertices.seed", default_timer() - start)
+        start = default_timer()
+
+    adjacent = obstacles.adjacent_ids[own] if own != -1 else frozenset()
+    e1, e2 = obstacles.e1, obstacles.e2
     visible = []
-    prev = None
+    prev = prev_id = None
     pv = None     #previous visible
 
-    for p in points:
-        if p == point: 
+    for i in order:
+        if i in skip:
             continue
+        p = points[i]
+        incident_edges = [(edge, k, orientation[k] if is_p1 else -orientation[k])
+                          for edge, k, is_p1 in incident[i]]
 
         # Update open_edges - remove clock wise edges incident on p
         if open_edges:
-            for edge in graph[p]:
-                if ccw(point, p, edge.get_adjacent(p)) == CW:
+            for edge, _, turn in incident_edges:
+                if turn == CW:
                     open_edges.delete(point, p, edge)
 
         # Check if p is visible from point
@@ -119,25 +231,114 @@ def visible_vertices(point, graph, origin=None, destination=None):
                 if prev not in edge and edge_intersect(prev, p, edge):
                     is_visible = False
                     break
-            if is_visible and edge_in_polygon(prev, p, graph):
-                    is_visible = False
+            if is_visible and not (ids[i] != -1 and prev_id in obstacles.adjacent_ids[ids[i]]) and \
+                    edge_in_polygon(prev, p, obstacles):
+                is_visible = False
 
         # Check if the visible edge is interior to its polygon
-        if is_visible and p not in graph.get_adjacent_points(point):
-            is_visible = not edge_in_polygon(point, p, graph)
+        if is_visible and ids[i] not in adjacent:
+            is_visible = not edge_in_polygon(point, p, obstacles)
 
-        if is_visible: visible.append(p)
+        if is_visible: visible.append(i)
 
         # Update open_edges - Add counter clock wise edges incident on p
-        for edge in graph[p]:
-            if (point not in edge):
-                if ccw(point, p, edge.get_adjacent(p)) == CCW:
-                    open_edges.insert(point, p, edge)
-        prev = p
+        for edge, k, turn in incident_edges:
+            if turn == CCW and own != e1[k] and own != e2[k]:
+                open_edges.insert(point, p, edge)
+        prev, prev_id = p, ids[i]
         pv = is_visible
+    if stats is not None:
+        stats.add_time("visible_vertices.sweep", default_timer() - start)
+        stats.count("visible_vertices.calls")
     return visible
 
 
+def visible_pairs_array(obstacles, i, others):
+    """Return a mask of the obstacle vertices others, ids like i, that vertex
+    i sees, by the rule of visible_ids but without a sweep. The segment to
+    a vertex is blocked by an edge that crosses it anywhere but at a vertex
+    of that edge; edges touching it at a vertex or running along it do not
+    block. From i to every vertex on the segment, and between consecutive
+    ones past the first, it must not run inside a polygon unless along one
+    of its edges, see edge_in_polygon. The others are taken PAIR_ROWS at a
+    time by angle around i, and each block is only tested against the edges
+    meeting the bounding box of its segments."""
+    others = np.asarray(others, dtype=np.int64)
+    visible = np.zeros(len(others), dtype=bool)
+    px, py = obstacles.xs[i], obstacles.ys[i]
+    exmin, exmax = np.minimum(obstacles.e1x, obstacles.e2x), np.maximum(obstacles.e1x, obstacles.e2x)
+    eymin, eymax = np.minimum(obstacles.e1y, obstacles.e2y), np.maximum(obstacles.e1y, obstacles.e2y)
+    order = np.argsort(np.arctan2(obstacles.ys[others] - py, obstacles.xs[others] - px), kind='stable')
+    for start in range(0, len(others), PAIR_ROWS):
+        rows = order[start:start + PAIR_ROWS]
+        js = others[rows]
+        qx, qy = obstacles.xs[js][:, None], obstacles.ys[js][:, None]
+        near = np.flatnonzero((exmax >= min(px, qx.min())) & (exmin <= max(px, qx.max())) &
+                              (eymax >= min(py, qy.min())) & (eymin <= max(py, qy.max())))
+        e1x, e1y = obstacles.e1x[near][None, :], obstacles.e1y[near][None, :]
+        e2x, e2y = obstacles.e2x[near][None, :], obstacles.e2y[near][None, :]
+        o1 = orient_array(px, py, qx, qy, e1x, e1y)
+        o2 = orient_array(px, py, qx, qy, e2x, e2y)
+        o3 = orient_array(e1x, e1y, e2x, e2y, px, py)
+        o4 = orient_array(e1x, e1y, e2x, e2y, qx, qy)
+        free = ~((o1 * o2 < 0) & (o3 * o4 <= 0)).any(axis=1)
+        # Edge ends lying on the segment, other than its own ends.
+        on1 = (o1 == CLNR) & on_segment_array(px, py, e1x, e1y, qx, qy) & \
+            ~((e1x == px) & (e1y == py)) & ~((e1x == qx) & (e1y == qy))
+        on2 = (o2 == CLNR) & on_segment_array(px, py, e2x, e2y, qx, qy) & \
+            ~((e2x == px) & (e2y == py)) & ~((e2x == qx) & (e2y == qy))
+        through = on1.any(axis=1) | on2.any(axis=1)
+        for row in np.flatnonzero(free).tolist():
+            j = int(js[row])
+            chain = [j]
+            if through[row]:
+                between = {obstacles.e1[k] for k in near[on1[row]].tolist()}
+                between.update(obstacles.e2[k] for k in near[on2[row]].tolist())
+                chain = sorted(between, key=lambda k: abs(obstacles.xs[k] - px) + abs(obstacles.ys[k] - py))
+                chain.append(j)
+            visible[rows[row]] = _chain_outside(obstacles, i, chain)
+    return visible
+
+
+def _chain_outside(obstacles, i, chain):
+    """visible_pairs_array's interior checks for the vertices chain on the
+    segment from vertex i, ordered away from it."""
+    def inside(a, b):
+        return b not in obstacles.adjacent_ids[a] and \
+            edge_in_polygon(obstacles.points[a], obstacles.points[b], obstacles)
+    if any(inside(i, k) for k in chain):
+        return False
+    return not any(inside(a, b) for a, b in zip(chain, chain[1:]))
+
+
+def _angular_order(point, xs, ys):
+    """Return the indices of the points (xs, ys) by angle around point, then
+    by distance. Angles closer than ANGLE_TIE may be misordered by rounding,
+    so runs of them are ordered by the exact orientation test instead."""
+    dx = xs - point.x
+    dy = ys - point.y
+    distances = np.sqrt(dx * dx + dy * dy)
+    angles = tan_inverse_array(point, xs, ys)
+    order = np.lexsort((distances, angles))
+    ties = np.diff(angles[order]) <= ANGLE_TIE
+    order = order.tolist()
+    if not ties.any():
+        return order
+    xs, ys, distances = xs.tolist(), ys.tolist(), distances.tolist()
+
+    def compare(i, j):
+        turn = orient(point.x, point.y, xs[i], ys[i], xs[j], ys[j])
+        if turn != CLNR:
+            return -turn
+        return (distances[i] > distances[j]) - (distances[i] < distances[j])
+
+    # A run of ties starts after every False-to-True change of ties.
+    bounds = np.flatnonzero(np.diff(np.concatenate(([False], ties, [False])).astype(np.int8))).tolist()
+    for start, stop in zip(bounds[::2], bounds[1::2]):
+        order[start:stop + 1] = sorted(order[start:stop + 1], key=cmp_to_key(compare))
+    return order
+
+
 def polygon_crossing(p1, poly_edges):
     """Returns True if the point p1 lies inside the polygon defined by the edges in poly_edges. 
     The method uses the crossing number algorithm and considers edges that are 
@@ -172,34 +373,82 @@ def polygon_crossing(p1, poly_edges):
 
 def edge_in_polygon(p1, p2, graph):
     """Return true if the edge from p1 to p2 is interior to any polygon
-    in graph."""
+    in graph. With PreparedObstacles the test uses the polygon's bounding
+    box and y index instead of scanning all of its edges."""
     if p1.polygon_id != p2.polygon_id:
         return False
     if p1.polygon_id == -1 or p2.polygon_id == -1:
         return False
     mid_point = Point((p1.x + p2.x) / 2, (p1.y + p2.y) / 2)
+    if isinstance(graph, PreparedObstacles):
+        return polygon_crossing_indexed(mid_point, graph.polygons[p1.polygon_id])
     return polygon_crossing(mid_point, graph.polygons[p1.polygon_id])
 
 
+def tangent_at(point, vertex, obstacles):
+    """Return True if the line from point through vertex can be part of a
+    shortest path: vertex is not reflex and its neighbours all lie on one
+    side of the line. Points that are not obstacle vertices always pass."""
+    if obstacles.is_reflex(vertex):
+        return False
+    turns = {ccw(point, vertex, other) for other in obstacles.adjacent_points(vertex)
+             if other != point}
+    return not (CW in turns and CCW in turns)
+
+
+def bitangent(p1, p2, obstacles):
+    """Return True if the edge from p1 to p2 is tangent at both ends."""
+    return tangent_at(p1, p2, obstacles) and tangent_at(p2, p1, obstacles)
+
+
+def polygon_crossing_indexed(p1, polygon):
+    """polygon_crossing against a PolygonEdges, testing only the edges whose
+    y extent contains p1 in one vectorized pass."""
+    if not polygon.in_bbox(p1.x, p1.y):
+        return False
+    candidates = polygon.y_index.candidates(p1.y)
+    e1x, e1y = polygon.e1x[candidates], polygon.e1y[candidates]
+    e2x, e2y = polygon.e2x[candidates], polygon.e2y[candidates]
+    spans = ~(((p1.y < e1y) & (p1.y < e2y)) | ((p1.y > e1y) & (p1.y > e2y)) |
+              ((p1.x > e1x) & (p1.x > e2x)))
+    e1x, e1y, e2x, e2y = e1x[spans], e1y[spans], e2x[spans], e2y[spans]
+    p2x, p2y = INFINTY, p1.y
+    edge_p1_clnr = orient_array(p1.x, p1.y, e1x, e1y, p2x, p2y) == CLNR
+    edge_p2_clnr = orient_array(p1.x, p1.y, e2x, e2y, p2x, p2y) == CLNR
+    one_clnr = edge_p1_clnr ^ edge_p2_clnr
+    other_y = np.where(edge_p1_clnr, e2y, e1y)
+    crossings = np.count_nonzero(one_clnr & (other_y > p1.y))
+    neither = ~(edge_p1_clnr | edge_p2_clnr)
+    crossings += np.count_nonzero(edge_intersect_array(
+        p1.x, p1.y, p2x, p2y, e1x[neither], e1y[neither], e2x[neither], e2y[neither]))
+    return crossings % 2 == 1
 
 
 def intersect_point(p1, p2, edge):
     """Return intersect Point where the edge from p1, p2 intersects edge"""
     if p1 in edge: return p1
     if p2 in edge: return p2
+    coords = _intersect_coords(p1, p2, edge)
+    if coords is None:
+        return None
+    return Point(*coords)
+
+
+def _intersect_coords(p1, p2, edge):
+    """Return the (x, y) where the line p1, p2 meets the line through edge."""
     if edge.p1.x == edge.p2.x:  #case 1: edge is vertical
         if p1.x == p2.x:        #parallel lines
             return None
         pslope = (p1.y - p2.y) / (p1.x - p2.x)
         intersect_x = edge.p1.x #x-axis is of line
         intersect_y = pslope * (intersect_x - p1.x) + p1.y  # y = mx + c
-        return Point(intersect_x, intersect_y)
+        return intersect_x, intersect_y
 
     if p1.x == p2.x:    #if p1, and p2 are on same x coordinate
         eslope = (edge.p1.y - edge.p2.y) / (edge.p1.x - edge.p2.x)
         intersect_x = p1.x
         intersect_y = eslope * (intersect_x - edge.p1.x) + edge.p1.y
-        return Point(intersect_x, intersect_y)
+        return intersect_x, intersect_y
 
     pslope = (p1.y - p2.y) / (p1.x - p2.x)
     eslope = (edge.p1.y - edge.p2.y) / (edge.p1.x - edge.p2.x)
@@ -207,15 +456,19 @@ def intersect_point(p1, p2, edge):
         return None
     intersect_x = (eslope * edge.p1.x - pslope * p1.x + p1.y - edge.p1.y) / (eslope - pslope)
     intersect_y = eslope * (intersect_x - edge.p1.x) + edge.p1.y
-    return Point(intersect_x, intersect_y)
+    return intersect_x, intersect_y
 
 
 def point_edge_distance(p1, p2, edge):
     """Return the Eucledian distance from p1 to intersect point with edge.
     Assumes the line going from p1 to p2 intersects edge before reaching p2."""
-    ip = intersect_point(p1, p2, edge)
-    if ip is not None:
-        return edge_distance(p1, ip)
+    if p1 in edge or p2 in edge:
+        return 0 if p1 in edge else edge_distance(p1, p2)
+    coords = _intersect_coords(p1, p2, edge)
+    if coords is not None:
+        dx = coords[0] - p1.x
+        dy = coords[1] - p1.y
+        return sqrt(dx * dx + dy * dy)
     return 0
 
 
@@ -237,24 +490,10 @@ def tan_inverse(center, point):
     return angle
 
 
-def tan_inverse2(point_a, point_b, point_c):
-    """Return tan_inverse B (radian) between point_b and point_c.  """
-    
-    a = (point_c.x - point_b.x)*(point_c.x - point_b.x) + (point_c.y - point_b.y)*(point_c.y - point_b.y)
-    b = (point_c.x - point_a.x)*(point_c.x - point_a.x) + (point_c.y - point_a.y)**2
-    c = (point_b.x - point_a.x)**2 + (point_b.y - point_a.y)**2
-    denom = 0.000001 # tending to zero
-    if 2*sqrt(a) * sqrt(c) != 0:
-        denom = 2*sqrt(a) * sqrt(c)
-    cos_value = (a + c - b) / denom
-    return acos(int(cos_value*T)/T2)
-
-
-def ccw(A, B, C):
-    """Determine orientation: 1 if counterclockwise, -1 if clockwise, 0 if collinear."""
-    area = ((B.x - A.x) * (C.y - A.y) - (B.y - A.y) * (C.x - A.x))
-    area = int(area * T) / T2  # Apply scaling and truncate for efficiency
-    return 1 if area > 0 else -1 if area < 0 else 0
+def smaller_angle(point_a, point_b, point_c, point_d):
+    """Return True if the angle ABC at point_b is smaller than the angle ABD."""
+    return compare_angles(point_a.x, point_a.y, point_b.x, point_b.y,
+                          point_c.x, point_c.y, point_d.x, point_d.y) < 0
 
 
 def edge_intersect(p1, q1, edge):
@@ -301,4 +540,34 @@ def edge_distance(p1, p2):
     """Return the Euclidean distance between two Points."""
     dx = p2.x - p1.x
     dy = p2.y - p1.y
-    return sqrt(dx * dx + dy * dy)
\ No newline at end of file
+    return sqrt(dx * dx + dy * dy)
+
+
+def tan_inverse_array(center, xs, ys):
+    """Vectorized tan_inverse of the points (xs, ys) around center."""
+    dx = xs - center.x
+    dy = ys - center.y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        angle = np.arctan(dy / dx)
+    angle = np.where(dx < 0, angle + pi, np.where(dy < 0, angle + 2 * pi, angle))
+    angle = np.where(dy == 0, np.where(dx > 0, 0.0, pi), angle)
+    return np.where(dx == 0, np.where(dy > 0, pi / 2, pi * 3 / 2), angle)
+
+
+def on_segment_array(px, py, qx, qy, rx, ry):
+    """Vectorized on_segment for collinear p, q, r."""
+    return (np.minimum(px, rx) <= qx) & (qx <= np.maximum(px, rx)) & \
+           (np.minimum(py, ry) <= qy) & (qy <= np.maximum(py, ry))
+
+
+def edge_intersect_array(p1x, p1y, q1x, q1y, e1x, e1y, e2x, e2y):
+    """Vectorized edge_intersect of segment p1-q1 against edges e1-e2."""
+    o1 = orient_array(p1x, p1y, q1x, q1y, e1x, e1y)
+    o2 = orient_array(p1x, p1y, q1x, q1y, e2x, e2y)
+    o3 = orient_array(e1x, e1y, e2x, e2y, p1x, p1y)
+    o4 = orient_array(e1x, e1y, e2x, e2y, q1x, q1y)
+    return ((o1 != o2) & (o3 != o4)) | \
+           ((o1 == CLNR) & on_segment_array(p1x, p1y, e1x, e1y, q1x, q1y)) | \
+           ((o2 == CLNR) & on_segment_array(p1x, p1y, e2x, e2y, q1x, q1y)) | \
+           ((o3 == CLNR) & on_segment_array(e1x, e1y, p1x, p1y, e2x, e2y)) | \
+           ((o4 == CLNR) & on_segment_array(e1x, e1y, q1x, q1y, e2x, e2y))